@@ -1,9 +1,13 @@
+import shutil
 from pathlib import Path
 
 from multiple_wave_transport._multiple_wave_transport import BoundaryType
+from multiple_wave_transport.losses import BINARY_SUFFIX
+from multiple_wave_transport.sampling import derive_seed
 from multiple_wave_transport.pendulum import (
     PerturbedPendulum,
     PerturbedPendulumWithLowFrequency,
+    build_pendulum,
     calculate_loss_times,
 )
 
@@ -37,15 +41,38 @@ def calculate_and_save_loss_times(
     n_particles: int,
     data_folder: Path | str = DATA_FOLDER,
     boundary_type: BoundaryType = BoundaryType.X,
+    seed: int = 0,
 ):
     """
     Calculate the loss times and save them to a file
+
+    Every amplitude draws its own initial ensemble, with a seed derived from
+    the base `seed` and the amplitude (see sampling.derive_seed), so the runs
+    of a driver loop are independent but reproducible.
+
+    Finished chunks of particles are checkpointed in data_folder/shards, so
+    a restarted script resumes where it stopped. The shards are removed once
+    the result is saved, and amplitudes with a saved result are skipped.
     """
+    filename = Path(data_folder) / get_filename(
+        amplitude, type(build_pendulum(amplitude))
+    )
+    if filename.with_suffix(BINARY_SUFFIX).is_dir():
+        print(f"Loss times for amplitude {amplitude} exist already")
+        return
+
     print(f"Calculating loss times for amplitude {amplitude}")
-    result = calculate_loss_times(t_max, amplitude, n_particles, boundary_type)
-    filename = get_filename(amplitude, pendulumtype)
-    with open(Path(data_folder) / filename, "w") as f:
-        f.write(result.to_json())
+    shard_dir = Path(data_folder) / "shards" / filename.stem
+    result = calculate_loss_times(
+        t_max,
+        amplitude,
+        n_particles,
+        boundary_type,
+        seed=derive_seed(seed, amplitude),
+        shard_dir=shard_dir,
+    )
+    result.save(filename.with_suffix(BINARY_SUFFIX))
+    shutil.rmtree(shard_dir)
 
 
 opts = dict(
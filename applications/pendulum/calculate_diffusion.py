@@ -1,8 +1,6 @@
-from multiprocessing import Pool
 from pathlib import Path
 
-import numpy as np
-from pend import save_travelling_positions
+from pend import sweep_poincare_positions
 
 
 THIS_FOLDER = Path(__file__).parent
@@ -18,11 +16,11 @@ if __name__ == "__main__":
         E_max=0.85,
         tmax=120000,
         n_particles=1000,
+        # None integrates with the adaptive dopri5 stepper, an integer
+        # selects that many fixed symplectic (Yoshida4) steps per poincare_dt
+        steps_per_period=None,
     )
 
-    def calc_and_save(amplitude):
-        save_travelling_positions(amplitude, datafolder=DATA_FOLDER, **options)
-
     amplitudes = [
         (0.1, 0.1),
         (0.2, 0.2),
@@ -37,7 +35,7 @@ if __name__ == "__main__":
         (1.1, 1.1),
     ]
 
-    n_processes = min(12, len(amplitudes))
-
-    with Pool(n_processes) as p:
-        p.map(calc_and_save, amplitudes)
+    # the particles of all amplitudes are balanced over the processes and
+    # every amplitude is streamed into an OrbitStore in DATA_FOLDER as its
+    # chunks finish, read them with ResultOfPoincarePositions.from_store
+    sweep_poincare_positions(amplitudes, **options, datafolder=DATA_FOLDER, n_workers=12)
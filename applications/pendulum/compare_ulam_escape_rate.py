@@ -0,0 +1,31 @@
+"""
+Compare the Ulam escape rate with the steady escape rate of the loss time
+results of the Monte Carlo runs
+"""
+import sys
+from pathlib import Path
+
+from multiple_wave_transport.losses import BINARY_SUFFIX, LossTimeResult
+from multiple_wave_transport.ulam import monte_carlo_escape_rate, pendulum_escape_rate
+
+THIS_FOLDER = Path(__file__).parent
+
+if __name__ == "__main__":
+    folder = Path(sys.argv[1]) if len(sys.argv) > 1 else THIS_FOLDER / "data"
+
+    # the drivers write binary results, older runs JSON files; a result that
+    # exists in both formats is read once, LossTimeResult.from_file picks
+    # the format
+    filenames = {}
+    for filename in sorted(folder.glob("loss_times_*")):
+        if filename.suffix in (".json", BINARY_SUFFIX):
+            filenames.setdefault(filename.stem, filename.with_suffix(".json"))
+
+    print("amplitude, alpha Monte Carlo (t > 200), alpha Ulam")
+    for _, filename in sorted(filenames.items()):
+        if not filename.exists():
+            filename = filename.with_suffix(BINARY_SUFFIX)
+        result = LossTimeResult.from_file(filename)
+        amplitude = result.options["amplitude"]
+        ulam = pendulum_escape_rate(amplitude, shape=(128, 128), n_samples=3)
+        print(amplitude, monte_carlo_escape_rate(result, 200.0), ulam.alpha)
@@ -1,12 +1,20 @@
 import json
 import time
 from dataclasses import dataclass
-from typing import Union
+from functools import partial
+from pathlib import Path
+from typing import Optional, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+from multiple_wave_transport._multiple_wave_transport import (
+    IntegrationOptions,
+    StepperKind,
+)
 from multiple_wave_transport.losses import to_json
+from multiple_wave_transport.orbit_store import OrbitStore
+from multiple_wave_transport.sweep import iter_sweep
 from multiple_wave_transport.pendulum import (
     build_pendulum,
     generate_random_init_trapped_states,
@@ -32,12 +40,12 @@ def _get_travelling_distance_from_orbit(orbit: np.ndarray) -> np.ndarray:
     return distances
 
 
-def _get_travelling_distance(pendulum, s, t_max):
+def _get_travelling_distance(pendulum, s, t_max, steps_per_period=None):
     """
     returns the distance from the initial state s0 until time tmax
     at snapshots equally spaced in time with time step equal to pendulum.poincare_dt
     """
-    snapshots = pendulum.poincare(s, t_max)
+    snapshots = _get_poincare_positions(pendulum, s, t_max, steps_per_period)
 
     return _get_travelling_distance_from_orbit(snapshots)
 
@@ -54,6 +62,7 @@ class ResultOfTravellingDistances:
     tmax: float
     n_particles: int
     distances: np.ndarray
+    steps_per_period: Optional[int] = None
 
     def to_json(self):
         return to_json(self)
@@ -71,7 +80,9 @@ class ResultOfTravellingDistances:
         return cls(**data)
 
 
-def get_travelling_distances(amplitude, E_min, E_max, tmax, n_particles):
+def get_travelling_distances(
+    amplitude, E_min, E_max, tmax, n_particles, steps_per_period=None
+):
     """
     returns the distance from the initial state s0 until time tmax
     at snapshots equally spaced in time with time step equal to pendulum.poincare_dt
@@ -93,11 +104,17 @@ def get_travelling_distances(amplitude, E_min, E_max, tmax, n_particles):
         maximum time
     n_particles: int
         number of particles
+    steps_per_period: int, optional
+        if given, integrate with this many fixed symplectic steps per
+        pendulum.poincare_dt instead of the adaptive stepper
     """
 
     pendulum = build_pendulum(amplitude)
     initial_states = generate_random_init_trapped_states(n_particles, E_min, E_max)
-    distances = [_get_travelling_distance(pendulum, s0, tmax) for s0 in initial_states]
+    distances = [
+        _get_travelling_distance(pendulum, s0, tmax, steps_per_period)
+        for s0 in initial_states
+    ]
     distances = np.column_stack(distances)
 
     return ResultOfTravellingDistances(
@@ -107,11 +124,19 @@ def get_travelling_distances(amplitude, E_min, E_max, tmax, n_particles):
         tmax=tmax,
         n_particles=n_particles,
         distances=distances,
+        steps_per_period=steps_per_period,
     )
 
 
 def save_travelling_distances(
-    amplitude, E_min, E_max, tmax, n_particles, fname=None, datafolder=None
+    amplitude,
+    E_min,
+    E_max,
+    tmax,
+    n_particles,
+    fname=None,
+    datafolder=None,
+    steps_per_period=None,
 ):
     if fname is None:
         fname = f"distances{amplitude}.json".replace(" ", "_").replace(",", "_")
@@ -122,7 +147,12 @@ def save_travelling_distances(
     print(f"Computing travelling distances for {amplitude}")
 
     res = get_travelling_distances(
-        amplitude, E_min=E_min, E_max=E_max, tmax=tmax, n_particles=n_particles
+        amplitude,
+        E_min=E_min,
+        E_max=E_max,
+        tmax=tmax,
+        n_particles=n_particles,
+        steps_per_period=steps_per_period,
     )
 
     print(f"Saving to {fname}")
@@ -133,13 +163,41 @@ def save_travelling_distances(
     return res
 
 
-def _get_poincare_positions(pendulum, s, t_max):
+def _get_poincare_positions(pendulum, s, t_max, steps_per_period=None):
     """
     returns the positions from the initial state s0 until time tmax
     at snapshots equally spaced in time with time step equal to pendulum.poincare_dt
+
+    If steps_per_period is given, the orbit is integrated with that many fixed
+    symplectic steps per poincare_dt instead of the adaptive stepper.
     """
-    snapshots = pendulum.poincare(s, t_max)
-    return snapshots
+    if steps_per_period is None:
+        return pendulum.poincare(s, t_max)
+    return pendulum.poincare_symplectic(s, t_max, steps_per_period)
+
+
+def _get_poincare_positions_many(
+    pendulum, states, t_max, steps_per_period=None, n_threads=0
+):
+    """
+    the orbits of _get_poincare_positions for many initial states at once,
+    integrated in parallel over n_threads C++ threads (0 uses every core, see
+    poincare_many)
+
+    returns an array of shape (n_particles, 2, n_steps)
+    """
+    options = IntegrationOptions.poincare_default()
+    if steps_per_period is not None:
+        options = IntegrationOptions(
+            stepper=StepperKind.Symplectic, steps_per_period=steps_per_period
+        )
+    orbits = pendulum.poincare_many(
+        np.asarray(states, dtype=float).reshape(-1, 2),
+        t_max,
+        n_threads=n_threads,
+        options=options,
+    )
+    return orbits.transpose(0, 2, 1)
 
 
 @dataclass
@@ -153,7 +211,8 @@ class ResultOfPoincarePositions:
     E_max: float
     tmax: float
     n_particles: int
-    positions: list[np.ndarray]
+    positions: Union[list[np.ndarray], OrbitStore]
+    steps_per_period: Optional[int] = None
 
     def to_json(self):
         return to_json(self)
@@ -171,6 +230,25 @@ class ResultOfPoincarePositions:
 
         return cls(**data)
 
+    @classmethod
+    def from_store(cls, path):
+        """
+        opens the OrbitStore written by save_travelling_positions(chunked=True)
+        the positions are read lazily from the store
+        """
+        store = OrbitStore.open(path)
+        return cls(positions=store, **store.attrs)
+
+    def get_mean_distances(self):
+        """
+        returns the mean distance of the particles from their initial states
+        at the snapshots, computed chunk by chunk if the positions are stored
+        in an OrbitStore
+        """
+        if isinstance(self.positions, OrbitStore):
+            return self.positions.mean_travelling_distance()
+        return np.mean(self.get_distances(), axis=1)
+
     def get_distances(self):
         """
         returns the distances from the initial state s0 until time tmax
@@ -184,7 +262,16 @@ class ResultOfPoincarePositions:
         )
 
 
-def get_poincare_positions(amplitude, E_min, E_max, tmax, n_particles):
+def get_poincare_positions(
+    amplitude,
+    E_min,
+    E_max,
+    tmax,
+    n_particles,
+    steps_per_period=None,
+    store=None,
+    chunk_size=64,
+):
     """
     returns the positions beginning at the initial state s0 until time tmax
     at snapshots equally spaced in time with time step equal to pendulum.poincare_dt
@@ -206,11 +293,37 @@ def get_poincare_positions(amplitude, E_min, E_max, tmax, n_particles):
         maximum time
     n_particles: int
         number of particles
+    steps_per_period: int, optional
+        if given, integrate with this many fixed symplectic steps per
+        pendulum.poincare_dt instead of the adaptive stepper
+    store: OrbitStore, optional
+        if given, the orbits are appended to the store as they are computed
+        instead of being kept in memory, and the result refers to the store
+    chunk_size: int
+        the number of particles integrated at once (in parallel) before they
+        are appended to the store
     """
 
     pendulum = build_pendulum(amplitude)
     initial_states = generate_random_init_trapped_states(n_particles, E_min, E_max)
-    positions = [_get_poincare_positions(pendulum, s0, tmax) for s0 in initial_states]
+    if store is None:
+        positions = list(
+            _get_poincare_positions_many(
+                pendulum, initial_states, tmax, steps_per_period
+            )
+        )
+    else:
+        with store:
+            for begin in range(0, n_particles, chunk_size):
+                store.extend(
+                    _get_poincare_positions_many(
+                        pendulum,
+                        initial_states[begin : begin + chunk_size],
+                        tmax,
+                        steps_per_period,
+                    )
+                )
+        positions = store
 
     return ResultOfPoincarePositions(
         amplitude=amplitude,
@@ -219,28 +332,165 @@ def get_poincare_positions(amplitude, E_min, E_max, tmax, n_particles):
         tmax=tmax,
         n_particles=n_particles,
         positions=positions,
+        steps_per_period=steps_per_period,
+    )
+
+
+def _poincare_positions_chunk(tmax, steps_per_period, amplitude, states):
+    """
+    the orbits of a chunk of a sweep, run in a worker process; the processes
+    are the parallelism, so every chunk is integrated on one thread
+    """
+    pendulum = build_pendulum(amplitude)
+    return _get_poincare_positions_many(
+        pendulum, states, tmax, steps_per_period, n_threads=1
+    )
+
+
+def sweep_poincare_positions(
+    amplitudes,
+    E_min,
+    E_max,
+    tmax,
+    n_particles,
+    datafolder,
+    steps_per_period=None,
+    chunk_size=50,
+    n_workers=None,
+):
+    """
+    get_poincare_positions for several amplitudes, with the particles of all
+    amplitudes split into chunks of chunk_size that are balanced over
+    n_workers processes (see multiple_wave_transport.sweep.iter_sweep)
+
+    The orbits of every amplitude are streamed into an OrbitStore in
+    datafolder (named like save_travelling_positions(chunked=True) names it)
+    as its chunks finish, so only the chunks in flight are held in memory.
+    A rerun skips the amplitudes whose store is complete and resumes the
+    incomplete ones after their last written chunk, with fresh random
+    initial states for the missing particles.
+
+    returns a dict mapping the amplitudes to their ResultOfPoincarePositions,
+    which read the positions lazily from the stores
+    """
+    stores = {
+        amplitude: _open_or_create_store(
+            Path(datafolder) / _positions_fname(amplitude, chunked=True),
+            chunk_size,
+            dict(
+                amplitude=amplitude,
+                E_min=E_min,
+                E_max=E_max,
+                tmax=tmax,
+                n_particles=n_particles,
+                steps_per_period=steps_per_period,
+            ),
+        )
+        for amplitude in amplitudes
+    }
+    missing = {
+        amplitude: n_particles - len(store) for amplitude, store in stores.items()
+    }
+    for amplitude, n_missing in missing.items():
+        if n_missing <= 0:
+            print(f"Positions for amplitude {amplitude} exist already")
+
+    chunks = iter_sweep(
+        [amplitude for amplitude in amplitudes if missing[amplitude] > 0],
+        lambda amplitude: generate_random_init_trapped_states(
+            missing[amplitude], E_min, E_max
+        ),
+        partial(_poincare_positions_chunk, tmax, steps_per_period),
+        chunk_size=chunk_size,
+        n_workers=n_workers,
+        # every particle is integrated until tmax
+        cost=lambda amplitude: 1.0,
     )
+    for amplitude, orbits, last in chunks:
+        stores[amplitude].extend(orbits)
+        if last:
+            stores[amplitude].flush()
+            print(f"Saved {stores[amplitude].path}")
+
+    return {
+        amplitude: ResultOfPoincarePositions.from_store(store.path)
+        for amplitude, store in stores.items()
+    }
+
+
+def _open_or_create_store(path, chunk_size, attrs):
+    """
+    the OrbitStore at path, created if it does not exist yet; an existing
+    store must hold the same run
+    """
+    if not (Path(path) / "meta.json").exists():
+        return OrbitStore(path, chunk_size=chunk_size, attrs=attrs)
+    store = OrbitStore.open(path)
+    if json.loads(to_json(attrs)) != store.attrs:
+        raise ValueError(f"{path} holds the orbits of another run: {store.attrs}")
+    return store
+
+
+def _positions_fname(amplitude, chunked=False):
+    suffix = "" if chunked else ".json"
+    return f"positions{amplitude}{suffix}".replace(" ", "_").replace(",", "_")
 
 
 def save_travelling_positions(
-    amplitude, E_min, E_max, tmax, n_particles, fname=None, datafolder=None
+    amplitude,
+    E_min,
+    E_max,
+    tmax,
+    n_particles,
+    fname=None,
+    datafolder=None,
+    steps_per_period=None,
+    chunked=False,
 ):
+    """
+    computes the positions and saves them to fname
+
+    With chunked=True, the orbits are streamed into an OrbitStore in the
+    directory fname while they are computed, instead of being written as one
+    JSON document at the end. Read it back with
+    ResultOfPoincarePositions.from_store.
+    """
     if fname is None:
-        fname = f"positions{amplitude}.json".replace(" ", "_").replace(",", "_")
+        fname = _positions_fname(amplitude, chunked)
 
     if datafolder is not None:
         fname = datafolder / fname
 
     print(f"Computing travelling positions for {amplitude}")
 
+    store = None
+    if chunked:
+        attrs = dict(
+            amplitude=amplitude,
+            E_min=E_min,
+            E_max=E_max,
+            tmax=tmax,
+            n_particles=n_particles,
+            steps_per_period=steps_per_period,
+        )
+        store = OrbitStore(fname, attrs=attrs)
+        print(f"Streaming to {fname}")
+
     res = get_poincare_positions(
-        amplitude, E_min=E_min, E_max=E_max, tmax=tmax, n_particles=n_particles
+        amplitude,
+        E_min=E_min,
+        E_max=E_max,
+        tmax=tmax,
+        n_particles=n_particles,
+        steps_per_period=steps_per_period,
+        store=store,
     )
 
-    print(f"Saving to {fname}")
+    if not chunked:
+        print(f"Saving to {fname}")
 
-    with open(fname, "w") as f:
-        f.write(res.to_json())
+        with open(fname, "w") as f:
+            f.write(res.to_json())
 
     return res
 
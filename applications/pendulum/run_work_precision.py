@@ -0,0 +1,48 @@
+"""
+Work-precision diagrams of the loss time calculations of the pendulum and the
+three wave system: the cost of every stepper and tolerance against the error
+of the loss time statistics and of the fitted escape rate
+"""
+import argparse
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+
+from multiple_wave_transport.work_precision import (
+    format_table,
+    pendulum_work_precision,
+    plot_work_precision,
+    three_wave_work_precision,
+)
+
+THIS_FOLDER = Path(__file__).parent
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pendulum-amplitude", type=float, default=0.8)
+    parser.add_argument("--three-wave-amplitude", type=float, default=7.8)
+    parser.add_argument("--n-particles", type=int, default=1000)
+    parser.add_argument("--t-max", type=float, default=500.0)
+    parser.add_argument("--out", type=Path, default=THIS_FOLDER / "work_precision.png")
+    args = parser.parse_args()
+
+    runs = {
+        f"pendulum, amplitude {args.pendulum_amplitude}": pendulum_work_precision(
+            args.pendulum_amplitude, args.n_particles, args.t_max
+        ),
+        f"three waves, amplitude {args.three_wave_amplitude}": three_wave_work_precision(
+            args.three_wave_amplitude, n_particles=args.n_particles, t_max=args.t_max
+        ),
+    }
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    for row, (title, (reference, points)) in zip(axes, runs.items()):
+        print(title)
+        print(f"reference: {reference.statistics}")
+        print(format_table([reference] + points))
+        print()
+        plot_work_precision(points, row[0], error="alpha_error")
+        plot_work_precision(points, row[1], error="ks_statistic")
+        row[0].set_title(title)
+    fig.tight_layout()
+    fig.savefig(args.out)
@@ -1,6 +1,9 @@
+import shutil
 from pathlib import Path
 from typing import Tuple
 
+from multiple_wave_transport.losses import BINARY_SUFFIX
+from multiple_wave_transport.sampling import derive_seed
 from multiple_wave_transport.three_wave import calculate_loss_times
 
 THIS_FOLDER = Path(__file__).parent
@@ -17,13 +20,36 @@ def calculate_and_save_loss_times(
     p_init_range: Tuple[float, float],
     p_max: float,
     n_particles: int,
+    seed: int = 0,
 ):
     """
     Calculate the loss times and save them to a file
+
+    Every amplitude draws its own initial ensemble, with a seed derived from
+    the base `seed` and the amplitude (see sampling.derive_seed), so the runs
+    of a driver loop are independent but reproducible.
+
+    Finished chunks of particles are checkpointed in DATA_FOLDER/shards, so
+    a restarted script resumes where it stopped. The shards are removed once
+    the result is saved, and amplitudes with a saved result are skipped.
     """
-    result = calculate_loss_times(t_max, amplitude, p_init_range, p_max, n_particles)
-    with open(DATA_FOLDER / filename, "w") as f:
-        f.write(result.to_json())
+    target = (DATA_FOLDER / filename).with_suffix(BINARY_SUFFIX)
+    if target.is_dir():
+        print(f"{target} exists already")
+        return
+
+    shard_dir = DATA_FOLDER / "shards" / Path(filename).stem
+    result = calculate_loss_times(
+        t_max,
+        amplitude,
+        p_init_range,
+        p_max,
+        n_particles,
+        seed=derive_seed(seed, amplitude),
+        shard_dir=shard_dir,
+    )
+    result.save(target)
+    shutil.rmtree(shard_dir)
 
 
 opts = dict(
@@ -26,7 +26,7 @@ def process_and_plot_result(filename):
     """
     print(filename)
 
-    result = LossTimeResult.from_json(filename.read_text())
+    result = LossTimeResult.from_file(filename)
 
     options = result.options
 
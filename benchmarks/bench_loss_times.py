@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    MultiWaveSystem,
+    PerturbedPendulum,
+    PerturbedPendulumWithLowFrequency,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.expressions import build_tape_system
+from multiple_wave_transport.multi_wave import three_wave_table
+from multiple_wave_transport.pendulum import generate_random_init_trapped_states
+
+PENDULUM_T_MAX = 50 * PerturbedPendulum.poincare_dt
+THREE_WAVE_T_MAX = 30.0
+
+# the systems are built once, so that only the integration is timed
+SYSTEMS = {
+    "PerturbedPendulum": PerturbedPendulum(0.6),
+    "PerturbedPendulumWithLowFrequency": PerturbedPendulumWithLowFrequency(0.6, 0.6),
+    "ThreeWaveSystem": ThreeWaveSystem(1.0),
+    "MultiWaveSystem": MultiWaveSystem(three_wave_table(1.0)),
+    "TapeSystem": build_tape_system(
+        "-eps * (cos(2*pi*t - x) + cos(4*pi*t - x) + cos(6*pi*t - x))",
+        1.0,
+        dict(eps=1.0),
+    ),
+}
+
+# the arguments of get_loss_time after the state
+LOSS_TIME_ARGUMENTS = {
+    "PerturbedPendulum": (PENDULUM_T_MAX,),
+    "PerturbedPendulumWithLowFrequency": (PENDULUM_T_MAX,),
+    "ThreeWaveSystem": (10.0, THREE_WAVE_T_MAX),
+    "MultiWaveSystem": (-np.inf, 10.0, THREE_WAVE_T_MAX),
+    "TapeSystem": (-np.inf, 10.0, THREE_WAVE_T_MAX),
+}
+
+
+@pytest.mark.parametrize("system", SYSTEMS)
+def bench_single_particle_loss_time(benchmark, system):
+    # a confined particle is integrated until t_max
+    state = np.array([np.pi, 0.1] if "Pendulum" in system else [np.pi, 5.0])
+    benchmark(SYSTEMS[system].get_loss_time, state, *LOSS_TIME_ARGUMENTS[system])
+
+
+@pytest.mark.parametrize("block_size", [0, 8])
+def bench_pendulum_ensemble_loss_times(benchmark, trapped_states, block_size):
+    pendulum = PerturbedPendulum(0.6)
+    benchmark.extra_info["n_particles"] = len(trapped_states)
+    benchmark(
+        pendulum.get_loss_times,
+        trapped_states,
+        PENDULUM_T_MAX,
+        block_size=block_size,
+    )
+
+
+@pytest.mark.parametrize("block_size", [0, 8])
+def bench_three_wave_ensemble_loss_times(benchmark, three_wave_states, block_size):
+    tws = ThreeWaveSystem(1.0)
+    benchmark.extra_info["n_particles"] = len(three_wave_states)
+    benchmark(
+        tws.get_loss_times,
+        three_wave_states,
+        10.0,
+        THREE_WAVE_T_MAX,
+        block_size=block_size,
+    )
+
+
+def bench_generate_random_init_trapped_states(benchmark):
+    benchmark.extra_info["n_particles"] = 100_000
+    benchmark(generate_random_init_trapped_states, 100_000, rng=0)
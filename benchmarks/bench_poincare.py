@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    PerturbedPendulum,
+    ThreeWaveSystem,
+)
+
+
+@pytest.mark.parametrize("n_periods", [10, 100, 1000])
+def bench_pendulum_poincare(benchmark, n_periods):
+    pendulum = PerturbedPendulum(0.6)
+    benchmark(pendulum.poincare, (np.pi, 0.5), n_periods * pendulum.poincare_dt)
+
+
+@pytest.mark.parametrize("n_periods", [10, 100, 1000])
+def bench_three_wave_poincare(benchmark, n_periods):
+    tws = ThreeWaveSystem(1.0)
+    benchmark(tws.poincare, (np.pi, 5.0), n_periods * tws.poincare_dt)
+
+
+def bench_pendulum_poincare_many(benchmark, trapped_states):
+    pendulum = PerturbedPendulum(0.6)
+    benchmark.extra_info["n_particles"] = len(trapped_states)
+    benchmark(pendulum.poincare_many, trapped_states, 20 * pendulum.poincare_dt)
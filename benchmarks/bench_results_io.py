@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from multiple_wave_transport.losses import LossTimeResult
+
+N_PARTICLES = 100_000
+
+
+@pytest.fixture(scope="module")
+def result():
+    rng = np.random.default_rng(0)
+    return LossTimeResult(
+        rng.uniform(size=(N_PARTICLES, 2)),
+        rng.exponential(100.0, N_PARTICLES),
+        dict(t_max=1000.0, amplitude=0.6, n_particles=N_PARTICLES),
+    )
+
+
+def bench_save(benchmark, result, tmp_path):
+    benchmark(result.save, tmp_path / "result")
+
+
+def bench_load(benchmark, result, tmp_path):
+    result.save(tmp_path / "result")
+
+    def load():
+        loaded = LossTimeResult.load(tmp_path / "result", mmap_mode=None)
+        return loaded.loss_times.sum()
+
+    benchmark(load)
+
+
+def bench_to_json(benchmark, result):
+    benchmark(result.to_json)
+
+
+def bench_from_json(benchmark, result):
+    s = result.to_json()
+    benchmark(LossTimeResult.from_json, s)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from multiple_wave_transport import WavePacket
+
+
+def _wave_packet():
+    return WavePacket(1.0, 1.0, 1.0, 0.5)
+
+
+def _grid(n=100_000):
+    return np.linspace(-8.0, 8.0, n), np.full(n, 3.0)
+
+
+def bench_field(benchmark):
+    benchmark(_wave_packet(), *_grid())
+
+
+def bench_field_dz(benchmark):
+    benchmark(_wave_packet().dz, *_grid())
+
+
+def bench_system(benchmark):
+    benchmark(_wave_packet().system, np.array([0.3, 0.5]), 3.0)
+
+
+def bench_integrate(benchmark):
+    integrator = _wave_packet().make_integrator()
+    benchmark(integrator.integrate, np.array([-8.0, 1.0]), (0.0, 30.0))
+
+
+def bench_integrate_many(benchmark):
+    integrator = _wave_packet().make_integrator()
+    points = np.column_stack([np.full(200, -8.0), np.linspace(0.0, 2.0, 200)])
+    benchmark.extra_info["n_particles"] = len(points)
+    benchmark(integrator.integrate_many, points, (0.0, 30.0))
@@ -0,0 +1,58 @@
+"""
+Benchmarks of the integration hot paths, run with pytest-benchmark
+(pip install -e .[bench])
+
+Record a baseline on a machine with
+
+    pytest benchmarks --benchmark-save=baseline
+
+Later runs of `pytest benchmarks` compare every benchmark to the latest
+saved run in benchmarks/.benchmarks and fail if its median time grew by
+more than 25% (see pytest.ini). Without a saved run, the comparison is
+skipped. The baselines are specific to the machine and the build flags, so
+they are not committed.
+"""
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from multiple_wave_transport.pendulum import generate_random_init_trapped_states
+
+STORAGE = Path(__file__).parent / ".benchmarks"
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # runs before pytest-benchmark reads the options, only for the runs
+    # configured by benchmarks/pytest.ini
+    if config.inipath is None or config.inipath.parent != STORAGE.parent:
+        return
+    if config.option.benchmark_storage == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{STORAGE}"
+        if not any(STORAGE.glob("*/*.json")):
+            warnings.warn(
+                "no saved benchmarks to compare to, "
+                "run pytest benchmarks --benchmark-save=baseline first"
+            )
+            config.option.benchmark_compare = None
+            config.option.benchmark_compare_fail = None
+
+
+@pytest.fixture(scope="session")
+def trapped_states():
+    """
+    A fixed ensemble of 256 trapped pendulum states
+    """
+    return generate_random_init_trapped_states(256, rng=0)
+
+
+@pytest.fixture(scope="session")
+def three_wave_states():
+    """
+    A fixed ensemble of 256 states below the loss boundary p_max = 10 of the
+    three wave system
+    """
+    rng = np.random.default_rng(0)
+    return np.column_stack([rng.uniform(0, 2 * np.pi, 256), rng.uniform(3, 8, 256)])
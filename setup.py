@@ -23,7 +23,7 @@ setup(
     package_dir={"": "src"},
     cmake_install_dir="src/multiple_wave_transport",
     include_package_data=True,
-    extras_require={"test": ["pytest"]},
+    extras_require={"test": ["pytest"], "bench": ["pytest", "pytest-benchmark"]},
     python_requires=">=3.9",
     cmake_with_sdist=True,
 )
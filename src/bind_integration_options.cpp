@@ -0,0 +1,153 @@
+#include "integration_options.hpp"
+#include "symplectic.hpp"
+#include <pybind11/pybind11.h>
+#include <sstream>
+#include <string>
+
+namespace py = pybind11;
+
+typedef WP::IntegrationOptions IntegrationOptions;
+
+namespace {
+std::string options_to_string(const IntegrationOptions &o) {
+  std::ostringstream out;
+  out << "<_multiple_wave_transport.IntegrationOptions("
+      << "stepper=" << py::str(py::cast(o.stepper)).cast<std::string>()
+      << ", atol=" << o.atol << ", rtol=" << o.rtol
+      << ", dt_init=" << o.dt_init
+      << ", crossing_precision=" << o.crossing_precision
+      << ", scheme=" << py::str(py::cast(o.scheme)).cast<std::string>()
+      << ", steps_per_period=" << o.steps_per_period
+      << ", detect_grazing=" << (o.detect_grazing ? "True" : "False")
+      << ", regularity_window=" << o.regularity_window
+      << ", regularity_digits=" << o.regularity_digits << ")>";
+  return out.str();
+}
+} // namespace
+
+void bind_integration_options(py::module_ &m) {
+  py::enum_<WP::SymplecticScheme>(m, "SymplecticScheme", R"pbdoc(
+      Fixed step symplectic schemes for Hamiltonians p^2/2 + V(x, t)
+
+      Verlet: 2nd order Stormer-Verlet (leapfrog), one force evaluation per step
+      Yoshida4: 4th order Forest-Ruth/Yoshida composition, three evaluations per step
+      Yoshida6: 6th order Yoshida composition, seven evaluations per step
+      )pbdoc")
+      .value("Verlet", WP::SymplecticScheme::Verlet)
+      .value("Yoshida4", WP::SymplecticScheme::Yoshida4)
+      .value("Yoshida6", WP::SymplecticScheme::Yoshida6);
+
+  py::enum_<WP::StepperKind>(m, "StepperKind", R"pbdoc(
+      The steppers available to the integration entry points
+
+      Dopri5: adaptive Dormand-Prince 5(4) with native dense output
+      CashKarp54: adaptive Cash-Karp 5(4), dense output by Hermite interpolation
+      BulirschStoer: adaptive Bulirsch-Stoer extrapolation, suited to tight
+      tolerances
+      Symplectic: fixed step symplectic scheme, see IntegrationOptions.scheme
+      )pbdoc")
+      .value("Dopri5", WP::StepperKind::Dopri5)
+      .value("CashKarp54", WP::StepperKind::CashKarp54)
+      .value("BulirschStoer", WP::StepperKind::BulirschStoer)
+      .value("Symplectic", WP::StepperKind::Symplectic);
+
+  const IntegrationOptions defaults{};
+
+  py::class_<IntegrationOptions>(m, "IntegrationOptions", R"pbdoc(
+      Stepper and tolerances used by the integration entry points
+
+      Every get_loss_time(s), poincare and integrate method accepts an
+      `options` argument. The defaults reproduce the settings of
+      get_loss_time; `poincare_default()` and `integrate_default()` return
+      the settings used by the Poincare sections and
+      UnperturbedPendulum.integrate.
+
+      Parameters:
+      -----------
+      stepper: StepperKind
+      The stepper
+      atol, rtol: float
+      The absolute and relative tolerances of the adaptive steppers
+      dt_init: float
+      The first step of the adaptive steppers; the step of the symplectic
+      stepper in `integrate`
+      crossing_precision: float
+      The precision to which the loss times are located, 0 for machine
+      precision
+      scheme: SymplecticScheme
+      The scheme of the symplectic stepper
+      steps_per_period: int
+      The number of symplectic steps per `poincare_dt`
+      detect_grazing: bool
+      Also look for particles that leave and re-enter the domain within one
+      step, at the extrema of the interpolant of the step
+      regularity_window: int
+      If positive, the loss time calculations sample the orbit once per
+      `poincare_dt` and stop early, reporting the particle as confined, once
+      the weighted Birkhoff averages over two consecutive windows of
+      `regularity_window` samples agree to `regularity_digits` digits
+      regularity_digits: float
+      The agreement required to classify an orbit as regular
+      )pbdoc")
+      .def(py::init([](WP::StepperKind stepper, double atol, double rtol,
+                       double dt_init, double crossing_precision,
+                       WP::SymplecticScheme scheme, unsigned steps_per_period,
+                       bool detect_grazing, unsigned regularity_window,
+                       double regularity_digits) {
+             return IntegrationOptions{stepper,           atol,
+                                       rtol,              dt_init,
+                                       crossing_precision, scheme,
+                                       steps_per_period,  detect_grazing,
+                                       regularity_window, regularity_digits};
+           }),
+           py::arg("stepper") = defaults.stepper,
+           py::arg("atol") = defaults.atol, py::arg("rtol") = defaults.rtol,
+           py::arg("dt_init") = defaults.dt_init,
+           py::arg("crossing_precision") = defaults.crossing_precision,
+           py::arg("scheme") = defaults.scheme,
+           py::arg("steps_per_period") = defaults.steps_per_period,
+           py::arg("detect_grazing") = defaults.detect_grazing,
+           py::arg("regularity_window") = defaults.regularity_window,
+           py::arg("regularity_digits") = defaults.regularity_digits)
+      .def_readwrite("stepper", &IntegrationOptions::stepper)
+      .def_readwrite("atol", &IntegrationOptions::atol)
+      .def_readwrite("rtol", &IntegrationOptions::rtol)
+      .def_readwrite("dt_init", &IntegrationOptions::dt_init)
+      .def_readwrite("crossing_precision",
+                     &IntegrationOptions::crossing_precision)
+      .def_readwrite("scheme", &IntegrationOptions::scheme)
+      .def_readwrite("steps_per_period", &IntegrationOptions::steps_per_period)
+      .def_readwrite("detect_grazing", &IntegrationOptions::detect_grazing)
+      .def_readwrite("regularity_window",
+                     &IntegrationOptions::regularity_window)
+      .def_readwrite("regularity_digits",
+                     &IntegrationOptions::regularity_digits)
+      .def_static("poincare_default", &IntegrationOptions::poincare_default)
+      .def_static("integrate_default", &IntegrationOptions::integrate_default)
+      .def("__repr__", &options_to_string)
+      .def(py::pickle(
+          [](const IntegrationOptions &o) {
+            return py::make_tuple(o.stepper, o.atol, o.rtol, o.dt_init,
+                                  o.crossing_precision, o.scheme,
+                                  o.steps_per_period, o.detect_grazing,
+                                  o.regularity_window, o.regularity_digits);
+          },
+          [](py::tuple t) {
+            // older states lack the fields added later, which keep their
+            // defaults
+            if (t.size() < 7 || t.size() > 10)
+              throw std::runtime_error("Invalid IntegrationOptions state");
+            IntegrationOptions o{
+                t[0].cast<WP::StepperKind>(), t[1].cast<double>(),
+                t[2].cast<double>(),          t[3].cast<double>(),
+                t[4].cast<double>(),          t[5].cast<WP::SymplecticScheme>(),
+                t[6].cast<unsigned>()};
+            if (t.size() > 7)
+              o.detect_grazing = t[7].cast<bool>();
+            if (t.size() > 8)
+              o.regularity_window = t[8].cast<unsigned>();
+            if (t.size() > 9)
+              o.regularity_digits = t[9].cast<double>();
+            return o;
+          }));
+}
@@ -1,5 +1,6 @@
 #include "wavepacket.hpp"
 #include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 
 namespace py = pybind11;
@@ -12,5 +13,73 @@ void bind_integrator(py::module_ &m) {
          py::arg("wp"),
          py::arg("atol")=WP::Integrator::ATOL_DEFAULT,
          py::arg("rtol")=WP::Integrator::RTOL_DEFAULT)
-    .def("integrate", &WP::Integrator::integrate, py::arg("point"), py::arg("t_integr"));
+    .def(py::init<WavePacket&, const WP::IntegrationOptions&>(),
+         py::arg("wp"), py::arg("options"))
+    .def("integrate", &WP::Integrator::integrate, py::arg("point"), py::arg("t_integr"))
+    .def("integrate_many",
+         [](const WP::Integrator &self, const Eigen::Ref<const WP::States> &points,
+            std::pair<double, double> t_integr, unsigned n_threads) {
+           py::array_t<double> out({points.rows(), Eigen::Index{2}});
+           Eigen::Map<WP::States> view(out.mutable_data(), points.rows(), 2);
+           {
+             py::gil_scoped_release release;
+             self.integrate_many(points, t_integr, view, n_threads);
+           }
+           return out;
+         },
+         R"pbdoc(
+        Integrate an ensemble of particles
+
+        The particles are integrated in C++ with the GIL released and split
+        over `n_threads` native threads; the results are written straight
+        into the returned array.
+
+        Parameters:
+        -----------
+        points: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_integr: tuple(float, float)
+        The start and end time
+        n_threads: int
+        The number of threads, 0 for all available cores
+
+        Returns:
+        --------
+        out: array-like, shape(N, 2)
+        the states at the end time
+      )pbdoc",
+         py::arg("points"), py::arg("t_integr"), py::arg("n_threads") = 0)
+    .def("integrate_many_at",
+         [](const WP::Integrator &self, const Eigen::Ref<const WP::States> &points,
+            const WP::Vector &times, unsigned n_threads) {
+           py::array_t<double> out({points.rows(), times.size(), Eigen::Index{2}});
+           Eigen::Map<WP::RowMatrix> view(out.mutable_data(), points.rows(),
+                                          2 * times.size());
+           {
+             py::gil_scoped_release release;
+             self.integrate_many_at(points, times, view, n_threads);
+           }
+           return out;
+         },
+         R"pbdoc(
+        Integrate an ensemble of particles and record it at several times
+
+        Like `integrate_many`, but every particle is recorded at all the
+        output times. The initial states are the states at times[0].
+
+        Parameters:
+        -----------
+        points: array-like, shape(N, 2)
+        The states at times[0], one particle per row
+        times: array-like, shape(n_times,)
+        The non-decreasing output times
+        n_threads: int
+        The number of threads, 0 for all available cores
+
+        Returns:
+        --------
+        out: array-like, shape(N, n_times, 2)
+        the states at the output times
+      )pbdoc",
+         py::arg("points"), py::arg("times"), py::arg("n_threads") = 0);
 }
@@ -0,0 +1,140 @@
+#include "bind_orbits.hpp"
+#include "multiple_wave_system.hpp"
+#include <pybind11/eigen.h>
+#include <pybind11/pybind11.h>
+
+namespace py = pybind11;
+
+typedef WP::MultiWaveSystem MultiWaveSystem;
+
+void bind_multi_wave_system(py::module_ &m) {
+  py::class_<MultiWaveSystem>(m, "MultiWaveSystem", R"pbdoc(
+      A particle in the field of N waves
+
+          dx/dt = p,  dp/dt = sum_j A_j cos(k_j x - omega_j t + phi_j)
+
+      If the wavenumbers and the frequencies are integer multiples (up to
+      `max_harmonic`) of a base wavenumber and a base frequency, the waves
+      are evaluated with angle-addition recurrences from a single sine and
+      cosine of the base phases, so that dozens of waves cost little more
+      than one. The loss times are those of leaving p_min < p < p_max.
+
+      Parameters:
+      -----------
+      waves: array-like, shape(N, 4)
+      One (amplitude, k, omega, phase) row per wave
+      poincare_dt: float
+      The period of the Poincare sections and of the period map; by default
+      2 pi over the base frequency of harmonic waves
+      use_recurrences: bool
+      Evaluate harmonic waves with the recurrences; if False every wave
+      costs one cosine
+    )pbdoc")
+      .def(py::init<const Eigen::Ref<const WP::RowMatrix> &, double, bool>(),
+           py::arg("waves"), py::arg("poincare_dt") = 0.0,
+           py::arg("use_recurrences") = true)
+      .def("__call__", &MultiWaveSystem::call, py::arg("s"), py::arg("t"))
+      .def_property_readonly("waves", &MultiWaveSystem::get_waves)
+      .def_property_readonly("harmonic", &MultiWaveSystem::is_harmonic)
+      .def_readonly("poincare_dt", &MultiWaveSystem::poincare_dt)
+      .def_readonly_static("max_harmonic", &MultiWaveSystem::max_harmonic)
+      .def("poincare",
+           [](const MultiWaveSystem &self, const WP::State &s, double t_max,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare(self, s, t_max, options);
+           },
+           py::arg("s"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_many",
+           [](const MultiWaveSystem &self,
+              const Eigen::Ref<const WP::States> &states, double t_max,
+              unsigned stride, unsigned n_threads,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare_many(self, states, t_max, stride,
+                                               n_threads, options);
+           },
+           R"pbdoc(
+        Poincare sections of an ensemble, see ThreeWaveSystem.poincare_many
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("stride") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_symplectic", &MultiWaveSystem::poincare_symplectic,
+           py::arg("s"), py::arg("t_max"), py::arg("steps_per_period"),
+           py::arg("scheme") = WP::SymplecticScheme::Yoshida4)
+      .def("get_loss_time", &MultiWaveSystem::get_loss_time, py::arg("s_init"),
+           py::arg("p_min"), py::arg("p_max"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("get_loss_times", &MultiWaveSystem::get_loss_times, R"pbdoc(
+        Calculate the loss times of an ensemble of initial states
+
+        The ensemble is integrated in C++ with the GIL released and split
+        over `n_threads` native threads.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        p_min: float
+        The minimum value of p allowed
+        p_max: float
+        The maximum value of p allowed
+        t_max: float
+        The maximum integration time
+        n_threads: int
+        The number of threads, 0 for all available cores
+        block_size: int
+        If positive, integrate blocks of `block_size` particles in lockstep
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision. The lockstep engine
+        only supports StepperKind.Dopri5
+
+        Returns:
+        --------
+        out: array-like, shape(N,)
+        the loss times
+      )pbdoc",
+           py::arg("states"), py::arg("p_min"), py::arg("p_max"),
+           py::arg("t_max"), py::arg("n_threads") = 0,
+           py::arg("block_size") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("accumulate_loss_histogram",
+           &MultiWaveSystem::accumulate_loss_histogram,
+           R"pbdoc(
+        Add the loss times of an ensemble to a LossHistogram, see
+        ThreeWaveSystem.accumulate_loss_histogram
+      )pbdoc",
+           py::arg("hist"), py::arg("states"), py::arg("p_min"),
+           py::arg("p_max"), py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("period_map", &MultiWaveSystem::period_map, R"pbdoc(
+        Apply the map over `n_periods` periods `poincare_dt` to an ensemble
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The states, one particle per row
+        p_min: float
+        The minimum value of p allowed
+        p_max: float
+        The maximum value of p allowed
+        n_periods: int
+        The number of periods
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and grazing detection
+
+        Returns:
+        --------
+        out: array-like, shape(N, 2)
+        the mapped states, NaN for the particles that leave
+        p_min < p < p_max on the way
+      )pbdoc",
+           py::arg("states"), py::arg("p_min"), py::arg("p_max"),
+           py::arg("n_periods") = 1, py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>());
+}
@@ -0,0 +1,64 @@
+#ifndef BIND_ORBITS_AHTH3OOX
+#define BIND_ORBITS_AHTH3OOX
+#include "integration_options.hpp"
+#include "symplectic.hpp"
+#include "type_definitions.hpp"
+#include <pybind11/eigen.h>
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+#include <stdexcept>
+
+/*
+ * The orbits of the systems are written by System::poincare_many straight
+ * into the NumPy arrays allocated here, so that the snapshots are not copied
+ * after the integration.
+ */
+
+namespace bind_orbits {
+
+namespace py = pybind11;
+
+/**
+ * @brief      The Poincare section of s as an array of shape (2, n_snapshots).
+ */
+template <typename System>
+py::array_t<double> poincare(const System &sys, const WP::State &s,
+                             double t_max,
+                             const WP::IntegrationOptions &options) {
+  const auto n = WP::n_snapshots(t_max, sys.poincare_dt);
+  // the column-major (2, n) array has the memory layout of a row-major (1, 2 n)
+  py::array_t<double, py::array::f_style> out({Eigen::Index{2}, n});
+  Eigen::Map<WP::RowMatrix> view(out.mutable_data(), 1, 2 * n);
+  const WP::States states = s.transpose();
+  {
+    py::gil_scoped_release release;
+    sys.poincare_many(states, 1, view, 1, options);
+  }
+  return out;
+}
+
+/**
+ * @brief      The Poincare sections of an ensemble as an array of shape
+ *             (N, n_snapshots, 2), sampled every stride poincare_dt.
+ */
+template <typename System>
+py::array_t<double> poincare_many(const System &sys,
+                                  const Eigen::Ref<const WP::States> &states,
+                                  double t_max, unsigned stride,
+                                  unsigned n_threads,
+                                  const WP::IntegrationOptions &options) {
+  if (stride == 0)
+    throw std::invalid_argument("stride must be positive");
+  const auto n = WP::n_snapshots(t_max, stride * sys.poincare_dt);
+  py::array_t<double> out({states.rows(), n, Eigen::Index{2}});
+  Eigen::Map<WP::RowMatrix> view(out.mutable_data(), states.rows(), 2 * n);
+  {
+    py::gil_scoped_release release;
+    sys.poincare_many(states, stride, view, n_threads, options);
+  }
+  return out;
+}
+
+} // namespace bind_orbits
+
+#endif // end of include guard: BIND_ORBITS_AHTH3OOX
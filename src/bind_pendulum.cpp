@@ -1,6 +1,8 @@
+#include "bind_orbits.hpp"
 #include "perturbed_pendulum.hpp"
 #include <pybind11/eigen.h>
 #include <pybind11/pybind11.h>
+#include <stdexcept>
 
 namespace py = pybind11;
 
@@ -13,14 +15,397 @@ void bind_pendulum(py::module_ &m) {
       .value("X", WP::BoundaryType::X)
       .value("P", WP::BoundaryType::P);
 
+  py::class_<WP::DiffusionMoments>(m, "DiffusionMoments", R"pbdoc(
+        Moments of the distance of an ensemble from its initial states
+
+        All attributes are arrays with one entry per snapshot. m2, m3 and m4
+        are the sums of the powers of the deviations from the mean.
+      )pbdoc")
+      .def(py::init([](const WP::Vector &times, const WP::Vector &count,
+                       const WP::Vector &mean, const WP::Vector &m2,
+                       const WP::Vector &m3, const WP::Vector &m4) {
+             for (const WP::Vector *v : {&count, &mean, &m2, &m3, &m4})
+               if (v->size() != times.size())
+                 throw std::invalid_argument(
+                     "all moments need one entry per snapshot");
+             WP::DiffusionMoments moments(times);
+             moments.count = count;
+             moments.mean = mean;
+             moments.m2 = m2;
+             moments.m3 = m3;
+             moments.m4 = m4;
+             return moments;
+           }),
+           py::arg("times"), py::arg("count"), py::arg("mean"), py::arg("m2"),
+           py::arg("m3"), py::arg("m4"))
+      .def(
+          "merge",
+          [](WP::DiffusionMoments &self, const WP::DiffusionMoments &other) {
+            if (self.times.size() != other.times.size() ||
+                !self.times.isApprox(other.times))
+              throw std::invalid_argument(
+                  "the moments are taken at different snapshots");
+            self.merge(other);
+          },
+          R"pbdoc(
+        Combine the samples of other into these moments, e.g. the moments of
+        the shards of an ensemble
+
+        Parameters:
+        -----------
+        other: DiffusionMoments
+        moments at the same snapshots
+      )pbdoc",
+          py::arg("other"))
+      .def_readonly("times", &WP::DiffusionMoments::times)
+      .def_readonly("count", &WP::DiffusionMoments::count)
+      .def_readonly("mean", &WP::DiffusionMoments::mean)
+      .def_readonly("m2", &WP::DiffusionMoments::m2)
+      .def_readonly("m3", &WP::DiffusionMoments::m3)
+      .def_readonly("m4", &WP::DiffusionMoments::m4)
+      .def_property_readonly("variance", &WP::DiffusionMoments::variance)
+      .def_property_readonly("skewness", &WP::DiffusionMoments::skewness)
+      .def_property_readonly("excess_kurtosis",
+                             &WP::DiffusionMoments::excess_kurtosis);
+
+  py::class_<WP::LossHistogram>(m, "LossHistogram", R"pbdoc(
+        Histogram of the loss times of an ensemble
+
+        `counts` holds the lost particles in `n_bins` equal bins of
+        [0, t_max), the particles with loss time >= t_max are counted in
+        `n_survivors`. With `n_p_bins > 0`, `joint` also bins the lost
+        particles by loss time (rows) and initial momentum in
+        [p_min, p_max) (columns). The memory does not depend on the number
+        of particles added.
+
+        Parameters:
+        -----------
+        t_max: float
+        The integration time
+        n_bins: int
+        The number of loss time bins
+        n_p_bins: int
+        The number of initial momentum bins, 0 for no joint histogram
+        p_min, p_max: float
+        The range of the initial momentum bins
+      )pbdoc")
+      .def(py::init<double, Eigen::Index, Eigen::Index, double, double>(),
+           py::arg("t_max"), py::arg("n_bins"), py::arg("n_p_bins") = 0,
+           py::arg("p_min") = 0.0, py::arg("p_max") = 0.0)
+      .def(
+          "merge",
+          [](WP::LossHistogram &self, const WP::LossHistogram &other) {
+            self.merge(other);
+          },
+          R"pbdoc(
+        Combine the particles of other into this histogram, e.g. the
+        histograms of the chunks or shards of an ensemble
+
+        Parameters:
+        -----------
+        other: LossHistogram
+        a histogram with the same bins
+      )pbdoc",
+          py::arg("other"))
+      .def_readonly("t_max", &WP::LossHistogram::t_max)
+      .def_readonly("p_min", &WP::LossHistogram::p_min)
+      .def_readonly("p_max", &WP::LossHistogram::p_max)
+      .def_readonly("counts", &WP::LossHistogram::counts)
+      .def_readonly("joint", &WP::LossHistogram::joint)
+      .def_readonly("n_particles", &WP::LossHistogram::n_particles)
+      .def_readonly("n_survivors", &WP::LossHistogram::n_survivors)
+      .def_property_readonly("edges", &WP::LossHistogram::edges)
+      .def_property_readonly("survival", &WP::LossHistogram::survival)
+      .def(py::pickle(
+          [](const WP::LossHistogram &h) {
+            return py::make_tuple(h.t_max, h.p_min, h.p_max, h.counts, h.joint,
+                                  h.n_particles, h.n_survivors);
+          },
+          [](const py::tuple &t) {
+            if (t.size() != 7)
+              throw std::runtime_error("Invalid state for LossHistogram");
+            const auto counts = t[3].cast<WP::Vector>();
+            const auto joint = t[4].cast<Eigen::ArrayXXd>();
+            WP::LossHistogram h(t[0].cast<double>(), counts.size(),
+                                joint.cols(), t[1].cast<double>(),
+                                t[2].cast<double>());
+            h.counts = counts;
+            h.joint = joint;
+            h.n_particles = t[5].cast<double>();
+            h.n_survivors = t[6].cast<double>();
+            return h;
+          }));
+
   py::class_<PerturbedPendulum>(m, "PerturbedPendulum")
       .def(py::init<double>(), py::arg("epsilon"))
       .def("__call__", &PerturbedPendulum::call, py::arg("s"), py::arg("t"))
-      .def("poincare", &PerturbedPendulum::poincare, py::arg("s"),
-           py::arg("t_max"))
+      .def("poincare",
+           [](const PerturbedPendulum &self, const WP::State &s, double t_max,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare(self, s, t_max, options);
+           },
+           py::arg("s"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions::poincare_default())
+      .def("poincare_many",
+           [](const PerturbedPendulum &self, const Eigen::Ref<const WP::States> &states,
+              double t_max, unsigned stride, unsigned n_threads,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare_many(self, states, t_max, stride,
+                                               n_threads, options);
+           },
+           R"pbdoc(
+        Poincare sections of an ensemble
+
+        Every particle is integrated like in `poincare` and sampled every
+        `stride` poincare_dt. The ensemble is split over `n_threads` native
+        threads with the GIL released, and the orbits are written straight
+        into the returned array. The snapshots after a failed integration
+        are NaN.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        stride: int
+        The number of poincare_dt between snapshots
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances, as for `poincare`
+
+        Returns:
+        --------
+        orbits: array-like, shape(N, n_snapshots, 2)
+        The states at 0, stride poincare_dt, 2 stride poincare_dt, ...
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("stride") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions::poincare_default())
+      .def("poincare_symplectic", &PerturbedPendulum::poincare_symplectic,
+           R"pbdoc(
+        Poincare section with a fixed step symplectic integrator
+
+        The states are sampled every `poincare_dt`, like `poincare`, but the
+        orbit is integrated with `steps_per_period` fixed steps of a
+        symplectic scheme per `poincare_dt`. This keeps the energy error
+        bounded in long runs and is much cheaper than the adaptive stepper.
+
+        Parameters:
+        -----------
+        s: array-like, shape(2,)
+        The initial state
+        t_max: float
+        The maximum integration time
+        steps_per_period: int
+        The number of steps per `poincare_dt`
+        scheme: SymplecticScheme
+        The symplectic scheme
+
+        Returns:
+        --------
+        out: array-like, shape(2, n_snapshots)
+        the states at 0, poincare_dt, 2 poincare_dt, ...
+      )pbdoc",
+           py::arg("s"), py::arg("t_max"), py::arg("steps_per_period"),
+           py::arg("scheme") = WP::SymplecticScheme::Yoshida4)
       .def("get_loss_time", &PerturbedPendulum::get_loss_time,
            py::arg("s_init"), py::arg("t_max"),
-           py::arg("boundary_type") = WP::BoundaryType::X)
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("options") = WP::IntegrationOptions())
+      .def("diffusion_moments", &PerturbedPendulum::diffusion_moments,
+           R"pbdoc(
+        Accumulate the moments of the travelling distance of an ensemble
+
+        Every particle is integrated like in `poincare` and the distance from
+        its initial state at every snapshot is folded into running (Welford)
+        moments, so only O(n_snapshots) memory is used however large the
+        ensemble. The ensemble is split over `n_threads` native threads with
+        the GIL released.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances, as for `poincare`
+
+        Returns:
+        --------
+        out: DiffusionMoments
+        the moments at the snapshots 0, poincare_dt, 2 poincare_dt, ...
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions::poincare_default(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("get_loss_times", &PerturbedPendulum::get_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble of initial states
+
+        The ensemble is integrated in C++ with the GIL released and split
+        over `n_threads` native threads.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        block_size: int
+        If positive, integrate blocks of `block_size` particles in lockstep
+        with vectorized force evaluation instead of one scalar stepper per
+        particle
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision. The lockstep engine
+        only supports StepperKind.Dopri5
+
+        Returns:
+        --------
+        out: array-like, shape(N,)
+        the loss times
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0, py::arg("block_size") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("accumulate_loss_histogram",
+           &PerturbedPendulum::accumulate_loss_histogram,
+           R"pbdoc(
+        Add the loss times of an ensemble to a LossHistogram
+
+        Like `get_loss_times` up to `hist.t_max` with one scalar stepper per
+        particle, but the loss times are binned in C++ (one histogram per
+        thread, merged at the end) instead of returned, so that ensembles
+        of any size can be processed in chunks in constant memory.
+
+        Parameters:
+        -----------
+        hist: LossHistogram
+        The histogram, updated in place
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision
+      )pbdoc",
+           py::arg("hist"), py::arg("states"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("period_map", &PerturbedPendulum::period_map,
+           R"pbdoc(
+        Apply the period map of the perturbation to an ensemble
+
+        Every state is integrated over `n_periods` periods `poincare_dt`; the
+        systems are periodic in time, so this is the `n_periods`-th iterate
+        of the stroboscopic map. The ensemble is split over `n_threads`
+        native threads with the GIL released.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The states, one particle per row
+        n_periods: int
+        The number of periods
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and grazing detection
+
+        Returns:
+        --------
+        out: array-like, shape(N, 2)
+        the mapped states, NaN for the particles lost on the way
+      )pbdoc",
+           py::arg("states"), py::arg("n_periods") = 1,
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("count_loss_times", &PerturbedPendulum::count_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble and count the work
+
+        Like `get_loss_times` with one scalar stepper per particle, but the
+        evaluations of the right hand side are counted for every particle,
+        e.g. to compare the cost of steppers and tolerances.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances
+
+        Returns:
+        --------
+        loss_times: array-like, shape(N,)
+        the loss times
+        evaluations: array-like, shape(N,)
+        the number of right hand side evaluations per particle
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("classify_loss_times", &PerturbedPendulum::classify_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble and flag the regular orbits
+
+        Like `get_loss_times` with one scalar stepper per particle. With
+        `options.regularity_window` set, every orbit is sampled once per
+        `poincare_dt` and its integration stops early once weighted Birkhoff
+        averages classify it as regular, i.e. confined by invariant tori.
+        These particles are reported with the loss time t_max.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and the regularity check
+
+        Returns:
+        --------
+        loss_times: array-like, shape(N,)
+        the loss times
+        confined: array-like, shape(N,)
+        whether the particle was classified as regular
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
       .def_readonly_static("poincare_dt", &PerturbedPendulum::poincare_dt)
   ;
 
@@ -30,16 +415,279 @@ void bind_pendulum(py::module_ &m) {
            py::arg("epsilon_low"))
       .def("__call__", &PerturbedPendulumWithLowFrequency::call, py::arg("s"),
            py::arg("t"))
-      .def("poincare", &PerturbedPendulumWithLowFrequency::poincare,
-           py::arg("s"), py::arg("t_max"))
+      .def("poincare",
+           [](const PerturbedPendulumWithLowFrequency &self, const WP::State &s, double t_max,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare(self, s, t_max, options);
+           },
+           py::arg("s"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions::poincare_default())
+      .def("poincare_many",
+           [](const PerturbedPendulumWithLowFrequency &self, const Eigen::Ref<const WP::States> &states,
+              double t_max, unsigned stride, unsigned n_threads,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare_many(self, states, t_max, stride,
+                                               n_threads, options);
+           },
+           R"pbdoc(
+        Poincare sections of an ensemble
+
+        Every particle is integrated like in `poincare` and sampled every
+        `stride` poincare_dt. The ensemble is split over `n_threads` native
+        threads with the GIL released, and the orbits are written straight
+        into the returned array. The snapshots after a failed integration
+        are NaN.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        stride: int
+        The number of poincare_dt between snapshots
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances, as for `poincare`
+
+        Returns:
+        --------
+        orbits: array-like, shape(N, n_snapshots, 2)
+        The states at 0, stride poincare_dt, 2 stride poincare_dt, ...
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("stride") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions::poincare_default())
+      .def("poincare_symplectic", &PerturbedPendulumWithLowFrequency::poincare_symplectic,
+           R"pbdoc(
+        Poincare section with a fixed step symplectic integrator
+
+        The states are sampled every `poincare_dt`, like `poincare`, but the
+        orbit is integrated with `steps_per_period` fixed steps of a
+        symplectic scheme per `poincare_dt`. This keeps the energy error
+        bounded in long runs and is much cheaper than the adaptive stepper.
+
+        Parameters:
+        -----------
+        s: array-like, shape(2,)
+        The initial state
+        t_max: float
+        The maximum integration time
+        steps_per_period: int
+        The number of steps per `poincare_dt`
+        scheme: SymplecticScheme
+        The symplectic scheme
+
+        Returns:
+        --------
+        out: array-like, shape(2, n_snapshots)
+        the states at 0, poincare_dt, 2 poincare_dt, ...
+      )pbdoc",
+           py::arg("s"), py::arg("t_max"), py::arg("steps_per_period"),
+           py::arg("scheme") = WP::SymplecticScheme::Yoshida4)
       .def("get_loss_time", &PerturbedPendulumWithLowFrequency::get_loss_time,
            py::arg("s_init"), py::arg("t_max"),
-           py::arg("boundary_type") = WP::BoundaryType::X)
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("options") = WP::IntegrationOptions())
+      .def("diffusion_moments", &PerturbedPendulumWithLowFrequency::diffusion_moments,
+           R"pbdoc(
+        Accumulate the moments of the travelling distance of an ensemble
+
+        Every particle is integrated like in `poincare` and the distance from
+        its initial state at every snapshot is folded into running (Welford)
+        moments, so only O(n_snapshots) memory is used however large the
+        ensemble. The ensemble is split over `n_threads` native threads with
+        the GIL released.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances, as for `poincare`
+
+        Returns:
+        --------
+        out: DiffusionMoments
+        the moments at the snapshots 0, poincare_dt, 2 poincare_dt, ...
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions::poincare_default(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("get_loss_times", &PerturbedPendulumWithLowFrequency::get_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble of initial states
+
+        The ensemble is integrated in C++ with the GIL released and split
+        over `n_threads` native threads.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        block_size: int
+        If positive, integrate blocks of `block_size` particles in lockstep
+        with vectorized force evaluation instead of one scalar stepper per
+        particle
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision. The lockstep engine
+        only supports StepperKind.Dopri5
+
+        Returns:
+        --------
+        out: array-like, shape(N,)
+        the loss times
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0, py::arg("block_size") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("accumulate_loss_histogram",
+           &PerturbedPendulumWithLowFrequency::accumulate_loss_histogram,
+           R"pbdoc(
+        Add the loss times of an ensemble to a LossHistogram
+
+        Like `get_loss_times` up to `hist.t_max` with one scalar stepper per
+        particle, but the loss times are binned in C++ (one histogram per
+        thread, merged at the end) instead of returned, so that ensembles
+        of any size can be processed in chunks in constant memory.
+
+        Parameters:
+        -----------
+        hist: LossHistogram
+        The histogram, updated in place
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision
+      )pbdoc",
+           py::arg("hist"), py::arg("states"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("period_map", &PerturbedPendulumWithLowFrequency::period_map,
+           R"pbdoc(
+        Apply the period map of the perturbation to an ensemble
+
+        Every state is integrated over `n_periods` periods `poincare_dt`; the
+        systems are periodic in time, so this is the `n_periods`-th iterate
+        of the stroboscopic map. The ensemble is split over `n_threads`
+        native threads with the GIL released.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The states, one particle per row
+        n_periods: int
+        The number of periods
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and grazing detection
+
+        Returns:
+        --------
+        out: array-like, shape(N, 2)
+        the mapped states, NaN for the particles lost on the way
+      )pbdoc",
+           py::arg("states"), py::arg("n_periods") = 1,
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("count_loss_times", &PerturbedPendulumWithLowFrequency::count_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble and count the work
+
+        Like `get_loss_times` with one scalar stepper per particle, but the
+        evaluations of the right hand side are counted for every particle,
+        e.g. to compare the cost of steppers and tolerances.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances
+
+        Returns:
+        --------
+        loss_times: array-like, shape(N,)
+        the loss times
+        evaluations: array-like, shape(N,)
+        the number of right hand side evaluations per particle
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("classify_loss_times", &PerturbedPendulumWithLowFrequency::classify_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble and flag the regular orbits
+
+        Like `get_loss_times` with one scalar stepper per particle. With
+        `options.regularity_window` set, every orbit is sampled once per
+        `poincare_dt` and its integration stops early once weighted Birkhoff
+        averages classify it as regular, i.e. confined by invariant tori.
+        These particles are reported with the loss time t_max.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        boundary_type: BoundaryType
+        The boundary that defines the loss region
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and the regularity check
+
+        Returns:
+        --------
+        loss_times: array-like, shape(N,)
+        the loss times
+        confined: array-like, shape(N,)
+        whether the particle was classified as regular
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"),
+           py::arg("boundary_type") = WP::BoundaryType::X,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
       .def_readonly_static("poincare_dt", &PerturbedPendulumWithLowFrequency::poincare_dt);
 
   py::class_<UnperturbedPendulum>(m, "UnperturbedPendulum")
       .def(py::init<>())
       .def("integrate", &UnperturbedPendulum::integrate, py::arg("s"),
-           py::arg("t"))
+           py::arg("t"),
+           py::arg("options") = WP::IntegrationOptions::integrate_default())
       .def("energy", &UnperturbedPendulum::energy, py::arg("s"));
 }
@@ -0,0 +1,107 @@
+#include "bind_orbits.hpp"
+#include "tape_system.hpp"
+#include <pybind11/eigen.h>
+#include <pybind11/pybind11.h>
+
+namespace py = pybind11;
+
+typedef WP::TapeSystem TapeSystem;
+
+void bind_tape_system(py::module_ &m) {
+  py::enum_<WP::TapeOp>(m, "TapeOp", R"pbdoc(
+      The instructions of a TapeSystem, see expressions.compile_force
+    )pbdoc")
+      .value("Const", WP::TapeOp::Const)
+      .value("X", WP::TapeOp::X)
+      .value("P", WP::TapeOp::P)
+      .value("T", WP::TapeOp::T)
+      .value("Add", WP::TapeOp::Add)
+      .value("Sub", WP::TapeOp::Sub)
+      .value("Mul", WP::TapeOp::Mul)
+      .value("Div", WP::TapeOp::Div)
+      .value("Pow", WP::TapeOp::Pow)
+      .value("Neg", WP::TapeOp::Neg)
+      .value("Square", WP::TapeOp::Square)
+      .value("Sin", WP::TapeOp::Sin)
+      .value("Cos", WP::TapeOp::Cos)
+      .value("Tan", WP::TapeOp::Tan)
+      .value("Exp", WP::TapeOp::Exp)
+      .value("Log", WP::TapeOp::Log)
+      .value("Sqrt", WP::TapeOp::Sqrt)
+      .value("Tanh", WP::TapeOp::Tanh)
+      .value("Abs", WP::TapeOp::Abs);
+
+  py::class_<TapeSystem>(m, "TapeSystem", R"pbdoc(
+      A particle with dx/dt = p and dp/dt = f(x, p, t), where the force is a
+      stack program compiled at runtime
+
+      Build it with expressions.build_tape_system from a Python expression.
+      The tape is checked once on construction and evaluated by a loop over
+      its instructions in C++, so it runs in the same engines as the compiled
+      systems, with the GIL released.
+
+      Parameters:
+      -----------
+      ops: array-like, shape(n,)
+      The operations, the values of TapeOp
+      values: array-like, shape(n,)
+      The value of every instruction, used by TapeOp.Const
+      poincare_dt: float
+      The period of the Poincare sections and of the period map
+    )pbdoc")
+      .def(py::init<const Eigen::ArrayXi &, const WP::Vector &, double>(),
+           py::arg("ops"), py::arg("values"), py::arg("poincare_dt"))
+      .def("__call__", &TapeSystem::call, py::arg("s"), py::arg("t"))
+      .def("__len__", &TapeSystem::size)
+      .def("force", &TapeSystem::force, py::arg("x"), py::arg("p"),
+           py::arg("t"))
+      .def_property_readonly("depends_on_p", &TapeSystem::depends_on_p)
+      .def_readonly("poincare_dt", &TapeSystem::poincare_dt)
+      .def("poincare",
+           [](const TapeSystem &self, const WP::State &s, double t_max,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare(self, s, t_max, options);
+           },
+           py::arg("s"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_many",
+           [](const TapeSystem &self,
+              const Eigen::Ref<const WP::States> &states, double t_max,
+              unsigned stride, unsigned n_threads,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare_many(self, states, t_max, stride,
+                                               n_threads, options);
+           },
+           R"pbdoc(
+        Poincare sections of an ensemble, see ThreeWaveSystem.poincare_many
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("stride") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_symplectic", &TapeSystem::poincare_symplectic,
+           py::arg("s"), py::arg("t_max"), py::arg("steps_per_period"),
+           py::arg("scheme") = WP::SymplecticScheme::Yoshida4)
+      .def("get_loss_time", &TapeSystem::get_loss_time, py::arg("s_init"),
+           py::arg("p_min"), py::arg("p_max"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("get_loss_times", &TapeSystem::get_loss_times, R"pbdoc(
+        Calculate the loss times of an ensemble of initial states, see
+        MultiWaveSystem.get_loss_times
+
+        The lockstep engine (`block_size` > 0) needs a force independent of
+        p.
+      )pbdoc",
+           py::arg("states"), py::arg("p_min"), py::arg("p_max"),
+           py::arg("t_max"), py::arg("n_threads") = 0,
+           py::arg("block_size") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("period_map", &TapeSystem::period_map, R"pbdoc(
+        Apply the map over `n_periods` periods `poincare_dt` to an ensemble,
+        see MultiWaveSystem.period_map
+      )pbdoc",
+           py::arg("states"), py::arg("p_min"), py::arg("p_max"),
+           py::arg("n_periods") = 1, py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>());
+}
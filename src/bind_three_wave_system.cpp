@@ -1,3 +1,4 @@
+#include "bind_orbits.hpp"
 #include "multiple_wave_system.hpp"
 #include <pybind11/eigen.h>
 #include <pybind11/pybind11.h>
@@ -11,8 +12,200 @@ void bind_three_wave_system(py::module_ &m) {
       .def(py::init<double>(), py::arg("epsilon"))
       .def("__call__", &ThreeWaveSystem::call, py::arg("s"), py::arg("t"))
       .def("repeat_state", &ThreeWaveSystem::repeat_state, py::arg("s"))
-      .def("poincare", &ThreeWaveSystem::poincare, py::arg("s"),
-           py::arg("t_max"))
+      .def("poincare",
+           [](const ThreeWaveSystem &self, const WP::State &s, double t_max,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare(self, s, t_max, options);
+           },
+           py::arg("s"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_many",
+           [](const ThreeWaveSystem &self, const Eigen::Ref<const WP::States> &states,
+              double t_max, unsigned stride, unsigned n_threads,
+              const WP::IntegrationOptions &options) {
+             return bind_orbits::poincare_many(self, states, t_max, stride,
+                                               n_threads, options);
+           },
+           R"pbdoc(
+        Poincare sections of an ensemble
+
+        Every particle is integrated like in `poincare` and sampled every
+        `stride` poincare_dt. The ensemble is split over `n_threads` native
+        threads with the GIL released, and the orbits are written straight
+        into the returned array. The snapshots after a failed integration
+        are NaN.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        t_max: float
+        The maximum integration time
+        stride: int
+        The number of poincare_dt between snapshots
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances, as for `poincare`
+
+        Returns:
+        --------
+        orbits: array-like, shape(N, n_snapshots, 2)
+        The states at 0, stride poincare_dt, 2 stride poincare_dt, ...
+      )pbdoc",
+           py::arg("states"), py::arg("t_max"), py::arg("stride") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions())
+      .def("poincare_symplectic", &ThreeWaveSystem::poincare_symplectic,
+           R"pbdoc(
+        Poincare section with a fixed step symplectic integrator
+
+        The states are sampled every `poincare_dt`, like `poincare`, but the
+        orbit is integrated with `steps_per_period` fixed steps of a
+        symplectic scheme per `poincare_dt`. This keeps the energy error
+        bounded in long runs and is much cheaper than the adaptive stepper.
+
+        Parameters:
+        -----------
+        s: array-like, shape(2,)
+        The initial state
+        t_max: float
+        The maximum integration time
+        steps_per_period: int
+        The number of steps per `poincare_dt`
+        scheme: SymplecticScheme
+        The symplectic scheme
+
+        Returns:
+        --------
+        out: array-like, shape(2, n_snapshots)
+        the states at 0, poincare_dt, 2 poincare_dt, ...
+      )pbdoc",
+           py::arg("s"), py::arg("t_max"), py::arg("steps_per_period"),
+           py::arg("scheme") = WP::SymplecticScheme::Yoshida4)
+      .def_readonly_static("poincare_dt", &ThreeWaveSystem::poincare_dt)
       .def("get_loss_time", &ThreeWaveSystem::get_loss_time, py::arg("s_init"),
-           py::arg("p_max"), py::arg("t_max"));
+           py::arg("p_max"), py::arg("t_max"),
+           py::arg("options") = WP::IntegrationOptions())
+      .def("get_loss_times", &ThreeWaveSystem::get_loss_times, R"pbdoc(
+        Calculate the loss times of an ensemble of initial states
+
+        The ensemble is integrated in C++ with the GIL released and split
+        over `n_threads` native threads.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        p_max: float
+        The maximum value of p allowed
+        t_max: float
+        The maximum integration time
+        n_threads: int
+        The number of threads, 0 for all available cores
+        block_size: int
+        If positive, integrate blocks of `block_size` particles in lockstep
+        with vectorized force evaluation instead of one scalar stepper per
+        particle
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision. The lockstep engine
+        only supports StepperKind.Dopri5
+
+        Returns:
+        --------
+        out: array-like, shape(N,)
+        the loss times
+      )pbdoc",
+           py::arg("states"), py::arg("p_max"), py::arg("t_max"),
+           py::arg("n_threads") = 0, py::arg("block_size") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("count_loss_times", &ThreeWaveSystem::count_loss_times,
+           R"pbdoc(
+        Calculate the loss times of an ensemble and count the work
+
+        Like `get_loss_times` with one scalar stepper per particle, but the
+        evaluations of the right hand side are counted for every particle,
+        e.g. to compare the cost of steppers and tolerances.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        p_max: float
+        The maximum value of p allowed
+        t_max: float
+        The maximum integration time
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper and tolerances
+
+        Returns:
+        --------
+        loss_times: array-like, shape(N,)
+        the loss times
+        evaluations: array-like, shape(N,)
+        the number of right hand side evaluations per particle
+      )pbdoc",
+           py::arg("states"), py::arg("p_max"), py::arg("t_max"),
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("accumulate_loss_histogram",
+           &ThreeWaveSystem::accumulate_loss_histogram,
+           R"pbdoc(
+        Add the loss times of an ensemble to a LossHistogram
+
+        Like `get_loss_times` up to `hist.t_max` with one scalar stepper per
+        particle, but the loss times are binned in C++ (one histogram per
+        thread, merged at the end) instead of returned, so that ensembles
+        of any size can be processed in chunks in constant memory.
+
+        Parameters:
+        -----------
+        hist: LossHistogram
+        The histogram, updated in place
+        states: array-like, shape(N, 2)
+        The initial states, one particle per row
+        p_max: float
+        The maximum value of p allowed
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and crossing precision
+      )pbdoc",
+           py::arg("hist"), py::arg("states"), py::arg("p_max"),
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>())
+      .def("period_map", &ThreeWaveSystem::period_map, R"pbdoc(
+        Apply the map over `n_periods` periods `poincare_dt` to an ensemble
+
+        The ensemble is integrated in C++ with the GIL released and split
+        over `n_threads` native threads.
+
+        Parameters:
+        -----------
+        states: array-like, shape(N, 2)
+        The states, one particle per row
+        p_max: float
+        The maximum value of p allowed
+        n_periods: int
+        The number of periods
+        n_threads: int
+        The number of threads, 0 for all available cores
+        options: IntegrationOptions
+        The stepper, tolerances and grazing detection
+
+        Returns:
+        --------
+        out: array-like, shape(N, 2)
+        the mapped states, NaN for the particles that reach p > p_max on the
+        way
+      )pbdoc",
+           py::arg("states"), py::arg("p_max"), py::arg("n_periods") = 1,
+           py::arg("n_threads") = 0,
+           py::arg("options") = WP::IntegrationOptions(),
+           py::call_guard<py::gil_scoped_release>());
 }
@@ -43,8 +43,13 @@ void bind_wavepacket(py::module_ &m) {
     .def("_phase", &WavePacket::_phase<double>)
     .def("_phase", &WavePacket::_phase<WP::Vector>)
     .def("__repr__", &WP::WavePacket::_to_string)
-    .def("make_integrator", &WP::WavePacket::make_integrator,
+    .def("make_integrator",
+         py::overload_cast<double, double>(&WP::WavePacket::make_integrator),
          py::arg("atol")=WP::Integrator::ATOL_DEFAULT,
-         py::arg("rtol")=WP::Integrator::RTOL_DEFAULT);
+         py::arg("rtol")=WP::Integrator::RTOL_DEFAULT)
+    .def("make_integrator",
+         py::overload_cast<const WP::IntegrationOptions&>(
+           &WP::WavePacket::make_integrator),
+         py::arg("options"));
 
 }
@@ -14,9 +14,12 @@ namespace py = pybind11;
 
 typedef WP::WavePacket WavePacket;
 
+void bind_integration_options(py::module_ &m);
 void bind_wavepacket(py::module_ &m);
 void bind_integrator(py::module_ &m);
 void bind_three_wave_system(py::module_ &m);
+void bind_multi_wave_system(py::module_ &m);
+void bind_tape_system(py::module_ &m);
 void bind_pendulum(py::module_ &m);
 
 PYBIND11_MODULE(_multiple_wave_transport, m) {
@@ -39,9 +42,12 @@ PYBIND11_MODULE(_multiple_wave_transport, m) {
   m.attr("__version__") = "dev";
   #endif
 
+  bind_integration_options(m);
   bind_wavepacket(m);
   bind_integrator(m);
   bind_three_wave_system(m);
+  bind_multi_wave_system(m);
+  bind_tape_system(m);
   bind_pendulum(m);
 
 }
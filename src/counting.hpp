@@ -0,0 +1,62 @@
+#ifndef COUNTING_EIQU7XAH
+#define COUNTING_EIQU7XAH
+#include "ensemble.hpp"
+#include "type_definitions.hpp"
+#include <utility>
+
+namespace WP {
+
+/**
+ * @brief      Wraps a system and counts the evaluations of its right hand
+ *             side, e.g. to compare the work of the steppers.
+ *
+ *             The counter is not synchronized: use one wrapper per thread
+ *             (or per particle).
+ */
+template <typename System> class CountingSystem {
+  const System &sys;
+  mutable unsigned long n_evaluations = 0;
+
+public:
+  explicit CountingSystem(const System &_sys) noexcept : sys(_sys) {}
+
+  void operator()(const State &s, State &dsdt, double t) const noexcept {
+    n_evaluations++;
+    sys(s, dsdt, t);
+  }
+
+  unsigned long evaluations() const noexcept { return n_evaluations; }
+};
+
+/**
+ * @brief      Evaluate f on every row of states in parallel, like map_states,
+ *             and count the right hand side evaluations of sys it makes.
+ *
+ * @param[in]  sys        The system
+ * @param[in]  states     The initial states, one particle per row
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  f          Callable with signature
+ *                        double(const CountingSystem<System>&, const State&)
+ * @return     The values of f and the number of evaluations, one per
+ *             particle
+ */
+template <typename System, typename F>
+std::pair<Vector, Vector> map_states_counted(
+    const System &sys, const Eigen::Ref<const States> &states,
+    unsigned n_threads, F &&f) {
+  Vector out(states.rows()), evaluations(states.rows());
+  parallel_for_ranges(states.rows(), n_threads,
+                      [&](Eigen::Index begin, Eigen::Index end) {
+                        for (auto i = begin; i < end; i++) {
+                          const CountingSystem<System> counting(sys);
+                          out[i] = f(counting, State{states.row(i).transpose()});
+                          evaluations[i] =
+                              static_cast<double>(counting.evaluations());
+                        }
+                      });
+  return {out, evaluations};
+}
+
+} // namespace WP
+
+#endif // end of include guard: COUNTING_EIQU7XAH
@@ -0,0 +1,155 @@
+#ifndef ENSEMBLE_OOGH7RAE
+#define ENSEMBLE_OOGH7RAE
+#include "type_definitions.hpp"
+#include <algorithm>
+#include <atomic>
+#include <exception>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace WP {
+
+/**
+ * @brief      Resolve the number of native threads to use.
+ *
+ *             A value of 0 means "use every available core".
+ */
+inline unsigned resolve_n_threads(unsigned n_threads) noexcept {
+  if (n_threads == 0)
+    n_threads = std::thread::hardware_concurrency();
+  return std::max(n_threads, 1u);
+}
+
+/**
+ * @brief      The number of threads parallel_for_ranges actually starts for n
+ *             items: at most one per chunk of chunk_size items.
+ */
+inline unsigned effective_n_threads(Eigen::Index n, unsigned n_threads,
+                                    Eigen::Index chunk_size = 16) noexcept {
+  const auto n_chunks = (n + chunk_size - 1) / chunk_size;
+  return static_cast<unsigned>(std::min<Eigen::Index>(
+      resolve_n_threads(n_threads), std::max<Eigen::Index>(n_chunks, 1)));
+}
+
+/**
+ * @brief      Call f(thread, begin, end) for consecutive index ranges covering
+ *             [0, n), distributed dynamically over n_threads native threads.
+ *
+ *             Ranges are handed out from a shared counter, so threads that
+ *             draw cheap particles (e.g. ones that are lost early) pick up more
+ *             work. thread is the index of the calling worker, in
+ *             [0, effective_n_threads(n, n_threads, chunk_size)), so that f
+ *             can accumulate into per-thread storage. The first exception
+ *             thrown by f is rethrown in the calling thread after all workers
+ *             have joined.
+ *
+ * @param[in]  n           The number of items
+ * @param[in]  n_threads   The number of threads, 0 for all available cores
+ * @param[in]  f           Callable with signature
+ *                         void(unsigned thread, Index begin, Index end)
+ * @param[in]  chunk_size  The number of items handed out at once
+ */
+template <typename F>
+void parallel_for_thread_ranges(Eigen::Index n, unsigned n_threads, F &&f,
+                                Eigen::Index chunk_size = 16) {
+  n_threads = effective_n_threads(n, n_threads, chunk_size);
+  const auto n_chunks = (n + chunk_size - 1) / chunk_size;
+
+  std::atomic<Eigen::Index> next_chunk{0};
+  std::exception_ptr error = nullptr;
+  std::mutex error_mutex;
+
+  auto worker = [&](unsigned thread) {
+    try {
+      for (auto chunk = next_chunk++; chunk < n_chunks; chunk = next_chunk++) {
+        const auto begin = chunk * chunk_size;
+        const auto end = std::min(begin + chunk_size, n);
+        f(thread, begin, end);
+      }
+    } catch (...) {
+      std::lock_guard<std::mutex> lock(error_mutex);
+      if (!error)
+        error = std::current_exception();
+      next_chunk = n_chunks; // stop handing out work
+    }
+  };
+
+  if (n_threads == 1) {
+    worker(0);
+  } else {
+    std::vector<std::thread> threads;
+    threads.reserve(n_threads);
+    for (unsigned i = 0; i < n_threads; i++)
+      threads.emplace_back(worker, i);
+    for (auto &th : threads)
+      th.join();
+  }
+
+  if (error)
+    std::rethrow_exception(error);
+}
+
+/**
+ * @brief      Call f(begin, end) for consecutive index ranges covering [0, n),
+ *             distributed dynamically over n_threads native threads (see
+ *             parallel_for_thread_ranges).
+ *
+ * @param[in]  n           The number of items
+ * @param[in]  n_threads   The number of threads, 0 for all available cores
+ * @param[in]  f           Callable with signature void(Index begin, Index end)
+ * @param[in]  chunk_size  The number of items handed out at once
+ */
+template <typename F>
+void parallel_for_ranges(Eigen::Index n, unsigned n_threads, F &&f,
+                         Eigen::Index chunk_size = 16) {
+  parallel_for_thread_ranges(
+      n, n_threads,
+      [&](unsigned, Eigen::Index begin, Eigen::Index end) { f(begin, end); },
+      chunk_size);
+}
+
+/**
+ * @brief      Evaluate f on every row of states in parallel.
+ *
+ * @param[in]  states     The initial states, one particle per row
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  f          Callable with signature double(const State&)
+ * @return     The values of f, one per particle
+ */
+template <typename F>
+Vector map_states(const Eigen::Ref<const States> &states, unsigned n_threads,
+                  F &&f) {
+  Vector out(states.rows());
+  parallel_for_ranges(states.rows(), n_threads,
+                      [&](Eigen::Index begin, Eigen::Index end) {
+                        for (auto i = begin; i < end; i++)
+                          out[i] = f(State{states.row(i).transpose()});
+                      });
+  return out;
+}
+
+/**
+ * @brief      Map every row of states to a new state in parallel.
+ *
+ * @param[in]  states     The states, one particle per row
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  f          Callable with signature State(const State&)
+ * @return     The new states, one particle per row
+ */
+template <typename F>
+States transform_states(const Eigen::Ref<const States> &states,
+                        unsigned n_threads, F &&f) {
+  States out(states.rows(), 2);
+  parallel_for_ranges(states.rows(), n_threads,
+                      [&](Eigen::Index begin, Eigen::Index end) {
+                        for (auto i = begin; i < end; i++)
+                          out.row(i) =
+                              f(State{states.row(i).transpose()}).transpose();
+                      });
+  return out;
+}
+
+} // namespace WP
+
+#endif // end of include guard: ENSEMBLE_OOGH7RAE
@@ -0,0 +1,218 @@
+#ifndef EVENT_LOCATION_UOH4EEWA
+#define EVENT_LOCATION_UOH4EEWA
+#include "type_definitions.hpp"
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <limits>
+
+namespace WP {
+
+/*
+ * Location of the time a particle leaves the confined domain.
+ *
+ * The domain is described by a signed boundary function g(s) of the state,
+ * negative or zero inside and positive outside. Within an accepted step the
+ * state is known through an interpolant (the dense output of the stepper)
+ * and the loss time is the root of g(state(t)). It is found with the
+ * Illinois variant of regula falsi, which converges superlinearly: a few
+ * evaluations of the interpolant give the crossing to machine precision,
+ * where bisecting to 1e-5 took about 17.
+ *
+ * A particle can leave and re-enter the domain within one step, then g is
+ * negative at both ends of the step. With grazing detection g is also
+ * evaluated at the extrema of the components of the cubic Hermite
+ * interpolant of the step, which finds these excursions for boundaries that
+ * are monotone in the components of the state.
+ */
+namespace event_location {
+
+/**
+ * @brief      Cubic Hermite interpolation of the state on a step
+ *             [t0, t0 + h], using the states and their time derivatives
+ *             at both ends.
+ */
+inline State hermite_state(double theta, double h, const State &s0,
+                           const State &f0, const State &s1,
+                           const State &f1) noexcept {
+  const double theta2 = theta * theta;
+  const double theta3 = theta2 * theta;
+  const double h00 = 2 * theta3 - 3 * theta2 + 1;
+  const double h10 = theta3 - 2 * theta2 + theta;
+  const double h01 = -2 * theta3 + 3 * theta2;
+  const double h11 = theta3 - theta2;
+  return h00 * s0 + h10 * h * f0 + h01 * s1 + h11 * h * f1;
+}
+
+/**
+ * @brief      The two ends of a step [t0, t0 + h] and the time derivatives
+ *             of the state there. Called with a time it returns the Hermite
+ *             interpolant of the step.
+ */
+struct HermiteStep {
+  double t0 = 0.0, h = 0.0;
+  State s0, f0, s1, f1;
+
+  State operator()(double t) const noexcept {
+    return hermite_state((t - t0) / h, h, s0, f0, s1, f1);
+  }
+
+  /**
+   * @brief      Move on to the next step [t1, t2] that ends in s; the
+   *             derivative f1 has to be set by the caller if it is needed.
+   */
+  void advance(double t1, double t2, const State &s) noexcept {
+    t0 = t1;
+    h = t2 - t1;
+    s0 = s1;
+    f0 = f1;
+    s1 = s;
+  }
+};
+
+/**
+ * @brief      The extrema of the components of the Hermite interpolant of a
+ *             step, as fractions of the step in (0, 1).
+ *
+ * @param[in]  step    The step
+ * @param[out] thetas  The extrema in ascending order
+ * @return     The number of extrema
+ */
+inline int hermite_extrema(const HermiteStep &step,
+                           std::array<double, 4> &thetas) noexcept {
+  int n = 0;
+  auto add = [&](double theta) {
+    if (theta > 0.0 && theta < 1.0)
+      thetas[static_cast<std::size_t>(n++)] = theta;
+  };
+
+  for (Eigen::Index i = 0; i < 2; i++) {
+    // the derivative of the cubic is a theta^2 + b theta + c
+    const double d = step.s0[i] - step.s1[i];
+    const double hf0 = step.h * step.f0[i];
+    const double hf1 = step.h * step.f1[i];
+    const double a = 6 * d + 3 * (hf0 + hf1);
+    const double b = -6 * d - 4 * hf0 - 2 * hf1;
+    const double c = hf0;
+
+    if (std::abs(a) <= std::numeric_limits<double>::epsilon() *
+                           (std::abs(b) + std::abs(c))) {
+      if (b != 0.0)
+        add(-c / b);
+      continue;
+    }
+    const double discriminant = b * b - 4 * a * c;
+    if (discriminant < 0.0)
+      continue;
+    const double q = -0.5 * (b + std::copysign(std::sqrt(discriminant), b));
+    add(q / a);
+    if (q != 0.0)
+      add(c / q);
+  }
+  std::sort(thetas.begin(), thetas.begin() + n);
+  return n;
+}
+
+/**
+ * @brief      Find the root of g in [t1, t2] with the Illinois method.
+ *
+ *             g(t1) = g1 <= 0 and g(t2) = g2 > 0 are required. The bracket
+ *             is shrunk until it is smaller than precision, or a few ulps
+ *             of t if precision is 0.
+ *
+ * @return     The midpoint of the final bracket
+ */
+template <typename G>
+double illinois(const G &g, double t1, double g1, double t2, double g2,
+                double precision) {
+  constexpr unsigned max_iterations = 100;
+  int last_side = 0;
+
+  for (unsigned i = 0; i < max_iterations; i++) {
+    const double tolerance =
+        std::max(precision, 4 * std::numeric_limits<double>::epsilon() *
+                                std::max({1.0, std::abs(t1), std::abs(t2)}));
+    if (t2 - t1 <= tolerance)
+      break;
+
+    double t = (t1 * g2 - t2 * g1) / (g2 - g1);
+    if (!(t > t1 && t < t2))
+      t = (t1 + t2) / 2;
+
+    const double g_t = g(t);
+    if (g_t > 0) {
+      t2 = t;
+      g2 = g_t;
+      if (last_side == 2)
+        g1 /= 2;
+      last_side = 2;
+    } else {
+      t1 = t;
+      g1 = g_t;
+      if (last_side == 1)
+        g2 /= 2;
+      last_side = 1;
+    }
+  }
+  return (t1 + t2) / 2;
+}
+
+/**
+ * @brief      The time the particle leaves the domain during a step.
+ *
+ *             The start of the step is assumed to be inside. Without
+ *             grazing detection a crossing is only found if the end of the
+ *             step is outside; with it, the first extremum of the
+ *             interpolant found outside ends the search bracket instead,
+ *             which needs the derivatives f0 and f1 of the step.
+ *
+ * @param[in]  state_at        The interpolant of the step, state_at(t)
+ * @param[in]  boundary        The boundary function, positive outside
+ * @param[in]  step            The ends of the step
+ * @param[in]  precision       See illinois
+ * @param[in]  detect_grazing  Whether to look for excursions within the
+ *                             step
+ * @return     The crossing time, NaN if the particle stays inside
+ */
+template <typename StateAt, typename Boundary>
+double crossing_time(const StateAt &state_at, const Boundary &boundary,
+                     const HermiteStep &step, double precision,
+                     bool detect_grazing) {
+  double t_out = step.t0 + step.h;
+  double g_out = boundary(step.s1);
+
+  if (detect_grazing) {
+    std::array<double, 4> thetas;
+    const int n = hermite_extrema(step, thetas);
+    for (int k = 0; k < n; k++) {
+      const double t = step.t0 + thetas[static_cast<std::size_t>(k)] * step.h;
+      const double g_t = boundary(state_at(t));
+      if (g_t > 0) {
+        t_out = t;
+        g_out = g_t;
+        break;
+      }
+    }
+  }
+
+  if (!(g_out > 0))
+    return std::numeric_limits<double>::quiet_NaN();
+
+  return illinois([&](double t) { return boundary(state_at(t)); }, step.t0,
+                  boundary(step.s0), t_out, g_out, precision);
+}
+
+/**
+ * @brief      crossing_time on the Hermite interpolant of the step.
+ */
+template <typename Boundary>
+double crossing_time(const Boundary &boundary, const HermiteStep &step,
+                     double precision, bool detect_grazing) {
+  return crossing_time(step, boundary, step, precision, detect_grazing);
+}
+
+} // namespace event_location
+
+} // namespace WP
+
+#endif // end of include guard: EVENT_LOCATION_UOH4EEWA
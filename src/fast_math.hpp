@@ -0,0 +1,104 @@
+#ifndef FAST_MATH_AHD5OOTH
+#define FAST_MATH_AHD5OOTH
+#include <cmath>
+
+#if defined(__GNUC__)
+#define WP_ALWAYS_INLINE inline __attribute__((always_inline))
+#else
+#define WP_ALWAYS_INLINE inline
+#endif
+
+namespace WP {
+namespace fast_math {
+
+/*
+ * Branch-free sine and cosine for use inside loops over particle blocks.
+ *
+ * std::sin/std::cos are opaque library calls that stop the compiler from
+ * vectorizing a loop, and Eigen 3.4 has no packet sin/cos for doubles.
+ * These use a three-part Cody-Waite reduction to [-pi/4, pi/4] and the
+ * Cephes minimax polynomials, so a loop calling them auto-vectorizes.
+ * The result agrees with std::sin/std::cos to a few ulp for the phase
+ * magnitudes that occur in the wave systems (|x| < 1e5).
+ */
+
+namespace detail {
+constexpr double two_over_pi = 0.63661977236758134308;
+constexpr double pio2_1 = 1.57079625129699707031E0;
+constexpr double pio2_2 = 7.54978941586159635335E-8;
+constexpr double pio2_3 = 5.39030285815811905290E-15;
+
+WP_ALWAYS_INLINE double sin_poly(double r, double r2) noexcept {
+  return r + r * r2 *
+                 (((((1.58962301576546568060E-10 * r2 -
+                      2.50507477628578072866E-8) *
+                         r2 +
+                     2.75573136213857245213E-6) *
+                        r2 -
+                    1.98412698295895385996E-4) *
+                       r2 +
+                   8.33333333332211858878E-3) *
+                      r2 -
+                  1.66666666666666307295E-1);
+}
+
+WP_ALWAYS_INLINE double cos_poly(double r2) noexcept {
+  return 1.0 - 0.5 * r2 +
+         r2 * r2 *
+             (((((-1.13585365213876817300E-11 * r2 +
+                  2.08757008419747316778E-9) *
+                     r2 -
+                 2.75573141792967388112E-7) *
+                    r2 +
+                2.48015872888517045348E-5) *
+                   r2 -
+               1.38888888888730564116E-3) *
+                  r2 +
+              4.16666666666665929218E-2);
+}
+
+/**
+ * @brief      Reduce x = k pi/2 + r with |r| <= pi/4.
+ *
+ * @return     The quadrant k mod 4 as a double in {0, 1, 2, 3}
+ */
+WP_ALWAYS_INLINE double reduce(double x, double &r) noexcept {
+  const double k = std::nearbyint(x * two_over_pi);
+  r = ((x - k * pio2_1) - k * pio2_2) - k * pio2_3;
+  // floor(k / 4), written with nearbyint (no tie is possible for integer k)
+  // because std::floor does not vectorize
+  return k - 4.0 * std::nearbyint(0.25 * k - 0.375);
+}
+} // namespace detail
+
+WP_ALWAYS_INLINE void sincos(double x, double &s, double &c) noexcept {
+  double r;
+  const double q = detail::reduce(x, r);
+  const double r2 = r * r;
+  const double sr = detail::sin_poly(r, r2);
+  const double cr = detail::cos_poly(r2);
+
+  const bool swap = (q == 1.0) || (q == 3.0);
+  const double s_sign = (q >= 2.0) ? -1.0 : 1.0;
+  const double c_sign = ((q == 1.0) || (q == 2.0)) ? -1.0 : 1.0;
+
+  s = s_sign * (swap ? cr : sr);
+  c = c_sign * (swap ? sr : cr);
+}
+
+WP_ALWAYS_INLINE double sin(double x) noexcept {
+  double s, c;
+  sincos(x, s, c);
+  return s;
+}
+
+WP_ALWAYS_INLINE double cos(double x) noexcept {
+  double s, c;
+  sincos(x, s, c);
+  return c;
+}
+
+} // namespace fast_math
+} // namespace WP
+
+#endif // end of include guard: FAST_MATH_AHD5OOTH
@@ -3,8 +3,8 @@
 using namespace WP::collections;
 
 OrbitStdVector::operator OrbitPoints() const {
-  WP::OrbitPoints out(4, size());
-  for (long unsigned i = 0; i < size(); i++)
-    out.col(i) = (*this)[i];
+  WP::OrbitPoints out(2, static_cast<Eigen::Index>(size()));
+  for (Eigen::Index i = 0; i < out.cols(); i++)
+    out.col(i) = (*this)[static_cast<size_type>(i)];
   return out;
 }
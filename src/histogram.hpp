@@ -0,0 +1,147 @@
+#ifndef HISTOGRAM_EEJ4OHQU
+#define HISTOGRAM_EEJ4OHQU
+#include "ensemble.hpp"
+#include "type_definitions.hpp"
+#include <cmath>
+#include <stdexcept>
+#include <vector>
+
+namespace WP {
+
+/**
+ * @brief      Histogram of the loss times of an ensemble, accumulated one
+ *             particle at a time so that the memory does not grow with the
+ *             number of particles.
+ *
+ *             counts holds the particles lost in the n_bins equal bins of
+ *             [0, t_max); the particles with loss time >= t_max are counted
+ *             as survivors. If n_p_bins > 0, joint additionally holds the
+ *             lost particles binned by loss time (rows) and initial momentum
+ *             in n_p_bins equal bins of [p_min, p_max) (columns); particles
+ *             with an initial momentum outside of that range are left out of
+ *             joint only. Histograms with the same binning are combined with
+ *             merge, e.g. one per thread or per chunk of an ensemble.
+ */
+struct LossHistogram {
+  double t_max = 0;
+  double p_min = 0, p_max = 0;
+  Vector counts;
+  Eigen::ArrayXXd joint;
+  double n_particles = 0;
+  double n_survivors = 0;
+
+  LossHistogram() = default;
+  LossHistogram(double _t_max, Eigen::Index n_bins, Eigen::Index n_p_bins = 0,
+                double _p_min = 0, double _p_max = 0)
+      : t_max(_t_max), p_min(_p_min), p_max(_p_max),
+        counts(Vector::Zero(n_bins)),
+        joint(Eigen::ArrayXXd::Zero(n_p_bins > 0 ? n_bins : 0, n_p_bins)) {
+    if (!(t_max > 0) || n_bins < 1)
+      throw std::invalid_argument("need t_max > 0 and at least one bin");
+    if (n_p_bins < 0 || (n_p_bins > 0 && !(p_max > p_min)))
+      throw std::invalid_argument("need p_max > p_min for the joint histogram");
+  }
+
+  /**
+   * @brief      An empty histogram with the same binning.
+   */
+  LossHistogram empty_like() const {
+    return LossHistogram(t_max, counts.size(), joint.cols(), p_min, p_max);
+  }
+
+  /**
+   * @brief      Add a particle with the given loss time and initial momentum.
+   */
+  void push(double loss_time, double p_init) noexcept {
+    n_particles += 1;
+    if (!(loss_time < t_max)) {
+      n_survivors += 1;
+      return;
+    }
+    const auto n_bins = counts.size();
+    const auto bin = std::min<Eigen::Index>(
+        static_cast<Eigen::Index>(std::max(loss_time, 0.0) / t_max *
+                                  static_cast<double>(n_bins)),
+        n_bins - 1);
+    counts[bin] += 1;
+
+    const auto n_p_bins = joint.cols();
+    if (n_p_bins == 0 || !(p_init >= p_min && p_init < p_max))
+      return;
+    const auto p_bin = std::min<Eigen::Index>(
+        static_cast<Eigen::Index>((p_init - p_min) / (p_max - p_min) *
+                                   static_cast<double>(n_p_bins)),
+        n_p_bins - 1);
+    joint(bin, p_bin) += 1;
+  }
+
+  bool same_binning(const LossHistogram &other) const noexcept {
+    return t_max == other.t_max && counts.size() == other.counts.size() &&
+           joint.cols() == other.joint.cols() && p_min == other.p_min &&
+           p_max == other.p_max;
+  }
+
+  /**
+   * @brief      Combine the particles of other into this histogram.
+   */
+  void merge(const LossHistogram &other) {
+    if (!same_binning(other))
+      throw std::invalid_argument("the histograms have different bins");
+    counts += other.counts;
+    joint += other.joint;
+    n_particles += other.n_particles;
+    n_survivors += other.n_survivors;
+  }
+
+  /**
+   * @brief      The n_bins + 1 edges of the loss time bins.
+   */
+  Vector edges() const {
+    return Vector::LinSpaced(counts.size() + 1, 0.0, t_max);
+  }
+
+  /**
+   * @brief      The number of particles not lost yet at every edge.
+   */
+  Vector survival() const {
+    Vector out(counts.size() + 1);
+    out[0] = n_particles;
+    for (Eigen::Index k = 0; k < counts.size(); k++)
+      out[k + 1] = out[k] - counts[k];
+    return out;
+  }
+};
+
+/**
+ * @brief      Accumulate the loss times of an ensemble into a histogram.
+ *
+ *             Every thread fills its own histogram, and these are merged
+ *             into hist at the end, so the result does not depend on the
+ *             scheduling.
+ *
+ * @param      hist       The histogram to add the particles to
+ * @param[in]  states     The initial states, one particle per row
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  loss_time  Callable with signature double(const State&)
+ */
+template <typename F>
+void accumulate_loss_histogram(LossHistogram &hist,
+                               const Eigen::Ref<const States> &states,
+                               unsigned n_threads, F &&loss_time) {
+  std::vector<LossHistogram> local(
+      effective_n_threads(states.rows(), n_threads), hist.empty_like());
+  parallel_for_thread_ranges(
+      states.rows(), n_threads,
+      [&](unsigned thread, Eigen::Index begin, Eigen::Index end) {
+        for (auto i = begin; i < end; i++) {
+          const State s{states.row(i).transpose()};
+          local[thread].push(loss_time(s), s[1]);
+        }
+      });
+  for (const auto &h : local)
+    hist.merge(h);
+}
+
+} // namespace WP
+
+#endif // end of include guard: HISTOGRAM_EEJ4OHQU
@@ -0,0 +1,66 @@
+#ifndef INTEGRATION_OPTIONS_EEPH4SHO
+#define INTEGRATION_OPTIONS_EEPH4SHO
+#include "symplectic.hpp"
+
+namespace WP {
+
+enum class StepperKind { Dopri5, CashKarp54, BulirschStoer, Symplectic };
+
+/**
+ * @brief      Stepper and tolerances used by the integration entry points.
+ *
+ *             The defaults reproduce the settings of get_loss_time. The
+ *             adaptive steppers use atol/rtol and start with dt_init (the
+ *             Poincare sections start every snapshot interval with a step of
+ *             poincare_dt instead). The symplectic stepper takes
+ *             steps_per_period fixed steps of the given scheme per
+ *             poincare_dt; systems without a period use steps of dt_init.
+ *             Loss times are located to within crossing_precision, or to
+ *             machine precision if it is 0; with detect_grazing, exits and
+ *             re-entries within one step are found as well (see
+ *             event_location).
+ *
+ *             If regularity_window is positive, the loss time calculation
+ *             samples the orbit once per poincare_dt and stops early once
+ *             weighted Birkhoff averages over consecutive windows of
+ *             regularity_window samples agree to regularity_digits digits:
+ *             the orbit is then regular, confined by invariant tori, and
+ *             reported as not lost (see BirkhoffRegularity).
+ */
+struct IntegrationOptions {
+  StepperKind stepper = StepperKind::Dopri5;
+  double atol = 1.0e-10;
+  double rtol = 1.0e-10;
+  double dt_init = 1.0e-3;
+  double crossing_precision = 0.0;
+  SymplecticScheme scheme = SymplecticScheme::Yoshida4;
+  unsigned steps_per_period = 64;
+  bool detect_grazing = false;
+  unsigned regularity_window = 0;
+  double regularity_digits = 4.0;
+
+  /**
+   * @brief      The settings historically used for the pendulum Poincare
+   *             sections.
+   */
+  static IntegrationOptions poincare_default() noexcept {
+    IntegrationOptions opts;
+    opts.atol = 1.0e-9;
+    opts.rtol = 1.0e-9;
+    return opts;
+  }
+
+  /**
+   * @brief      The settings historically used to integrate single states
+   *             over a time interval.
+   */
+  static IntegrationOptions integrate_default() noexcept {
+    IntegrationOptions opts;
+    opts.dt_init = 0.01;
+    return opts;
+  }
+};
+
+} // namespace WP
+
+#endif // end of include guard: INTEGRATION_OPTIONS_EEPH4SHO
@@ -1,36 +1,75 @@
 #include <Eigen/Core>
-#include <boost/numeric/odeint.hpp>
-#include <boost/numeric/odeint/algebra/vector_space_algebra.hpp>
-#include <boost/numeric/odeint/external/eigen/eigen_algebra.hpp>
+#include "ensemble.hpp"
+#include "steppers.hpp"
 #include "wavepacket.hpp"
 #include "type_definitions.hpp"
+#include <stdexcept>
 namespace WP{
-  namespace odeint = boost::numeric::odeint;
 
-
-using error_stepper_type = odeint::runge_kutta_cash_karp54<State,double,State,double,odeint::vector_space_algebra > ;
-
-
-
-using controlled_stepper_type = odeint::controlled_runge_kutta< error_stepper_type > ;
-    
+IntegrationOptions Integrator::default_options(double atol,
+                                               double rtol) noexcept {
+  IntegrationOptions options;
+  options.stepper = StepperKind::CashKarp54;
+  options.atol = atol;
+  options.rtol = rtol;
+  options.dt_init = DT_INIT_DEFAULT;
+  return options;
+}
 
 Integrator::Integrator(WavePacket& wp, double atol, double rtol):
-_wp{&wp},_atol{atol},_rtol{rtol}{}
+_wp{&wp},_options{default_options(atol, rtol)}{}
+
+Integrator::Integrator(WavePacket& wp, const IntegrationOptions& options):
+_wp{&wp},_options{options}{}
 
 State Integrator::integrate(State s0, std::pair<double, double> t_integr) const
 {
+  auto const [t_0, t_end] = t_integr;
+  const auto system = [this](const State& s, State &dsdt, double t){_wp->rhs(s, dsdt, t);};
 
-  auto controlled_stepper=odeint::make_controlled(_atol, _rtol, error_stepper_type());
+  return integrate_state(system, s0, t_0, t_end, _options);
+}
 
-  auto const [t_0, t_end] = t_integr;
-  double dt_init = 0.01;
+void Integrator::integrate_many(const Eigen::Ref<const States> &points,
+                                std::pair<double, double> t_integr,
+                                Eigen::Ref<States> out,
+                                unsigned n_threads) const
+{
+  if (out.rows() != points.rows())
+    throw std::invalid_argument("out needs one row per point");
+  parallel_for_ranges(points.rows(), n_threads,
+                      [&](Eigen::Index begin, Eigen::Index end) {
+                        for (auto i = begin; i < end; i++)
+                          out.row(i) = integrate(points.row(i).transpose(),
+                                                 t_integr).transpose();
+                      });
+}
+
+void Integrator::integrate_many_at(const Eigen::Ref<const States> &points,
+                                   const Vector &times,
+                                   Eigen::Ref<RowMatrix> out,
+                                   unsigned n_threads) const
+{
+  const auto n_times = times.size();
+  if (n_times == 0)
+    throw std::invalid_argument("need at least one output time");
+  for (Eigen::Index k = 1; k < n_times; k++)
+    if (!(times[k] >= times[k - 1]))
+      throw std::invalid_argument("the output times must be non-decreasing");
+  if (out.rows() != points.rows() || out.cols() != 2 * n_times)
+    throw std::invalid_argument("out needs the shape (N, 2 * n_times)");
 
-  integrate_adaptive(
-  controlled_stepper,[this](const State& s, State &dsdt, double t){dsdt = _wp->system(s,t);},
-  s0, t_0, t_end, dt_init
-  );
-  return s0;
+  parallel_for_ranges(
+      points.rows(), n_threads, [&](Eigen::Index begin, Eigen::Index end) {
+        for (auto i = begin; i < end; i++) {
+          State s = points.row(i).transpose();
+          out.block<1, 2>(i, 0) = s.transpose();
+          for (Eigen::Index k = 1; k < n_times; k++) {
+            s = integrate(s, {times[k - 1], times[k]});
+            out.block<1, 2>(i, 2 * k) = s.transpose();
+          }
+        }
+      });
 }
 
 }
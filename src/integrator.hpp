@@ -1,5 +1,6 @@
 #ifndef WP_INTEGRATOR_DEFINITIONS
 #define WP_INTEGRATOR_DEFINITIONS
+#include "integration_options.hpp"
 #include "type_definitions.hpp"
 namespace WP{
 class WavePacket;
@@ -10,19 +11,56 @@ class Integrator
 public:
   static constexpr double ATOL_DEFAULT=1e-10;
   static constexpr double RTOL_DEFAULT=1e-10;
+  static constexpr double DT_INIT_DEFAULT=0.01;
 
   Integrator(WavePacket&,
     double atol=ATOL_DEFAULT, double rtol=RTOL_DEFAULT);
+  Integrator(WavePacket&, const IntegrationOptions& options);
   Integrator(Integrator &&) = default;
   Integrator(const Integrator &) = default;
   ~Integrator() = default;
 
   State integrate(State s0, std::pair<double, double> t_integr) const;
 
+  void integrate_many(const Eigen::Ref<const States> &points,
+                      std::pair<double, double> t_integr,
+                      Eigen::Ref<States> out, unsigned n_threads = 0) const;
+  /**
+   * @brief      Integrate every row of points from t_integr.first to
+   *             t_integr.second, split over n_threads native threads.
+   *
+   * @param[in]  points     The initial states, one particle per row
+   * @param[in]  t_integr   The start and end time
+   * @param      out        The final states, same shape as points
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   */
+
+  void integrate_many_at(const Eigen::Ref<const States> &points,
+                         const Vector &times, Eigen::Ref<RowMatrix> out,
+                         unsigned n_threads = 0) const;
+  /**
+   * @brief      Integrate every row of points, the states at times[0], and
+   *             record it at all the (non-decreasing) times.
+   *
+   * @param[in]  points     The initial states, one particle per row
+   * @param[in]  times      The output times
+   * @param      out        The states, one particle per row and
+   *                        (z, p) of every time in consecutive columns,
+   *                        shape (N, 2 * n_times)
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   */
+
+  static IntegrationOptions default_options(double atol=ATOL_DEFAULT,
+                                            double rtol=RTOL_DEFAULT) noexcept;
+  /**
+   * @brief      The options of the historical Integrator: Cash-Karp 5(4)
+   *             with a first step of DT_INIT_DEFAULT.
+   */
+
 private:
 
   WavePacket* _wp;
-  double _atol, _rtol;
+  IntegrationOptions _options;
 };
 }
 #endif // !WP_INTEGRATOR_DEFINITIONS
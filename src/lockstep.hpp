@@ -0,0 +1,287 @@
+#ifndef LOCKSTEP_EIZ9QUAE
+#define LOCKSTEP_EIZ9QUAE
+#include "ensemble.hpp"
+#include "event_location.hpp"
+#include "integration_options.hpp"
+#include "type_definitions.hpp"
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include <string>
+
+namespace WP {
+
+/*
+ * Lockstep ensemble engine.
+ *
+ * A block of particles is stored as a structure of arrays and advanced with
+ * the Dormand-Prince 5(4) pair in lockstep: every lane performs one step
+ * attempt per sweep, but with its own time and step size, so the adaptive
+ * step control is per lane. All stage computations are whole-array
+ * operations and the force is evaluated for the whole block at once with
+ * System::block_force, which is written so that it vectorizes.
+ *
+ * A lane whose particle is lost or reaches t_max is refilled with the next
+ * particle of the range; once the range is exhausted the lane is masked
+ * (dt = 0) until the rest of the block finishes.
+ *
+ * All systems handled here have dx/dt = p, so only the force is needed.
+ *
+ * A lane whose step is rejected max_rejected_steps times in a row, or whose
+ * step size no longer advances its time (e.g. because the force is NaN),
+ * aborts the calculation like odeint's failed_step_checker does for the
+ * scalar steppers.
+ */
+
+namespace lockstep {
+
+namespace dopri5 {
+constexpr double c2 = 1.0 / 5, c3 = 3.0 / 10, c4 = 4.0 / 5, c5 = 8.0 / 9;
+
+constexpr double a21 = 1.0 / 5;
+constexpr double a31 = 3.0 / 40, a32 = 9.0 / 40;
+constexpr double a41 = 44.0 / 45, a42 = -56.0 / 15, a43 = 32.0 / 9;
+constexpr double a51 = 19372.0 / 6561, a52 = -25360.0 / 2187,
+                 a53 = 64448.0 / 6561, a54 = -212.0 / 729;
+constexpr double a61 = 9017.0 / 3168, a62 = -355.0 / 33, a63 = 46732.0 / 5247,
+                 a64 = 49.0 / 176, a65 = -5103.0 / 18656;
+constexpr double b1 = 35.0 / 384, b3 = 500.0 / 1113, b4 = 125.0 / 192,
+                 b5 = -2187.0 / 6784, b6 = 11.0 / 84;
+
+// difference between the 5th and the embedded 4th order weights
+constexpr double e1 = 71.0 / 57600, e3 = -71.0 / 16695, e4 = 71.0 / 1920,
+                 e5 = -17253.0 / 339200, e6 = 22.0 / 525, e7 = -1.0 / 40;
+} // namespace dopri5
+
+// the number of consecutive rejected steps after which a lane gives up, the
+// default of odeint's failed_step_checker
+constexpr int max_rejected_steps = 500;
+
+template <typename System, typename Boundary> class LossTimeBlock {
+  const System &sys;
+  const Boundary &boundary;
+  double t_max, atol, rtol, dt_init, precision;
+  bool detect_grazing;
+
+  Eigen::Index n_lanes;
+  // per lane state, step size and force at the current state (FSAL)
+  Vector x, p, t, dt, f;
+  Eigen::Array<Eigen::Index, Eigen::Dynamic, 1> particle;
+  Eigen::ArrayXi n_rejected;
+  Eigen::Array<bool, Eigen::Dynamic, 1> active;
+  // stage buffers
+  Vector xs, ts, P2, P3, P4, P5, P6, F2, F3, F4, F5, F6, F7, x_new, p_new, err;
+
+public:
+  LossTimeBlock(const System &_sys, const Boundary &_boundary,
+                Eigen::Index _n_lanes, double _t_max,
+                const IntegrationOptions &opts)
+      : sys(_sys), boundary(_boundary), t_max(_t_max), atol(opts.atol),
+        rtol(opts.rtol), dt_init(opts.dt_init),
+        precision(opts.crossing_precision),
+        detect_grazing(opts.detect_grazing), n_lanes(_n_lanes),
+        x(Vector::Constant(_n_lanes, 0.0)), p(Vector::Zero(_n_lanes)),
+        t(Vector::Zero(_n_lanes)), dt(Vector::Zero(_n_lanes)),
+        f(Vector::Zero(_n_lanes)), particle(_n_lanes),
+        n_rejected(Eigen::ArrayXi::Zero(_n_lanes)),
+        active(Eigen::Array<bool, Eigen::Dynamic, 1>::Constant(_n_lanes,
+                                                                false)),
+        xs(_n_lanes), ts(_n_lanes), P2(_n_lanes), P3(_n_lanes), P4(_n_lanes),
+        P5(_n_lanes), P6(_n_lanes), F2(_n_lanes), F3(_n_lanes), F4(_n_lanes),
+        F5(_n_lanes), F6(_n_lanes), F7(_n_lanes), x_new(_n_lanes),
+        p_new(_n_lanes), err(_n_lanes) {}
+
+  /**
+   * @brief      Calculate the loss times of the particles in
+   *             [begin, end) and write them into out.
+   */
+  void run(const Eigen::Ref<const States> &states, Eigen::Index begin,
+           Eigen::Index end, Vector &out) {
+    auto next = begin;
+
+    auto refill = [&](Eigen::Index lane) {
+      while (next < end) {
+        const State s = states.row(next).transpose();
+        if (boundary(s) > 0) {
+          out[next++] = 0.0;
+          continue;
+        }
+        x[lane] = s[0];
+        p[lane] = s[1];
+        t[lane] = 0.0;
+        dt[lane] = std::min(dt_init, t_max);
+        particle[lane] = next++;
+        n_rejected[lane] = 0;
+        active[lane] = true;
+        return true;
+      }
+      active[lane] = false;
+      dt[lane] = 0.0;
+      return false;
+    };
+
+    for (Eigen::Index lane = 0; lane < n_lanes; lane++)
+      refill(lane);
+    sys.block_force(x, t, f);
+
+    while (active.any()) {
+      attempt_step();
+
+      bool refilled = false;
+      for (Eigen::Index lane = 0; lane < n_lanes; lane++) {
+        if (!active[lane])
+          continue;
+        if (!(err[lane] <= 1.0)) {
+          dt[lane] = decrease_step(dt[lane], err[lane]);
+          // a step size that no longer advances the time would be accepted
+          // forever
+          if (++n_rejected[lane] >= max_rejected_steps ||
+              t[lane] + dt[lane] == t[lane])
+            throw std::runtime_error(
+                "Max number of iterations exceeded (" +
+                std::to_string(max_rejected_steps) +
+                "). A new step size was not found.");
+          continue;
+        }
+        n_rejected[lane] = 0;
+
+        const event_location::HermiteStep step{
+            t[lane],
+            dt[lane],
+            {x[lane], p[lane]},
+            {p[lane], f[lane]},
+            {x_new[lane], p_new[lane]},
+            {p_new[lane], F7[lane]}};
+        const double t_cross = event_location::crossing_time(
+            boundary, step, precision, detect_grazing);
+        if (!std::isnan(t_cross)) {
+          out[particle[lane]] = std::min(t_cross, t_max);
+          refilled |= refill(lane);
+          continue;
+        }
+
+        t[lane] += dt[lane];
+        x[lane] = x_new[lane];
+        p[lane] = p_new[lane];
+        f[lane] = F7[lane];
+
+        if (t[lane] >= t_max) {
+          out[particle[lane]] = t_max;
+          refilled |= refill(lane);
+          continue;
+        }
+        dt[lane] = std::min(increase_step(dt[lane], err[lane]),
+                            t_max - t[lane]);
+      }
+      if (refilled)
+        sys.block_force(x, t, f);
+    }
+  }
+
+private:
+  void attempt_step() {
+    using namespace dopri5;
+    // stage 2
+    xs = x + dt * (a21 * p);
+    P2 = p + dt * (a21 * f);
+    ts = t + c2 * dt;
+    sys.block_force(xs, ts, F2);
+    // stage 3
+    xs = x + dt * (a31 * p + a32 * P2);
+    P3 = p + dt * (a31 * f + a32 * F2);
+    ts = t + c3 * dt;
+    sys.block_force(xs, ts, F3);
+    // stage 4
+    xs = x + dt * (a41 * p + a42 * P2 + a43 * P3);
+    P4 = p + dt * (a41 * f + a42 * F2 + a43 * F3);
+    ts = t + c4 * dt;
+    sys.block_force(xs, ts, F4);
+    // stage 5
+    xs = x + dt * (a51 * p + a52 * P2 + a53 * P3 + a54 * P4);
+    P5 = p + dt * (a51 * f + a52 * F2 + a53 * F3 + a54 * F4);
+    ts = t + c5 * dt;
+    sys.block_force(xs, ts, F5);
+    // stage 6
+    xs = x + dt * (a61 * p + a62 * P2 + a63 * P3 + a64 * P4 + a65 * P5);
+    P6 = p + dt * (a61 * f + a62 * F2 + a63 * F3 + a64 * F4 + a65 * F5);
+    ts = t + dt;
+    sys.block_force(xs, ts, F6);
+    // stage 7 (FSAL): the force at the new state
+    x_new = x + dt * (b1 * p + b3 * P3 + b4 * P4 + b5 * P5 + b6 * P6);
+    p_new = p + dt * (b1 * f + b3 * F3 + b4 * F4 + b5 * F5 + b6 * F6);
+    sys.block_force(x_new, ts, F7);
+
+    // error estimate, scaled as odeint's default_error_checker
+    err = ((dt * (e1 * p + e3 * P3 + e4 * P4 + e5 * P5 + e6 * P6 +
+                  e7 * p_new))
+               .abs() /
+           (atol + rtol * (x.abs() + dt * p.abs())))
+              .max((dt * (e1 * f + e3 * F3 + e4 * F4 + e5 * F5 + e6 * F6 +
+                          e7 * F7))
+                       .abs() /
+                   (atol + rtol * (p.abs() + dt * f.abs())));
+  }
+
+  // step size adjustment as odeint's default_step_adjuster for dopri5
+  // a NaN error estimate (a non-finite force) gives the largest decrease
+  static double decrease_step(double h, double error) noexcept {
+    if (!std::isfinite(error))
+      return 0.2 * h;
+    return h * std::max(0.9 * std::pow(error, -1.0 / 3.0), 0.2);
+  }
+
+  static double increase_step(double h, double error) noexcept {
+    if (error < 0.5) {
+      error = std::max(std::pow(5.0, -5.0), error);
+      return h * 0.9 * std::pow(error, -1.0 / 5.0);
+    }
+    return h;
+  }
+};
+
+} // namespace lockstep
+
+/**
+ * @brief      Calculate the loss times of an ensemble with the lockstep
+ *             engine, splitting it over n_threads native threads.
+ *
+ * @param[in]  sys         The system, providing block_force
+ * @param[in]  states      The initial states, one particle per row
+ * @param[in]  t_max       The maximum integration time
+ * @param[in]  boundary    Boundary function of the confined domain,
+ *                         positive outside
+ * @param[in]  n_threads   The number of threads, 0 for all available cores
+ * @param[in]  block_size  The number of lanes integrated in lockstep
+ * @param[in]  opts        The tolerances, the initial step, the crossing
+ *                         precision and the grazing detection; the
+ *                         stepper must be Dopri5
+ * @return     The loss times, one per particle
+ */
+template <typename System, typename Boundary>
+Vector lockstep_loss_times(const System &sys,
+                           const Eigen::Ref<const States> &states,
+                           double t_max, const Boundary &boundary,
+                           unsigned n_threads, Eigen::Index block_size,
+                           const IntegrationOptions &opts = {}) {
+  if (opts.stepper != StepperKind::Dopri5)
+    throw std::invalid_argument(
+        "the lockstep engine only supports the Dopri5 stepper");
+  if (opts.regularity_window > 0)
+    throw std::invalid_argument(
+        "the lockstep engine does not support the regularity check");
+
+  Vector out(states.rows());
+  parallel_for_ranges(
+      states.rows(), n_threads,
+      [&](Eigen::Index begin, Eigen::Index end) {
+        lockstep::LossTimeBlock<System, Boundary> block(
+            sys, boundary, block_size, t_max, opts);
+        block.run(states, begin, end, out);
+      },
+      8 * block_size);
+  return out;
+}
+
+} // namespace WP
+
+#endif // end of include guard: LOCKSTEP_EIZ9QUAE
@@ -0,0 +1,82 @@
+#ifndef MOMENTS_OHR5EICE
+#define MOMENTS_OHR5EICE
+#include "type_definitions.hpp"
+#include <cmath>
+
+namespace WP {
+
+/**
+ * @brief      Running central moments of a quantity sampled at a fixed set
+ *             of snapshots, accumulated one particle at a time.
+ *
+ *             The updates are Welford's, extended to the third and fourth
+ *             moments (Terriberry), and two accumulators are combined with
+ *             the pairwise formulas of Chan et al., so that every thread can
+ *             accumulate its own particles and the results are merged at the
+ *             end. m2, m3 and m4 are the sums of the 2nd, 3rd and 4th powers
+ *             of the deviations from the mean.
+ */
+struct DiffusionMoments {
+  Vector times;
+  Vector count, mean, m2, m3, m4;
+
+  DiffusionMoments() = default;
+  explicit DiffusionMoments(const Vector &_times)
+      : times(_times), count(Vector::Zero(_times.size())),
+        mean(Vector::Zero(_times.size())), m2(Vector::Zero(_times.size())),
+        m3(Vector::Zero(_times.size())), m4(Vector::Zero(_times.size())) {}
+
+  /**
+   * @brief      Add the sample x at snapshot k.
+   */
+  void push(Eigen::Index k, double x) noexcept {
+    const double n1 = count[k];
+    const double n = n1 + 1;
+    const double delta = x - mean[k];
+    const double delta_n = delta / n;
+    const double delta_n2 = delta_n * delta_n;
+    const double term1 = delta * delta_n * n1;
+
+    count[k] = n;
+    mean[k] += delta_n;
+    m4[k] += term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * m2[k] -
+             4 * delta_n * m3[k];
+    m3[k] += term1 * delta_n * (n - 2) - 3 * delta_n * m2[k];
+    m2[k] += term1;
+  }
+
+  /**
+   * @brief      Combine the samples of other into this accumulator.
+   */
+  void merge(const DiffusionMoments &other) noexcept {
+    for (Eigen::Index k = 0; k < count.size(); k++) {
+      const double na = count[k];
+      const double nb = other.count[k];
+      if (nb == 0)
+        continue;
+      const double n = na + nb;
+      const double delta = other.mean[k] - mean[k];
+      const double delta2 = delta * delta;
+      const double delta3 = delta2 * delta;
+      const double delta4 = delta2 * delta2;
+
+      m4[k] += other.m4[k] +
+               delta4 * na * nb * (na * na - na * nb + nb * nb) / (n * n * n) +
+               6 * delta2 * (na * na * other.m2[k] + nb * nb * m2[k]) / (n * n) +
+               4 * delta * (na * other.m3[k] - nb * m3[k]) / n;
+      m3[k] += other.m3[k] + delta3 * na * nb * (na - nb) / (n * n) +
+               3 * delta * (na * other.m2[k] - nb * m2[k]) / n;
+      m2[k] += other.m2[k] + delta2 * na * nb / n;
+      mean[k] += delta * nb / n;
+      count[k] = n;
+    }
+  }
+
+  Vector variance() const { return m2 / count; }
+  Vector skewness() const { return count.sqrt() * m3 / m2.pow(1.5); }
+  Vector excess_kurtosis() const { return count * m4 / (m2 * m2) - 3.0; }
+};
+
+} // namespace WP
+
+#endif // end of include guard: MOMENTS_OHR5EICE
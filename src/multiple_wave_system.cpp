@@ -1,11 +1,14 @@
 #include "multiple_wave_system.hpp"
 #include <boost/math/constants/constants.hpp>
-#include <boost/numeric/odeint/stepper/generation/make_controlled.hpp>
 #include <cmath>
+#include <stdexcept>
 #include <iostream>
+#include "counting.hpp"
+#include "ensemble.hpp"
+#include "fast_math.hpp"
 #include "helper_collections.hpp"
-#include <boost/numeric/odeint.hpp>
-#include <boost/numeric/odeint/external/eigen/eigen.hpp>
+#include "lockstep.hpp"
+#include "steppers.hpp"
 
 namespace WP {
 
@@ -22,6 +25,22 @@ void ThreeWaveSystem::operator()(const State &s, State &dsdt,
   dsdt[1] = epsilon * pert;
 }
 
+void ThreeWaveSystem::block_force(const Vector &x, const Vector &t,
+                                  Vector &f) const noexcept {
+  using namespace boost::math::double_constants;
+  const double *__restrict xi = x.data();
+  const double *__restrict ti = t.data();
+  double *__restrict fi = f.data();
+  const double eps = epsilon;
+
+  for (Eigen::Index i = 0; i < x.size(); i++) {
+    const auto t_times_two_pi = ti[i] * two_pi;
+    fi[i] = -eps * (fast_math::cos(t_times_two_pi - xi[i]) +
+                    fast_math::cos(2 * t_times_two_pi - xi[i]) +
+                    fast_math::cos(3 * t_times_two_pi - xi[i]));
+  }
+}
+
 State ThreeWaveSystem::call(const State &s, double t) const noexcept {
   State dsdt{2, 3};
   this->operator()(s, dsdt, t);
@@ -35,90 +54,304 @@ OrbitPoints ThreeWaveSystem::repeat_state(const State &s) const noexcept {
   return out;
 }
 
-class PushBackStateObesrver
-{
-    WP::collections::OrbitStdVector& m_states;
-  public:
-    PushBackStateObesrver( WP::collections::OrbitStdVector& states )
-    : m_states( states ) { }
-
-    void operator()( const WP::State& x, double /*t*/) 
-    {
-        m_states.push_back( x );
-    }
-};
-
+OrbitPoints ThreeWaveSystem::poincare(const State &s, double t_max,
+                                      const IntegrationOptions &options) const {
+  return integrate_poincare(*this, s, t_max, poincare_dt, options);
+}
 
-OrbitPoints ThreeWaveSystem::poincare(const State &s, double t_max) const noexcept {
-  WP::collections::OrbitStdVector out{};
+void ThreeWaveSystem::poincare_many(const Eigen::Ref<const States> &states,
+                          unsigned stride, Eigen::Ref<RowMatrix> out,
+                          unsigned n_threads,
+                          const IntegrationOptions &options) const {
+  auto opts = options;
+  opts.steps_per_period *= stride; // keep the symplectic step size
+  integrate_poincare_many(*this, states, stride * poincare_dt, n_threads, opts,
+                          out);
+}
 
-  using namespace boost::numeric::odeint;
-  typedef boost::numeric::odeint::runge_kutta_dopri5<State> stepper_type;
+OrbitPoints ThreeWaveSystem::poincare_symplectic(const State &s, double t_max,
+                                                 unsigned steps_per_period,
+                                                 SymplecticScheme scheme) const {
+  return symplectic_poincare(*this, s, t_max, poincare_dt, steps_per_period,
+                             scheme);
+}
 
-  const double atol = 1.0e-10;
-  const double rtol = 1.0e-10;
+double ThreeWaveSystem::get_loss_time(const State &s_init, double p_max,
+                                      double t_max,
+                                      const IntegrationOptions &options) const {
+  auto boundary = [p_max](const State &s) { return s[1] - p_max; };
+  return integrate_loss_time(*this, s_init, t_max, boundary, options,
+                             poincare_dt)
+      .time;
+}
 
-  auto stepper = make_dense_output( atol , rtol , stepper_type() );
+Vector ThreeWaveSystem::get_loss_times(const Eigen::Ref<const States> &states,
+                                       double p_max, double t_max,
+                                       unsigned n_threads,
+                                       Eigen::Index block_size,
+                                       const IntegrationOptions &options)
+    const {
+  if (block_size > 0) {
+    auto boundary = [p_max](const State &s) { return s[1] - p_max; };
+    return lockstep_loss_times(*this, states, t_max, boundary, n_threads,
+                               block_size, options);
+  }
+  return map_states(states, n_threads, [&](const State &s) {
+    return get_loss_time(s, p_max, t_max, options);
+  });
+}
 
-  State s_cur = s;
+std::pair<Vector, Vector> ThreeWaveSystem::count_loss_times(
+    const Eigen::Ref<const States> &states, double p_max, double t_max,
+    unsigned n_threads, const IntegrationOptions &options) const {
+  auto boundary = [p_max](const State &s) { return s[1] - p_max; };
+  return map_states_counted(
+      *this, states, n_threads, [&](const auto &counting, const State &s) {
+        return integrate_loss_time(counting, s, t_max, boundary, options,
+                                   poincare_dt)
+            .time;
+      });
+}
 
-  integrate_const(stepper, *this, s_cur, 0.0, t_max, 1., PushBackStateObesrver(out));
-  return out;
+void ThreeWaveSystem::accumulate_loss_histogram(
+    LossHistogram &hist, const Eigen::Ref<const States> &states, double p_max,
+    unsigned n_threads, const IntegrationOptions &options) const {
+  WP::accumulate_loss_histogram(hist, states, n_threads, [&](const State &s) {
+    return get_loss_time(s, p_max, hist.t_max, options);
+  });
 }
 
-template<typename DenseStepper>
-double track_down_cross_time(DenseStepper &stepper, double p_max) {
-  // improve accuracy of the crossing time by bisection method
-  // It is assumed that the event is detected at the last step taken by the stepper
+States ThreeWaveSystem::period_map(const Eigen::Ref<const States> &states,
+                                   double p_max, unsigned n_periods,
+                                   unsigned n_threads,
+                                   const IntegrationOptions &options) const {
+  auto boundary = [p_max](const State &s) { return s[1] - p_max; };
+  return transform_states(states, n_threads, [&](const State &s) {
+    return integrate_period_map(*this, s, n_periods, boundary, options,
+                                poincare_dt);
+  });
+}
 
-  double t2 = stepper.current_time();
-  double dt = stepper.current_time_step();
-  double t1 = t2 - dt;
+namespace {
 
-  double t = (t1 + t2) / 2;  // start with the midpoint
-  State x;
+/**
+ * @brief      The largest base b such that every value is an integer multiple
+ *             m b with |m| <= max_order, or 0 if there is none. If all
+ *             values vanish, the base is 1.
+ */
+double harmonic_base(const Vector &values, int max_order) {
+  const double scale = values.abs().maxCoeff();
+  if (!(scale > 0))
+    return scale == 0 ? 1.0 : 0.0;
+  const double tol = 1e-9 * scale;
 
-  while (t2 - t1 > 1e-5) {  // until the precision is high enough
-    stepper.calc_state(t, x);  // interpolate the state at time t
-    if (x[1] > p_max) {
-      t2 = t;  // if the event is detected, the time is too late
-    } else {
-      t1 = t;  // if no event is detected, the time is too early
+  // Euclid's algorithm on the magnitudes, with round off tolerance
+  double base = 0;
+  for (const auto v : values) {
+    double a = std::abs(v), b = base;
+    if (a < b)
+      std::swap(a, b);
+    while (b > tol) {
+      double r = std::fmod(a, b);
+      if (b - r < tol)
+        r = 0;
+      a = b;
+      b = r;
     }
-    t = (t1 + t2) / 2;  // update the time
-    }
-  return t;
+    base = a;
+  }
+  for (const auto v : values) {
+    const double m = v / base;
+    if (std::abs(m - std::nearbyint(m)) > 1e-9 * std::max(1.0, std::abs(m)) ||
+        std::abs(m) > max_order)
+      return 0.0;
+  }
+  return base;
 }
 
+/**
+ * @brief      cos(m phi) and sin(m phi) for m = 0..max_order from c = cos(phi)
+ *             and s = sin(phi), by angle addition.
+ */
+template <typename Array>
+void fill_harmonics(double c, double s, int max_order, Array &cos_m,
+                    Array &sin_m) noexcept {
+  cos_m[0] = 1;
+  sin_m[0] = 0;
+  for (int m = 1; m <= max_order; m++) {
+    cos_m[m] = cos_m[m - 1] * c - sin_m[m - 1] * s;
+    sin_m[m] = sin_m[m - 1] * c + cos_m[m - 1] * s;
+  }
+}
 
-double ThreeWaveSystem::get_loss_time(const State &s_init, double p_max, double t_max) const noexcept {
+} // namespace
+
+MultiWaveSystem::MultiWaveSystem(const Eigen::Ref<const RowMatrix> &_waves,
+                                 double _poincare_dt, bool use_recurrences)
+    : waves(_waves), poincare_dt(_poincare_dt) {
+  using namespace boost::math::double_constants;
+  if (waves.cols() != 4)
+    throw std::invalid_argument(
+        "the waves need the shape (N, 4): amplitude, k, omega, phase");
+  if (!waves.allFinite())
+    throw std::invalid_argument("the waves must be finite");
 
-  using namespace boost::numeric::odeint;
+  const Vector amplitude = waves.col(0).array();
+  const Vector k = waves.col(1).array();
+  const Vector omega = waves.col(2).array();
+  const Vector phase = waves.col(3).array();
 
-  typedef boost::numeric::odeint::runge_kutta_dopri5<State> stepper_type;
-  const double atol = 1.0e-10;
-  const double rtol = 1.0e-10;
-  const double dt_init = 1.0e-3;
+  if (waves.rows() == 0)
+    throw std::invalid_argument("at least one wave is needed");
 
-  if (s_init[1] > p_max) {
-    return 0.0;
+  k_base = harmonic_base(k, max_harmonic);
+  omega_base = harmonic_base(omega, max_harmonic);
+  harmonic = use_recurrences && k_base > 0 && omega_base > 0;
+  if (harmonic) {
+    k_order = (k / k_base).round().cast<int>();
+    omega_order = (omega / omega_base).round().cast<int>();
+    max_k_order = k_order.abs().maxCoeff();
+    max_omega_order = omega_order.abs().maxCoeff();
+    a_cos_phase = amplitude * phase.cos();
+    a_sin_phase = amplitude * phase.sin();
   }
 
-  //
-  auto stepper = make_dense_output(atol, rtol, stepper_type());
+  if (!(poincare_dt > 0)) {
+    if (!(omega_base > 0) || omega.abs().maxCoeff() == 0)
+      throw std::invalid_argument(
+          "poincare_dt is needed unless the frequencies are harmonic");
+    poincare_dt = two_pi / omega_base;
+  }
+}
 
-  State s_cur = s_init;
+template <typename SinCos>
+double MultiWaveSystem::force(double x, double t,
+                              SinCos &&sincos) const noexcept {
+  const auto n = waves.rows();
+  double f = 0;
+  if (!harmonic) {
+    for (Eigen::Index j = 0; j < n; j++) {
+      double s, c;
+      sincos(waves(j, 1) * x - waves(j, 2) * t + waves(j, 3), s, c);
+      f += waves(j, 0) * c;
+    }
+    return f;
+  }
 
-  const auto begin = make_adaptive_time_iterator_begin(std::ref(stepper), *this, s_cur, 0.0, t_max, dt_init);
-  const auto end = make_adaptive_time_iterator_end(std::ref(stepper), *this, s_cur);
+  Eigen::Array<double, max_harmonic + 1, 1> cos_x, sin_x, cos_t, sin_t;
+  double s, c;
+  sincos(k_base * x, s, c);
+  fill_harmonics(c, s, max_k_order, cos_x, sin_x);
+  sincos(omega_base * t, s, c);
+  fill_harmonics(c, s, max_omega_order, cos_t, sin_t);
 
-  for (auto it = begin; it != end; ++it) {
-    const auto &s = it->first;
-    if (s[1] > p_max) {
-      return track_down_cross_time(stepper, p_max);
-    }
+  for (Eigen::Index j = 0; j < n; j++) {
+    // cos and sin of a = k_j x and b = omega_j t, sin(-a) = -sin(a)
+    const int mk = k_order[j], mw = omega_order[j];
+    const double ca = cos_x[std::abs(mk)];
+    const double sa = mk < 0 ? -sin_x[-mk] : sin_x[mk];
+    const double cb = cos_t[std::abs(mw)];
+    const double sb = mw < 0 ? -sin_t[-mw] : sin_t[mw];
+    // A cos(a - b + phi) = A cos(phi) cos(a - b) - A sin(phi) sin(a - b)
+    f += a_cos_phase[j] * (ca * cb + sa * sb) -
+         a_sin_phase[j] * (sa * cb - ca * sb);
   }
-  return t_max;
+  return f;
+}
+
+void MultiWaveSystem::operator()(const State &s, State &dsdt,
+                                 double t) const noexcept {
+  dsdt[0] = s[1];
+  dsdt[1] = force(s[0], t, [](double phi, double &sin_phi, double &cos_phi) {
+    sin_phi = std::sin(phi);
+    cos_phi = std::cos(phi);
+  });
+}
+
+void MultiWaveSystem::block_force(const Vector &x, const Vector &t,
+                                  Vector &f) const noexcept {
+  for (Eigen::Index i = 0; i < x.size(); i++)
+    f[i] = force(x[i], t[i], [](double phi, double &sin_phi, double &cos_phi) {
+      fast_math::sincos(phi, sin_phi, cos_phi);
+    });
+}
+
+State MultiWaveSystem::call(const State &s, double t) const noexcept {
+  State dsdt{2, 3};
+  this->operator()(s, dsdt, t);
+  return dsdt;
+}
+
+OrbitPoints MultiWaveSystem::poincare(const State &s, double t_max,
+                                      const IntegrationOptions &options) const {
+  return integrate_poincare(*this, s, t_max, poincare_dt, options);
+}
+
+void MultiWaveSystem::poincare_many(const Eigen::Ref<const States> &states,
+                                    unsigned stride, Eigen::Ref<RowMatrix> out,
+                                    unsigned n_threads,
+                                    const IntegrationOptions &options) const {
+  auto opts = options;
+  opts.steps_per_period *= stride; // keep the symplectic step size
+  integrate_poincare_many(*this, states, stride * poincare_dt, n_threads, opts,
+                          out);
+}
+
+OrbitPoints MultiWaveSystem::poincare_symplectic(const State &s, double t_max,
+                                                 unsigned steps_per_period,
+                                                 SymplecticScheme scheme) const {
+  return symplectic_poincare(*this, s, t_max, poincare_dt, steps_per_period,
+                             scheme);
+}
+
+double MultiWaveSystem::get_loss_time(const State &s_init, double p_min,
+                                      double p_max, double t_max,
+                                      const IntegrationOptions &options) const {
+  auto boundary = [p_min, p_max](const State &s) {
+    return std::max(p_min - s[1], s[1] - p_max);
+  };
+  return integrate_loss_time(*this, s_init, t_max, boundary, options,
+                             poincare_dt)
+      .time;
+}
+
+Vector MultiWaveSystem::get_loss_times(const Eigen::Ref<const States> &states,
+                                       double p_min, double p_max,
+                                       double t_max, unsigned n_threads,
+                                       Eigen::Index block_size,
+                                       const IntegrationOptions &options)
+    const {
+  if (block_size > 0) {
+    auto boundary = [p_min, p_max](const State &s) {
+      return std::max(p_min - s[1], s[1] - p_max);
+    };
+    return lockstep_loss_times(*this, states, t_max, boundary, n_threads,
+                               block_size, options);
+  }
+  return map_states(states, n_threads, [&](const State &s) {
+    return get_loss_time(s, p_min, p_max, t_max, options);
+  });
+}
+
+void MultiWaveSystem::accumulate_loss_histogram(
+    LossHistogram &hist, const Eigen::Ref<const States> &states, double p_min,
+    double p_max, unsigned n_threads, const IntegrationOptions &options) const {
+  WP::accumulate_loss_histogram(hist, states, n_threads, [&](const State &s) {
+    return get_loss_time(s, p_min, p_max, hist.t_max, options);
+  });
+}
+
+States MultiWaveSystem::period_map(const Eigen::Ref<const States> &states,
+                                   double p_min, double p_max,
+                                   unsigned n_periods, unsigned n_threads,
+                                   const IntegrationOptions &options) const {
+  auto boundary = [p_min, p_max](const State &s) {
+    return std::max(p_min - s[1], s[1] - p_max);
+  };
+  return transform_states(states, n_threads, [&](const State &s) {
+    return integrate_period_map(*this, s, n_periods, boundary, options,
+                                poincare_dt);
+  });
 }
 
 } // namespace WP
@@ -1,18 +1,44 @@
 #ifndef MULTIPLE_WAVE_SYSTEM_IEY4EIL5
 #define MULTIPLE_WAVE_SYSTEM_IEY4EIL5
+#include "histogram.hpp"
+#include "integration_options.hpp"
+#include "symplectic.hpp"
 #include "type_definitions.hpp"
+#include <utility>
 
 namespace WP {
 class ThreeWaveSystem {
   double epsilon;
 
 public:
+  static constexpr double poincare_dt = 1.0;
   explicit ThreeWaveSystem(double _epsilon) noexcept : epsilon(_epsilon){};
   State call(const State &s, double t) const noexcept;
   void operator()(const State &s, State &dsdt, double t) const noexcept;
+  void block_force(const Vector &x, const Vector &t, Vector &f) const noexcept;
   OrbitPoints repeat_state(const State &s) const noexcept;
-  OrbitPoints poincare(const State &s, double t_max) const noexcept;
-  double get_loss_time(const State &s_init, double p_max, double t_max) const noexcept;
+  OrbitPoints poincare(const State &s, double t_max,
+                       const IntegrationOptions &options = {}) const;
+  void poincare_many(const Eigen::Ref<const States> &states, unsigned stride,
+                     Eigen::Ref<RowMatrix> out, unsigned n_threads = 0,
+                     const IntegrationOptions &options = {}) const;
+  /**
+  * @brief      Sample the orbits of an ensemble every stride poincare_dt in
+  *             parallel into the preallocated out. Row i holds the (x, p)
+  *             pairs of the out.cols() / 2 snapshots of particle i; the
+  *             snapshots after a failed integration are NaN.
+  *
+  * @param[in]  states     The initial states, one particle per row
+  * @param[in]  stride     The number of poincare_dt between snapshots
+  * @param      out        The orbits, shape (N, 2 * n_snapshots)
+  * @param[in]  n_threads  The number of threads, 0 for all available cores
+  * @param[in]  options    The integration options
+  */
+  OrbitPoints poincare_symplectic(
+      const State &s, double t_max, unsigned steps_per_period,
+      SymplecticScheme scheme = SymplecticScheme::Yoshida4) const;
+  double get_loss_time(const State &s_init, double p_max, double t_max,
+                       const IntegrationOptions &options = {}) const;
   /**
   * @brief      Calculate the time it takes for a single state to reach the "loss region" p>p_max
   *            or t>t_max.
@@ -27,10 +53,171 @@ public:
   * @param[in]  s_init  The initial state
   * @param[in]  p_max   The maximum value of p allowed
   * @param[in]  t_max   The maximum integration time
-  * @param[in]  dt      The initial time step
+  * @param[in]  options The stepper, tolerances and crossing precision
   * @return     The time it takes to reach the loss region
   */
+  Vector get_loss_times(const Eigen::Ref<const States> &states, double p_max,
+                        double t_max, unsigned n_threads = 0,
+                        Eigen::Index block_size = 0,
+                        const IntegrationOptions &options = {}) const;
+  /**
+  * @brief      Calculate the loss times of an ensemble of states.
+  *
+  *             Equivalent to calling get_loss_time on every row of states,
+  *             but the ensemble is split over n_threads native threads.
+  *             If block_size > 0, each thread integrates blocks of
+  *             block_size particles in lockstep (see lockstep.hpp) instead
+  *             of one scalar stepper per particle.
+  *
+  * @param[in]  states      The initial states, one particle per row
+  * @param[in]  p_max       The maximum value of p allowed
+  * @param[in]  t_max       The maximum integration time
+  * @param[in]  n_threads   The number of threads, 0 for all available cores
+  * @param[in]  block_size  The number of lanes of the lockstep engine
+  * @param[in]  options     The stepper, tolerances and crossing precision;
+  *                         the lockstep engine only supports Dopri5
+  * @return     The loss times, one per particle
+  */
+  std::pair<Vector, Vector>
+  count_loss_times(const Eigen::Ref<const States> &states, double p_max,
+                   double t_max, unsigned n_threads = 0,
+                   const IntegrationOptions &options = {}) const;
+  /**
+  * @brief      Calculate the loss times of an ensemble of states with one
+  *             scalar stepper per particle, like get_loss_times, and count
+  *             the right hand side evaluations spent on every particle.
+  *
+  * @param[in]  states     The initial states, one particle per row
+  * @param[in]  p_max      The maximum value of p allowed
+  * @param[in]  t_max      The maximum integration time
+  * @param[in]  n_threads  The number of threads, 0 for all available cores
+  * @param[in]  options    The integration options
+  * @return     The loss times and the numbers of evaluations, one per
+  *             particle
+  */
+  void accumulate_loss_histogram(LossHistogram &hist,
+                                 const Eigen::Ref<const States> &states,
+                                 double p_max, unsigned n_threads = 0,
+                                 const IntegrationOptions &options = {}) const;
+  /**
+  * @brief      Add the loss times of an ensemble to a histogram instead of
+  *             returning them, integrating up to hist.t_max with one scalar
+  *             stepper per particle.
+  *
+  * @param      hist       The histogram to add the particles to
+  * @param[in]  states     The initial states, one particle per row
+  * @param[in]  p_max      The maximum value of p allowed
+  * @param[in]  n_threads  The number of threads, 0 for all available cores
+  * @param[in]  options    The integration options
+  */
+  States period_map(const Eigen::Ref<const States> &states, double p_max,
+                    unsigned n_periods = 1, unsigned n_threads = 0,
+                    const IntegrationOptions &options = {}) const;
+  /**
+  * @brief      Apply the map over n_periods periods poincare_dt to every
+  *             state.
+  *
+  * @param[in]  states     The states, one particle per row
+  * @param[in]  p_max      The maximum value of p allowed
+  * @param[in]  n_periods  The number of periods
+  * @param[in]  n_threads  The number of threads, 0 for all available cores
+  * @param[in]  options    The integration options
+  * @return     The mapped states; NaN for the particles that reach p > p_max
+  *             within the n_periods periods
+  */
+
+};
+
+/**
+ * @brief      A particle in the field of N waves, given as a table of
+ *             (amplitude, k, omega, phase) rows:
+ *
+ *               dx/dt = p,  dp/dt = sum_j A_j cos(k_j x - omega_j t + phi_j)
+ *
+ *             If all wavenumbers and all frequencies are integer multiples
+ *             (up to max_harmonic) of a base wavenumber and frequency, the
+ *             waves are evaluated with angle-addition recurrences from one
+ *             sine/cosine pair of the base phase in x and one in t, so the
+ *             cost of a call hardly grows with the number of waves.
+ *             Otherwise every wave costs one cosine.
+ *
+ *             The particles are confined to p_min < p < p_max.
+ */
+class MultiWaveSystem {
+public:
+  static constexpr int max_harmonic = 64;
+
+private:
+  RowMatrix waves;
+  bool harmonic = false;
+  double k_base = 1, omega_base = 1;
+  Eigen::ArrayXi k_order, omega_order;
+  Vector a_cos_phase, a_sin_phase;
+  int max_k_order = 0, max_omega_order = 0;
 
+  template <typename SinCos>
+  double force(double x, double t, SinCos &&sincos) const noexcept;
+
+public:
+  double poincare_dt;
+  explicit MultiWaveSystem(const Eigen::Ref<const RowMatrix> &_waves,
+                           double _poincare_dt = 0,
+                           bool use_recurrences = true);
+  /**
+   * @brief      Construct the system from the wave table.
+   *
+   * @param[in]  _waves           The waves, one (A, k, omega, phi) per row
+   * @param[in]  _poincare_dt     The period of the Poincare sections and of
+   *                              the period map; if <= 0, 2 pi over the base
+   *                              frequency of harmonic waves
+   * @param[in]  use_recurrences  Use the recurrences if the waves are
+   *                              harmonic
+   */
+  const RowMatrix &get_waves() const noexcept { return waves; }
+  bool is_harmonic() const noexcept { return harmonic; }
+  State call(const State &s, double t) const noexcept;
+  void operator()(const State &s, State &dsdt, double t) const noexcept;
+  void block_force(const Vector &x, const Vector &t, Vector &f) const noexcept;
+  OrbitPoints poincare(const State &s, double t_max,
+                       const IntegrationOptions &options = {}) const;
+  void poincare_many(const Eigen::Ref<const States> &states, unsigned stride,
+                     Eigen::Ref<RowMatrix> out, unsigned n_threads = 0,
+                     const IntegrationOptions &options = {}) const;
+  OrbitPoints poincare_symplectic(
+      const State &s, double t_max, unsigned steps_per_period,
+      SymplecticScheme scheme = SymplecticScheme::Yoshida4) const;
+  double get_loss_time(const State &s_init, double p_min, double p_max,
+                       double t_max,
+                       const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the time it takes for a single state to leave
+   *             p_min < p < p_max, or t_max if it does not leave it.
+   */
+  Vector get_loss_times(const Eigen::Ref<const States> &states, double p_min,
+                        double p_max, double t_max, unsigned n_threads = 0,
+                        Eigen::Index block_size = 0,
+                        const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states, see
+   *             ThreeWaveSystem::get_loss_times.
+   */
+  void accumulate_loss_histogram(LossHistogram &hist,
+                                 const Eigen::Ref<const States> &states,
+                                 double p_min, double p_max,
+                                 unsigned n_threads = 0,
+                                 const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Add the loss times of an ensemble to a histogram, see
+   *             ThreeWaveSystem::accumulate_loss_histogram.
+   */
+  States period_map(const Eigen::Ref<const States> &states, double p_min,
+                    double p_max, unsigned n_periods = 1,
+                    unsigned n_threads = 0,
+                    const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Apply the map over n_periods periods poincare_dt to every
+   *             state; NaN for the particles that leave p_min < p < p_max.
+   */
 };
 } // namespace WP
 
@@ -0,0 +1,254 @@
+"""
+This module contains a content-addressed cache of calculation results
+
+A result is stored under the sha256 hash of the parameters that determine it
+(system type, amplitudes, t_max, boundary, n_particles, seed, integration
+options, ...). Every result is a directory, e.g. a saved LossTimeResult or an
+OrbitStore, and an SQLite index records the parameters, size and last access
+of every entry, so that the existing runs can be queried and the least
+recently used ones evicted once the cache grows beyond its size limit.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+from .losses import LossTimeResult, to_json
+from .orbit_store import OrbitStore
+
+_INDEX = "index.sqlite"
+
+
+def integration_options_to_dict(options) -> dict:
+    """
+    Convert IntegrationOptions to a JSON serializable dict
+    """
+    return dict(
+        stepper=options.stepper.name,
+        atol=options.atol,
+        rtol=options.rtol,
+        dt_init=options.dt_init,
+        crossing_precision=options.crossing_precision,
+        scheme=options.scheme.name,
+        steps_per_period=options.steps_per_period,
+        detect_grazing=options.detect_grazing,
+        regularity_window=options.regularity_window,
+        regularity_digits=options.regularity_digits,
+    )
+
+
+def _canonical(params: dict) -> str:
+    # round trip through to_json first so that tuples, numpy scalars and
+    # arrays are represented like lists and floats
+    return json.dumps(json.loads(to_json(params)), sort_keys=True)
+
+
+def cache_key(params: dict) -> str:
+    """
+    The sha256 hash identifying the result of a calculation with params
+    """
+    return hashlib.sha256(_canonical(params).encode()).hexdigest()
+
+
+def _directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class ResultCache:
+    """
+    Directory of results keyed by the hash of their parameters
+
+    Parameters:
+        root: the cache directory
+        max_bytes: if given, least recently used entries are evicted after
+            every insertion until the cache is at most this large
+    """
+
+    def __init__(self, root, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "key TEXT PRIMARY KEY, kind TEXT, params TEXT, "
+                "size INTEGER, created REAL, last_access REAL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """
+        A connection to the index for one transaction: committed (or rolled
+        back on an error) and closed at the end of the with block, so that
+        the index is not held open between calls
+        """
+        db = sqlite3.connect(self.root / _INDEX, timeout=60)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _path(self, key: str) -> Path:
+        return self.root / "objects" / key[:2] / key
+
+    def __contains__(self, params: dict) -> bool:
+        return self.lookup(params) is not None
+
+    def lookup(self, params: dict) -> Optional[Path]:
+        """
+        The directory of the result for params, or None if it is not cached
+        """
+        key = cache_key(params)
+        path = self._path(key)
+        with self._connect() as db:
+            row = db.execute("SELECT key FROM runs WHERE key = ?", (key,)).fetchone()
+            if row is None or not path.is_dir():
+                return None
+            db.execute(
+                "UPDATE runs SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        return path
+
+    def put(self, params: dict, write: Callable[[Path], None], kind: str = "") -> Path:
+        """
+        Store a result: write(path) must create the result in the new
+        directory path. Returns the directory of the cached result.
+        """
+        key = cache_key(params)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp-"))
+        try:
+            write(tmp / "result")
+            try:
+                os.replace(tmp / "result", path)
+            except OSError:
+                # stored concurrently by another process
+                if not path.is_dir():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, _canonical(params), _directory_size(path), now, now),
+            )
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes, keep=key)
+        return path
+
+    def get_or_compute(
+        self,
+        params: dict,
+        compute: Callable[[], object],
+        save: Callable[[object, Path], None],
+        load: Callable[[Path], object],
+        kind: str = "",
+    ):
+        """
+        Return the cached result for params, computing and storing it with
+        save(result, path) if it is missing. Cached results are read with
+        load(path).
+        """
+        path = self.lookup(params)
+        if path is None:
+            result = compute()
+            path = self.put(params, lambda p: save(result, p), kind)
+        return load(path)
+
+    def loss_time_result(
+        self, params: dict, compute: Callable[[], LossTimeResult]
+    ) -> LossTimeResult:
+        """
+        get_or_compute for a LossTimeResult
+        """
+        return self.get_or_compute(
+            params,
+            compute,
+            lambda result, path: result.save(path),
+            LossTimeResult.load,
+            kind="loss_times",
+        )
+
+    def orbit_store(
+        self, params: dict, fill: Callable[[OrbitStore], None], **store_kwargs
+    ) -> OrbitStore:
+        """
+        Return the cached OrbitStore for params, creating it with fill(store)
+        if it is missing
+        """
+
+        def write(path):
+            with OrbitStore(path, **store_kwargs) as store:
+                fill(store)
+
+        path = self.lookup(params)
+        if path is None:
+            path = self.put(params, write, kind="orbits")
+        return OrbitStore.open(path)
+
+    def query(self, kind: Optional[str] = None, **filters) -> list[dict]:
+        """
+        The parameters of the cached runs, optionally restricted to a kind
+        and to runs whose parameters contain the given values
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT kind, params FROM runs ORDER BY created"
+            ).fetchall()
+        wanted = json.loads(to_json(filters))
+        runs = []
+        for row_kind, params in rows:
+            params = json.loads(params)
+            if kind is not None and row_kind != kind:
+                continue
+            if all(params.get(k) == v for k, v in wanted.items()):
+                runs.append(params)
+        return runs
+
+    def size(self) -> int:
+        """
+        The total size of the cached results in bytes
+        """
+        with self._connect() as db:
+            (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()
+        return total
+
+    def remove(self, params: dict):
+        """
+        Remove the result for params from the cache
+        """
+        self._remove_key(cache_key(params))
+
+    def _remove_key(self, key: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM runs WHERE key = ?", (key,))
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def evict(self, max_bytes: int, keep: Optional[str] = None):
+        """
+        Remove the least recently used results until the cache holds at most
+        max_bytes. The entry with key `keep` is never removed.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT key, size FROM runs ORDER BY last_access"
+            ).fetchall()
+        total = sum(size for _, size in rows)
+        for key, size in rows:
+            if total <= max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove_key(key)
+            total -= size
@@ -0,0 +1,102 @@
+"""
+This module contains the checkpointing of long loss time calculations
+
+The particles of a run are processed in chunks and every finished chunk is
+written to a shard directory right away. When the run is restarted with the
+same options (including the seed) it picks up after the last complete shard.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from .losses import LossTimeResult, to_json
+
+_MANIFEST = "manifest.json"
+_INITIAL_STATES = "initial_states.npy"
+
+
+def _shard_name(index: int) -> str:
+    return f"shard_{index:06d}.npy"
+
+
+def _save_atomic(path: Path, array: np.ndarray):
+    """
+    write an .npy file so that it either exists completely or not at all
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _normalized(options: dict) -> dict:
+    """
+    the options as they read back from JSON, so that they compare equal
+    """
+    return json.loads(to_json(options))
+
+
+def run_checkpointed(
+    shard_dir,
+    options: dict,
+    make_initial_states: Callable[[], np.ndarray],
+    compute_loss_times: Callable[[np.ndarray], np.ndarray],
+    chunk_size: int = 10_000,
+) -> LossTimeResult:
+    """
+    Calculate loss times chunk by chunk, checkpointing every chunk
+
+    On the first call the initial states are generated and saved to
+    `shard_dir` together with a manifest of `options` and `chunk_size`.
+    Every chunk of `chunk_size` particles is then integrated and its loss
+    times are written to its own shard. A restarted run with the same
+    options skips the shards that are complete and finally merges all of
+    them into one LossTimeResult.
+
+    Parameters:
+        shard_dir: the directory of the shards
+        options: the JSON serializable parameters of the run, including the
+            seed; they must match the manifest when resuming
+        make_initial_states: returns the (N, 2) initial states
+        compute_loss_times: returns the loss times of an (n, 2) chunk
+        chunk_size: the number of particles per shard
+
+    Returns:
+        the merged LossTimeResult
+    """
+    shard_dir = Path(shard_dir)
+    manifest_file = shard_dir / _MANIFEST
+    manifest = dict(options=_normalized(options), chunk_size=chunk_size)
+
+    if manifest_file.exists():
+        saved = json.loads(manifest_file.read_text())
+        if saved != manifest:
+            raise ValueError(
+                f"{shard_dir} holds shards of a different run: {saved['options']}"
+            )
+        initial_states = np.load(shard_dir / _INITIAL_STATES)
+    else:
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        initial_states = np.asarray(make_initial_states(), dtype=float).reshape(-1, 2)
+        _save_atomic(shard_dir / _INITIAL_STATES, initial_states)
+        # the manifest is written last, it marks the directory as valid
+        manifest_file.write_text(json.dumps(manifest))
+
+    n_chunks = -(-len(initial_states) // chunk_size)
+    for index in range(n_chunks):
+        shard = shard_dir / _shard_name(index)
+        if shard.exists():
+            continue
+        chunk = initial_states[index * chunk_size : (index + 1) * chunk_size]
+        _save_atomic(shard, np.asarray(compute_loss_times(chunk), dtype=float))
+
+    loss_times = np.concatenate(
+        [np.load(shard_dir / _shard_name(index)) for index in range(n_chunks)]
+        or [np.zeros(0)]
+    )
+    return LossTimeResult(initial_states, loss_times, options)
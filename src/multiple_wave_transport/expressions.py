@@ -0,0 +1,199 @@
+"""
+This module contains a compiler of force expressions for TapeSystem
+
+A force is written as a Python expression of x, p, t and named parameters,
+e.g. "sin(x) - eps * cos(5 * x - t / 2)". It is parsed with the ast module
+and only numbers, names, the arithmetic operators + - * / ** and the
+functions in FUNCTIONS are accepted, so that nothing is ever evaluated by
+Python. The expression is compiled once into a flat stack program (a tape)
+that TapeSystem evaluates in C++ inside the loss time and Poincare engines:
+
+    sin(x) - eps * cos(5 * x - t / 2)  ->  X Sin Const(eps) Const(5) X Mul ...
+
+The parameters are substituted as constants and constant subexpressions are
+folded at compile time, and x**2 becomes a single Square instruction.
+"""
+import ast
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ._multiple_wave_transport import TapeOp, TapeSystem
+
+VARIABLES = {"x": TapeOp.X, "p": TapeOp.P, "t": TapeOp.T}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+FUNCTIONS = {
+    "sin": (TapeOp.Sin, math.sin),
+    "cos": (TapeOp.Cos, math.cos),
+    "tan": (TapeOp.Tan, math.tan),
+    "exp": (TapeOp.Exp, math.exp),
+    "log": (TapeOp.Log, math.log),
+    "sqrt": (TapeOp.Sqrt, math.sqrt),
+    "tanh": (TapeOp.Tanh, math.tanh),
+    "abs": (TapeOp.Abs, abs),
+}
+_BINARY = {
+    ast.Add: (TapeOp.Add, lambda a, b: a + b),
+    ast.Sub: (TapeOp.Sub, lambda a, b: a - b),
+    ast.Mult: (TapeOp.Mul, lambda a, b: a * b),
+    ast.Div: (TapeOp.Div, lambda a, b: a / b),
+    ast.Pow: (TapeOp.Pow, lambda a, b: a**b),
+}
+
+
+@dataclass
+class Tape:
+    """
+    A compiled force: the operations and the value of every instruction
+    (the constant of TapeOp.Const, 0 otherwise)
+    """
+
+    expression: str
+    ops: List[TapeOp]
+    values: List[float]
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __str__(self) -> str:
+        return " ".join(
+            f"Const({value:g})" if op == TapeOp.Const else op.name
+            for op, value in zip(self.ops, self.values)
+        )
+
+
+class _Compiler:
+    def __init__(self, parameters: Dict[str, float]):
+        self.parameters = parameters
+        self.ops: List[TapeOp] = []
+        self.values: List[float] = []
+
+    def emit(self, op: TapeOp, value: float = 0.0):
+        self.ops.append(op)
+        self.values.append(float(value))
+
+    def constant_at(self, start: int) -> Optional[float]:
+        """
+        The value of the code emitted since start if it is a single constant
+        """
+        if len(self.ops) == start + 1 and self.ops[start] == TapeOp.Const:
+            return self.values[start]
+        return None
+
+    def fold(self, start: int, value: float):
+        """
+        Replace the code emitted since start with the constant value
+        """
+        del self.ops[start:], self.values[start:]
+        self.emit(TapeOp.Const, value)
+
+    def compile(self, node: ast.AST):
+        start = len(self.ops)
+
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(
+                node.value, (int, float)
+            ):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+            self.emit(TapeOp.Const, node.value)
+
+        elif isinstance(node, ast.Name):
+            if node.id in VARIABLES:
+                self.emit(VARIABLES[node.id])
+            elif node.id in self.parameters:
+                self.emit(TapeOp.Const, self.parameters[node.id])
+            elif node.id in CONSTANTS:
+                self.emit(TapeOp.Const, CONSTANTS[node.id])
+            else:
+                raise ValueError(f"Unknown name: {node.id}")
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(
+            node.op, (ast.UAdd, ast.USub)
+        ):
+            self.compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                value = self.constant_at(start)
+                if value is not None:
+                    self.fold(start, -value)
+                else:
+                    self.emit(TapeOp.Neg)
+
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            op, evaluate = _BINARY[type(node.op)]
+            self.compile(node.left)
+            left = self.constant_at(start)
+            middle = len(self.ops)
+            self.compile(node.right)
+            right = self.constant_at(middle)
+            if left is not None and right is not None:
+                self.fold(start, evaluate(left, right))
+            elif op == TapeOp.Pow and right == 2:
+                del self.ops[middle:], self.values[middle:]
+                self.emit(TapeOp.Square)
+            else:
+                self.emit(op)
+
+        elif isinstance(node, ast.Call):
+            name = node.func.id if isinstance(node.func, ast.Name) else None
+            if name not in FUNCTIONS or len(node.args) != 1 or node.keywords:
+                raise ValueError(f"Unsupported call: {ast.unparse(node)}")
+            op, evaluate = FUNCTIONS[name]
+            self.compile(node.args[0])
+            value = self.constant_at(start)
+            if value is not None:
+                self.fold(start, evaluate(value))
+            else:
+                self.emit(op)
+
+        else:
+            raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+def compile_force(expression: str, parameters: Optional[Dict[str, float]] = None) -> Tape:
+    """
+    Compile a force expression into a tape
+
+    Parameters:
+        expression: the force dp/dt as an expression of x, p, t, the
+            parameters, the constants pi and e, the operators + - * / ** and
+            the functions in FUNCTIONS
+        parameters: the values of the other names in the expression
+
+    Returns:
+        the Tape
+    """
+    parameters = dict(parameters or {})
+    for name in parameters:
+        if name in VARIABLES or name in FUNCTIONS:
+            raise ValueError(f"The parameter {name} shadows a variable or function")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Invalid expression: {expression}") from error
+
+    compiler = _Compiler(parameters)
+    compiler.compile(tree.body)
+    return Tape(expression, compiler.ops, compiler.values)
+
+
+def build_tape_system(
+    expression: str,
+    poincare_dt: float,
+    parameters: Optional[Dict[str, float]] = None,
+) -> TapeSystem:
+    """
+    A TapeSystem with the force given by the expression, see compile_force
+
+    Parameters:
+        expression: the force dp/dt
+        poincare_dt: the period of the Poincare sections and of the period map
+        parameters: the values of the other names in the expression
+    """
+    tape = compile_force(expression, parameters)
+    return TapeSystem(
+        np.array([int(op) for op in tape.ops], dtype=np.int32),
+        np.array(tape.values),
+        poincare_dt,
+    )
@@ -3,9 +3,15 @@ This module contains functionality related to loss times
 """
 import json
 from dataclasses import asdict, dataclass
+from pathlib import Path
 from typing import Tuple, Union
 
 import numpy as np
+from scipy.optimize import brentq
+
+# suffix of the binary result directories, see LossTimeResult.save
+BINARY_SUFFIX = ".npd"
+_BINARY_FILES = ("initial_states.npy", "loss_times.npy", "options.json")
 
 
 def to_json(s):
@@ -41,18 +47,28 @@ class LossTimeResult:
         Create a LossTimeResult from a JSON string
         """
         d = json.loads(s)
-        d["initial_states"] = [tuple(s) for s in d["initial_states"]]
-        d["loss_times"] = np.array(d["loss_times"])
+        d["initial_states"] = np.array(d["initial_states"], dtype=float).reshape(-1, 2)
+        d["loss_times"] = np.array(d["loss_times"], dtype=float)
 
         return cls(**d)
 
     @classmethod
     def from_file(cls, filename):
         """
-        Create a LossTimeResult from a JSON file
+        Create a LossTimeResult from a file
+
+        `filename` may be a binary result directory (see `save`) or a JSON
+        file. For a JSON file, the binary directory of the same name written
+        by `convert_json_results` is read instead if it is up to date, i.e.
+        not older than the JSON file.
         """
-        with open(filename, "r") as f:
-            return cls.from_json(f.read())
+        path = Path(filename)
+        if path.is_dir():
+            return cls.load(path)
+        binary_path = path.with_suffix(BINARY_SUFFIX)
+        if _is_up_to_date(binary_path, path):
+            return cls.load(binary_path)
+        return cls.from_json(path.read_text())
 
     def to_json(self):
         """
@@ -60,6 +76,80 @@ class LossTimeResult:
         """
         return to_json(self)
 
+    def save(self, path):
+        """
+        Save the result to the directory `path`
+
+        The arrays are stored as `initial_states.npy`, shape (N, 2), and
+        `loss_times.npy`, shape (N,); the options go to `options.json`.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(
+            path / "initial_states.npy",
+            np.asarray(self.initial_states, dtype=float).reshape(-1, 2),
+        )
+        np.save(path / "loss_times.npy", np.asarray(self.loss_times, dtype=float))
+        (path / "options.json").write_text(to_json(self.options))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Load a result saved with `save`
+
+        The arrays are memory mapped (read-only by default), so only the parts
+        that are used are read from disk. Use mmap_mode=None to read them into
+        memory.
+        """
+        path = Path(path)
+        return cls(
+            initial_states=np.load(path / "initial_states.npy", mmap_mode=mmap_mode),
+            loss_times=np.load(path / "loss_times.npy", mmap_mode=mmap_mode),
+            options=json.loads((path / "options.json").read_text()),
+        )
+
+
+def _is_up_to_date(binary_path: Path, json_path: Path) -> bool:
+    """
+    whether the binary result exists completely and was written after the
+    JSON file was last modified
+    """
+    files = [binary_path / name for name in _BINARY_FILES]
+    if not all(f.is_file() for f in files):
+        return False
+    if not json_path.exists():
+        return True
+    return min(f.stat().st_mtime for f in files) >= json_path.stat().st_mtime
+
+
+def convert_json_results(folder, pattern="*.json", remove=False):
+    """
+    Convert the JSON loss time results in `folder` to the binary format
+
+    Every file matching `pattern` is written to a directory with the same
+    name and the suffix BINARY_SUFFIX, which `LossTimeResult.from_file` picks
+    up in place of the JSON file. Files whose binary directory is up to date
+    are skipped, the ones modified since their conversion are converted
+    again.
+
+    Parameters:
+        folder: the data folder
+        pattern: glob pattern of the JSON files
+        remove: delete the JSON files after the conversion
+
+    Returns:
+        the paths of the binary result directories
+    """
+    converted = []
+    for filename in sorted(Path(folder).glob(pattern)):
+        target = filename.with_suffix(BINARY_SUFFIX)
+        if not _is_up_to_date(target, filename):
+            LossTimeResult.from_json(filename.read_text()).save(target)
+        if remove:
+            filename.unlink()
+        converted.append(target)
+    return converted
+
 
 def get_spectrum(hist, times):
     """
@@ -82,7 +172,7 @@ def filter_loss_times(loss_result):
     """
 
     initial_states, loss_times = loss_result.initial_states, loss_result.loss_times
-    p_init_v = np.array([s[1] for s in initial_states])
+    p_init_v = np.asarray(initial_states).reshape(-1, 2)[:, 1]
 
     actually_lost_mask = loss_times < loss_result.options["t_max"]
 
@@ -121,3 +211,75 @@ def calculate_current(lost_times, bins):
     times = 0.5 * (times[:-1] + times[1:])
     current = hist / dt
     return times, current
+
+
+def histogram_current(histogram):
+    """
+    Calculate the current from a LossHistogram, like calculate_current
+
+    Returns:
+        times: the times at the center of the bins
+        current: the current at the center of the bins
+    """
+    edges = np.asarray(histogram.edges)
+    dt = edges[1] - edges[0]
+    return 0.5 * (edges[:-1] + edges[1:]), np.asarray(histogram.counts) / dt
+
+
+def fit_escape_rate(loss_times, t_min: float, t_max: float) -> Tuple[float, float]:
+    """
+    Estimate the escape rate of the particles lost in the window
+    t_min < t < t_max
+
+    This is the maximum likelihood estimate for exponentially distributed loss
+    times truncated to the window. Like an exponential fit of the current, it
+    only looks at the particles that are actually lost, so the ones confined
+    on invariant tori do not bias it towards zero.
+
+    Parameters:
+        loss_times: the loss times of the particles
+        t_min: the start of the steady regime
+        t_max: the end of the window, at most the integration time
+
+    Returns:
+        alpha: the escape rate
+        alpha_err: its standard error from the Fisher information
+
+    A ValueError is raised if fewer than two particles are lost in the window
+    or if the rate cannot be resolved from their delays.
+    """
+    loss_times = np.asarray(loss_times)
+    delays = loss_times[(loss_times > t_min) & (loss_times < t_max)] - t_min
+    if len(delays) < 2:
+        raise ValueError("Not enough particles lost in the window")
+    width = t_max - t_min
+    mean = delays.mean()
+
+    # the mean of the truncated distribution falls from width / 2 at alpha = 0
+    if mean >= width / 2:
+        return 0.0, np.inf
+
+    def excess_mean(alpha):
+        return 1 / alpha - width / np.expm1(min(alpha * width, 700.0)) - mean
+
+    # for a fast escape the root approaches 1 / mean, far above 1 / width
+    lower, upper = 1e-12 / width, max(1e3 / width, 2 / mean)
+    if not excess_mean(lower) > 0 > excess_mean(upper):
+        raise ValueError(
+            f"The escape rate is not resolved in the window {t_min} < t < {t_max}: "
+            f"the mean delay {mean:g} of the lost particles is out of range"
+        )
+    alpha = brentq(excess_mean, lower, upper)
+    z = min(alpha * width, 700.0)
+    information = len(delays) * (
+        1 / alpha**2 - width**2 * np.exp(-z) / np.expm1(-z) ** 2
+    )
+    return float(alpha), float(1 / np.sqrt(information))
+
+
+if __name__ == "__main__":
+    import sys
+
+    for folder in sys.argv[1:]:
+        for path in convert_json_results(folder):
+            print(path)
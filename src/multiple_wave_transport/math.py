@@ -13,13 +13,20 @@ def angle_to_2pi(angle):
     return np.mod(angle, 2 * np.pi)
 
 
-def generate_random_pairs(n, xmin, xmax, ymin, ymax) -> list[Tuple[float, float]]:
+def generate_random_pairs(
+    n, xmin, xmax, ymin, ymax, rng=None
+) -> list[Tuple[float, float]]:
     """
     Generate n random pairs of numbers in the ranges [xmin, xmax] and [ymin, ymax]
+
+    rng may be a seed or a np.random.Generator; by default the global numpy
+    random state is used.
     """
-    x_values = np.random.uniform(xmin, xmax, n)
+    rng = np.random if rng is None else np.random.default_rng(rng)
+
+    x_values = rng.uniform(xmin, xmax, n)
 
-    y_values = np.random.uniform(ymin, ymax, n)
+    y_values = rng.uniform(ymin, ymax, n)
 
     pairs = list(zip(x_values, y_values))
 
@@ -0,0 +1,48 @@
+"""
+This module contains the wave tables of MultiWaveSystem
+
+A table holds one (amplitude, k, omega, phase) row per wave, the force being
+
+    dp/dt = sum_j A_j cos(k_j x - omega_j t + phi_j)
+
+The tables of the hard-coded systems reproduce their equations of motion, so
+that new configurations can be compared to them without writing C++.
+"""
+import numpy as np
+
+from ._multiple_wave_transport import MultiWaveSystem
+
+
+def three_wave_table(amplitude: float) -> np.ndarray:
+    """
+    The waves of ThreeWaveSystem(amplitude)
+    """
+    omegas = 2 * np.pi * np.arange(1, 4)
+    return np.column_stack(
+        [np.full(3, -amplitude), np.ones(3), omegas, np.zeros(3)]
+    )
+
+
+def pendulum_table(amplitude) -> np.ndarray:
+    """
+    The waves of the pendulum built by pendulum.build_pendulum(amplitude):
+    the pendulum force sin(x), the wave (5, 1/2) and, if amplitude is a
+    pair (high, low), the low frequency wave (1, 0.05)
+    """
+    try:
+        high, low = amplitude
+    except TypeError:
+        high, low = amplitude, None
+    waves = [(1.0, 1.0, 0.0, -np.pi / 2), (-high, 5.0, 0.5, 0.0)]
+    if low is not None:
+        waves.append((-low, 1.0, 0.05, 0.0))
+    return np.array(waves)
+
+
+def build_multi_wave_system(waves, poincare_dt: float = 0.0) -> MultiWaveSystem:
+    """
+    A MultiWaveSystem from a table of shape (N, 4) or a sequence of
+    (amplitude, k, omega, phase) tuples
+    """
+    waves = np.asarray(waves, dtype=float).reshape(-1, 4)
+    return MultiWaveSystem(waves, poincare_dt)
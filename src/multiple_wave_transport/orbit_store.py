@@ -0,0 +1,185 @@
+"""
+This module contains a chunked on-disk store for sampled orbits
+
+An OrbitStore is a directory holding the orbits of an ensemble as an
+(n_particles, n_snapshots, 2) array, split along the particle axis into
+chunks of `chunk_size` orbits saved as `.npy` files. Orbits are appended one
+at a time as they are computed, and the chunks are memory mapped when read,
+so reductions over the ensemble can run chunk by chunk without loading the
+full dataset.
+"""
+import json
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+_META_FILE = "meta.json"
+
+
+def _chunk_name(index: int) -> str:
+    return f"chunk_{index:06d}.npy"
+
+
+class OrbitStore:
+    """
+    Appendable, memory-mapped store of orbits sampled at common times
+
+    Orbits are passed and returned in the layout of `poincare`, shape
+    (2, n_snapshots). Appended orbits are buffered and written once
+    `chunk_size` of them are collected; `flush` (or leaving the `with` block)
+    writes the rest.
+    """
+
+    def __init__(self, path, chunk_size: int = 64, attrs: Optional[dict] = None):
+        """
+        Create an empty store in the directory `path`
+
+        Parameters:
+        -----------
+        path: str or Path
+            the directory of the store, must not contain a store already
+        chunk_size: int
+            the number of orbits per chunk file
+        attrs: dict, optional
+            JSON serializable metadata saved with the store
+        """
+        self.path = Path(path)
+        if (self.path / _META_FILE).exists():
+            raise FileExistsError(f"{self.path} already contains an orbit store")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self.chunk_size = chunk_size
+        self.attrs = dict(attrs or {})
+        self.n_snapshots: Optional[int] = None
+        self._chunk_lengths: list[int] = []
+        self._buffer: list[np.ndarray] = []
+        self._write_meta()
+
+    @classmethod
+    def open(cls, path) -> "OrbitStore":
+        """
+        Open an existing store for reading and appending
+        """
+        path = Path(path)
+        meta = json.loads((path / _META_FILE).read_text())
+        store = cls.__new__(cls)
+        store.path = path
+        store.chunk_size = meta["chunk_size"]
+        store.attrs = meta["attrs"]
+        store.n_snapshots = meta["n_snapshots"]
+        store._chunk_lengths = meta["chunk_lengths"]
+        store._buffer = []
+        return store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def __len__(self) -> int:
+        return sum(self._chunk_lengths) + len(self._buffer)
+
+    @property
+    def shape(self):
+        return (len(self), self.n_snapshots, 2)
+
+    def append(self, orbit):
+        """
+        Append one orbit of shape (2, n_snapshots)
+        """
+        orbit = np.asarray(orbit, dtype=float)
+        if orbit.ndim != 2 or orbit.shape[0] != 2:
+            raise ValueError(f"expected an orbit of shape (2, n), got {orbit.shape}")
+        if self.n_snapshots is None:
+            self.n_snapshots = orbit.shape[1]
+        elif orbit.shape[1] != self.n_snapshots:
+            raise ValueError(
+                f"expected {self.n_snapshots} snapshots, got {orbit.shape[1]}"
+            )
+
+        self._buffer.append(orbit.T)
+        if len(self._buffer) == self.chunk_size:
+            self.flush()
+
+    def extend(self, orbits):
+        """
+        Append several orbits
+        """
+        for orbit in orbits:
+            self.append(orbit)
+
+    def flush(self):
+        """
+        Write the buffered orbits to a new chunk
+        """
+        if self._buffer:
+            np.save(
+                self.path / _chunk_name(len(self._chunk_lengths)),
+                np.stack(self._buffer),
+            )
+            self._chunk_lengths.append(len(self._buffer))
+            self._buffer = []
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = dict(
+            chunk_size=self.chunk_size,
+            n_snapshots=self.n_snapshots,
+            chunk_lengths=self._chunk_lengths,
+            attrs=self.attrs,
+        )
+        (self.path / _META_FILE).write_text(json.dumps(meta))
+
+    def iter_chunks(self) -> Iterator[np.ndarray]:
+        """
+        Iterate over the written chunks as read-only memory maps of shape
+        (n_orbits_in_chunk, n_snapshots, 2)
+
+        Orbits that are still buffered are not included, call `flush` first.
+        """
+        for index in range(len(self._chunk_lengths)):
+            yield np.load(self.path / _chunk_name(index), mmap_mode="r")
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """
+        Iterate over the orbits in the layout of `poincare`, shape
+        (2, n_snapshots)
+        """
+        for chunk in self.iter_chunks():
+            for orbit in chunk:
+                yield orbit.T
+        for orbit in self._buffer:
+            yield orbit.T
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """
+        Return orbit `index` in the layout of `poincare`
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("orbit index out of range")
+        for chunk_index, length in enumerate(self._chunk_lengths):
+            if index < length:
+                chunk = np.load(self.path / _chunk_name(chunk_index), mmap_mode="r")
+                return chunk[index].T
+            index -= length
+        return self._buffer[index].T
+
+    def mean_travelling_distance(self) -> np.ndarray:
+        """
+        The mean over the ensemble of the distance of every orbit from its
+        initial state, shape (n_snapshots,)
+
+        The reduction runs chunk by chunk.
+        """
+        self.flush()
+        total = np.zeros(self.n_snapshots or 0)
+        for chunk in self.iter_chunks():
+            translations = chunk - chunk[:, :1, :]
+            total += np.hypot(translations[..., 0], translations[..., 1]).sum(axis=0)
+        return total / max(len(self), 1)
@@ -1,14 +1,23 @@
 """
 this module contains functionality for studying the pendulum dynamics
 """
+from functools import partial
+from typing import Optional
+
 from .math import angle_to_2pi
+from .cache import integration_options_to_dict
+from .checkpoint import run_checkpointed
 from .losses import LossTimeResult
+from .sampling import new_seed, sample_rectangle
+from .sweep import run_sweep
 from multiple_wave_transport.math import generate_random_pairs
-from scipy.special import ellipk
+from scipy.special import ellipj, ellipk
 import numpy as np
 
 from ._multiple_wave_transport import (
     BoundaryType,
+    IntegrationOptions,
+    LossHistogram,
     PerturbedPendulum,
     UnperturbedPendulum,
     PerturbedPendulumWithLowFrequency
@@ -33,25 +42,111 @@ def unperturbed_period(s):
     return 2 * np.pi / unperturbed_omega(s)
 
 
-def generate_random_init_trapped_states(n, E_min=-1, E_max=1):
+def unperturbed_state_at_angle(E, theta):
+    """
+    Return the state of the unperturbed pendulum on the energy level E at the
+    canonical angle theta, using the closed form Jacobi elliptic solution.
+
+    The angle is measured from the bottom of the well (x = pi, p > 0), so that
+    theta = omega * t along the unperturbed orbit. E and theta may be arrays,
+    in which case an array of shape (..., 2) is returned. Only trapped energies
+    -1 <= E < 1 are supported.
+    """
+    E = np.asarray(E, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+
+    k_sq = 0.5 * (1 + E)
+    k = np.sqrt(k_sq)
+    # theta / omega, with omega = pi / (2 K(k^2))
+    u = theta * 2 * ellipk(k_sq) / np.pi
+    sn, cn, _, _ = ellipj(u, k_sq)
+
+    x = np.pi + 2 * np.arcsin(k * sn)
+    p = 2 * k * cn
+    return np.stack([x, p], axis=-1)
+
+
+def _integrate_state_at_angle(E, theta):
+    """
+    Numerical counterpart of unperturbed_state_at_angle for a single particle
+    """
+    x0 = np.pi
+    p = np.sqrt(2 * (E + 1))
+    s0 = (x0, p)
+    omega = unperturbed_omega(s0)
+
+    return UnperturbedPendulum().integrate(s0, theta / omega)
+
+
+def generate_random_init_trapped_states(
+    n,
+    E_min=-1,
+    E_max=1,
+    method="analytic",
+    rng=None,
+    sampling="random",
+    start=0,
+    total=None,
+):
     """
     Generate n random initial states that are trapped in the unperturbed potential.
     The states are uniformly distributed in the energy level and the canonical angle of the action angle pair.
+
+    Parameters:
+    -----------
+    n: int
+        number of states
+    E_min, E_max: float
+        the energy range, -1 <= E_min < E_max <= 1
+    method: str
+        "analytic" places all the states at once with the closed form solution
+        of the unperturbed pendulum, "numerical" integrates every state with
+        UnperturbedPendulum.integrate (slow, kept for validation)
+    rng: int or np.random.Generator, optional
+        seed or generator of the random numbers, the global numpy random
+        state by default
+    sampling: str
+        the design of the (E, theta) pairs, see sampling.SAMPLING_METHODS
+    start: int
+        the index of the first state in the design, e.g. for the shards of
+        a run; not supported by the "random" design
+    total: int, optional
+        the size of the whole "stratified" design, start + n by default
+
+    Returns:
+    --------
+    states: np.ndarray, shape (n, 2)
     """
-    init_pairs = generate_random_pairs(n, E_min, E_max, 0, 2 * np.pi)
+    init_pairs = sample_rectangle(
+        n, (E_min, E_max), (0, 2 * np.pi), sampling, rng, start, total
+    )
+    E, theta = init_pairs[:, 0], init_pairs[:, 1]
 
-    trapped_states = []
+    if method == "analytic":
+        return unperturbed_state_at_angle(E, theta)
+    elif method == "numerical":
+        states = [_integrate_state_at_angle(*pair) for pair in init_pairs]
+        return np.array(states).reshape(-1, 2)
+    else:
+        raise ValueError(f"Unknown method: {method}")
 
-    for E, theta in init_pairs:
-        x0 = np.pi
-        p = np.sqrt(2 * (E + 1))
-        s0 = (x0, p)
-        omega = unperturbed_omega(s0)
 
-        s = UnperturbedPendulum().integrate(s0, theta / omega)
-        trapped_states.append(s)
+def generate_trapped_states_batch(
+    n, seed, batch, start, sampling="random", total=None
+):
+    """
+    The initial states of one batch of an ensemble drawn in batches
 
-    return trapped_states
+    Batch b of a "random" design is drawn from its own stream
+    np.random.SeedSequence(seed, spawn_key=(b,)), the other designs are
+    drawn from the offset `start` of the design with `seed`.
+    """
+    if sampling == "random":
+        stream = np.random.SeedSequence(seed, spawn_key=(batch,))
+        return generate_random_init_trapped_states(n, rng=stream)
+    return generate_random_init_trapped_states(
+        n, rng=seed, sampling=sampling, start=start, total=total
+    )
 
 
 def build_pendulum(amplitude):
@@ -66,22 +161,303 @@ def calculate_loss_times(
     amplitude: float,
     n_particles: int,
     boundary_type: BoundaryType = BoundaryType.X,
+    n_threads: int = 0,
+    block_size: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    seed: Optional[int] = None,
+    shard_dir=None,
+    chunk_size: int = 10_000,
+    cache=None,
+    sampling: str = "random",
 ):
     """
     Calculate the loss times for a set of initial conditions
+
+    The ensemble is integrated in C++ over `n_threads` native threads
+    (0 uses every available core). With `block_size > 0` every thread
+    integrates blocks of that many particles in lockstep with vectorized
+    force evaluation, which is several times faster than the default scalar
+    steppers but not bit-identical to them. `integration_options` selects
+    the stepper and tolerances (see IntegrationOptions); the lockstep engine
+    only supports the default Dopri5 stepper.
+
+    The initial states are drawn from the design `sampling` (see
+    sampling.SAMPLING_METHODS) with `seed`; without a seed a fresh one is
+    drawn and recorded in the options of the result. If `shard_dir` is
+    given, the particles are integrated in chunks of `chunk_size` and every
+    finished chunk is saved there, so that a restarted calculation with the
+    same parameters resumes after the last complete chunk (see
+    checkpoint.run_checkpointed). This requires a seed.
+
+    If a ResultCache is passed as `cache`, the result is looked up by the
+    hash of the system, the parameters, the seed and the integration options
+    and only calculated if it is not cached yet. This requires a seed.
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    if seed is None:
+        if cache is not None:
+            raise ValueError("cached calculations need a seed")
+        if shard_dir is not None:
+            raise ValueError("checkpointed calculations need a seed")
+        seed = new_seed()
+
+    pend = build_pendulum(amplitude)
+
+    def make_initial_states():
+        return generate_random_init_trapped_states(
+            n_particles, rng=seed, sampling=sampling
+        )
+
+    def compute_loss_times(states):
+        return pend.get_loss_times(
+            states,
+            t_max,
+            boundary_type,
+            n_threads=n_threads,
+            block_size=block_size,
+            options=integration_options,
+        )
+
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        n_particles=n_particles,
+        boundary_type=boundary_type.name,
+        seed=seed,
+        sampling=sampling,
+        # resuming a checkpointed run with another integrator must not mix
+        # shards of the two
+        lockstep=block_size > 0,
+        integration_options=integration_options_to_dict(integration_options),
+    )
+
+    def calculate():
+        if shard_dir is not None:
+            return run_checkpointed(
+                shard_dir, options, make_initial_states, compute_loss_times, chunk_size
+            )
+
+        init_trapped_states = make_initial_states()
+        loss_times = compute_loss_times(init_trapped_states)
+        return LossTimeResult(init_trapped_states, loss_times, options)
+
+    if cache is None:
+        return calculate()
+
+    params = dict(
+        kind="loss_times",
+        system=type(pend).__name__,
+        **options,
+    )
+    return cache.loss_time_result(params, calculate)
+
+
+def calculate_loss_histogram(
+    t_max: float,
+    amplitude,
+    n_particles: int,
+    n_bins: int = 10_000,
+    n_p_bins: int = 0,
+    p_range=(-2.0, 2.0),
+    boundary_type: BoundaryType = BoundaryType.X,
+    n_threads: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    seed: Optional[int] = None,
+    sampling: str = "random",
+    chunk_size: int = 100_000,
+):
+    """
+    Calculate the histogram of the loss times of a trapped ensemble without
+    keeping the loss times
+
+    The ensemble is drawn and integrated in chunks of `chunk_size`
+    particles whose loss times are binned in C++ (see LossHistogram), so the
+    memory does not grow with n_particles. With `n_p_bins > 0` the lost
+    particles are also binned by their initial momentum in `p_range`.
+    The chunks are drawn with generate_trapped_states_batch. A "stratified"
+    design places its points in a random permutation of all the cells, so it
+    cannot be drawn chunk by chunk in constant memory and is not supported.
+
+    Returns:
+    --------
+    histogram: LossHistogram
+    options: dict of the parameters of the run, including the seed
     """
+    if sampling == "stratified":
+        raise ValueError(
+            "the stratified design cannot be drawn in chunks, use calculate_loss_times"
+        )
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    if seed is None:
+        seed = new_seed()
+
     pend = build_pendulum(amplitude)
-    init_trapped_states = generate_random_init_trapped_states(n_particles)
-    loss_times = np.array(
-        [pend.get_loss_time(s, t_max, boundary_type) for s in init_trapped_states]
+    histogram = LossHistogram(t_max, n_bins, n_p_bins, *p_range)
+    for chunk, start in enumerate(range(0, n_particles, chunk_size)):
+        states = generate_trapped_states_batch(
+            min(chunk_size, n_particles - start),
+            seed,
+            chunk,
+            start,
+            sampling,
+            n_particles,
+        )
+        pend.accumulate_loss_histogram(
+            histogram,
+            states,
+            boundary_type,
+            n_threads=n_threads,
+            options=integration_options,
+        )
+
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        n_particles=n_particles,
+        boundary_type=boundary_type.name,
+        seed=seed,
+        sampling=sampling,
+        chunk_size=chunk_size,
+    )
+    return histogram, options
+
+
+def _loss_times_chunk(
+    t_max, boundary_name, block_size, integration_options, amplitude, states
+):
+    """
+    the loss times of a chunk of a sweep, run in a worker process
+    """
+    return build_pendulum(amplitude).get_loss_times(
+        states,
+        t_max,
+        BoundaryType.__members__[boundary_name],
+        n_threads=1,
+        block_size=block_size,
+        options=integration_options,
+    )
+
+
+def sweep_loss_times(
+    t_max: float,
+    amplitudes,
+    n_particles: int,
+    boundary_type: BoundaryType = BoundaryType.X,
+    seed: Optional[int] = None,
+    chunk_size: int = 2000,
+    n_workers: Optional[int] = None,
+    block_size: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    sampling: str = "random",
+):
+    """
+    Calculate the loss times for several amplitudes on a process pool
+
+    Every amplitude is split into chunks of `chunk_size` particles, which are
+    scheduled over `n_workers` processes with the low amplitudes, where most
+    particles survive until t_max, first (see sweep.run_sweep). Every
+    amplitude uses the initial states drawn from the design `sampling` with
+    `seed`, a fresh seed recorded in the options if it is not given.
+
+    Returns:
+    --------
+    results: dict mapping the amplitudes to their LossTimeResult
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    if seed is None:
+        seed = new_seed()
+
+    states = {
+        amplitude: generate_random_init_trapped_states(
+            n_particles, rng=seed, sampling=sampling
+        )
+        for amplitude in amplitudes
+    }
+    compute = partial(
+        _loss_times_chunk,
+        t_max,
+        boundary_type.name,
+        block_size,
+        integration_options,
+    )
+    loss_times = run_sweep(
+        amplitudes, states.__getitem__, compute, chunk_size, n_workers
     )
 
+    return {
+        amplitude: LossTimeResult(
+            states[amplitude],
+            loss_times[amplitude],
+            dict(
+                t_max=t_max,
+                amplitude=amplitude,
+                n_particles=n_particles,
+                boundary_type=boundary_type.name,
+                seed=seed,
+                sampling=sampling,
+                lockstep=block_size > 0,
+                integration_options=integration_options_to_dict(integration_options),
+            ),
+        )
+        for amplitude in amplitudes
+    }
+
+
+def calculate_diffusion_moments(
+    t_max: float,
+    amplitude,
+    n_particles: int,
+    E_min: float = -1,
+    E_max: float = 1,
+    n_threads: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    seed: Optional[int] = None,
+    sampling: str = "random",
+):
+    """
+    Calculate the moments of the travelling distance of trapped particles
+
+    The particles are integrated in C++ and only the running moments of the
+    distance from the initial states at every poincare_dt snapshot are kept
+    (see DiffusionMoments), so memory does not grow with n_particles.
+    `integration_options` defaults to the Poincare section settings. The
+    initial states are drawn from the design `sampling` with `seed`, a fresh
+    seed recorded in the options if it is not given.
+
+    Returns:
+    --------
+    moments: DiffusionMoments
+    options: dict of the parameters of the run, including the seed
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions.poincare_default()
+    if seed is None:
+        seed = new_seed()
+
+    pend = build_pendulum(amplitude)
+    init_trapped_states = generate_random_init_trapped_states(
+        n_particles, E_min, E_max, rng=seed, sampling=sampling
+    )
+    moments = pend.diffusion_moments(
+        init_trapped_states,
+        t_max,
+        n_threads=n_threads,
+        options=integration_options,
+    )
     options = dict(
         t_max=t_max,
         amplitude=amplitude,
         n_particles=n_particles,
+        E_min=E_min,
+        E_max=E_max,
+        seed=seed,
+        sampling=sampling,
+        integration_options=integration_options_to_dict(integration_options),
     )
-    return LossTimeResult(init_trapped_states, loss_times, options)
+    return moments, options
 
 
 def generate_poincare_plot(ax, amplitude, t_max=2500):
@@ -90,7 +466,8 @@ def generate_poincare_plot(ax, amplitude, t_max=2500):
     """
     pendulum = build_pendulum(amplitude)
 
-    initial_states = generate_random_pairs(100, 0, 2 * np.pi, -1.5, 1.5)
-    for s in initial_states:
-        pc = pendulum.poincare(s, t_max)
-        ax.plot(angle_to_2pi(pc[0]), pc[1], "k,", alpha=0.5)  # type: ignore
+    initial_states = np.array(generate_random_pairs(100, 0, 2 * np.pi, -1.5, 1.5))
+    orbits = pendulum.poincare_many(initial_states, t_max)
+    ax.plot(
+        angle_to_2pi(orbits[..., 0]).ravel(), orbits[..., 1].ravel(), "k,", alpha=0.5
+    )  # type: ignore
@@ -0,0 +1,134 @@
+"""
+This module contains the designs of the initial conditions of the ensembles
+
+Besides i.i.d. uniform points ("random", as math.generate_random_pairs), the
+ensembles can be drawn from scrambled Sobol or Halton sequences or from a
+jittered stratified grid. These fill the sampled rectangle much more evenly
+than independent points, so that averages over the ensemble like the loss
+time histograms converge faster with the number of particles.
+
+Every design is reproducible from its seed and can be drawn in slices: the
+points [start, start + n) of a design of `total` points are the same whether
+the design is drawn at once or in pieces, e.g. by the shards of a run.
+"""
+import hashlib
+import json
+import warnings
+from typing import Optional
+
+import numpy as np
+from scipy.stats import qmc
+
+from .math import generate_random_pairs
+
+SAMPLING_METHODS = ("random", "sobol", "halton", "stratified")
+
+
+def new_seed() -> int:
+    """
+    A fresh seed from the entropy of the system, to be recorded with a run
+    """
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> 1)
+
+
+def derive_seed(seed: int, *key) -> int:
+    """
+    The seed of the run `key` (e.g. an amplitude) of a family of runs with
+    the base `seed`, so that every run draws its own ensemble, independent
+    of the others, but reproducibly from the base seed
+
+    Parameters:
+        seed: the base seed of the family of runs
+        key: JSON serializable values that identify the run
+    """
+    digest = hashlib.sha256(json.dumps(key).encode()).digest()
+    entropy = [seed, int.from_bytes(digest[:8], "little")]
+    return int(np.random.SeedSequence(entropy).generate_state(1, np.uint64)[0] >> 1)
+
+
+def _stratified(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    n points jittered in n distinct cells of a grid of at least n cells, in
+    random order
+    """
+    n_x = max(1, int(np.sqrt(n)))
+    n_y = -(-n // n_x)
+    cells = rng.choice(n_x * n_y, n, replace=False)
+    i, j = np.divmod(cells, n_y)
+    jitter = rng.uniform(size=(n, 2))
+    return np.column_stack([(i + jitter[:, 0]) / n_x, (j + jitter[:, 1]) / n_y])
+
+
+def unit_square(
+    n: int,
+    method: str = "random",
+    seed: Optional[int] = None,
+    start: int = 0,
+    total: Optional[int] = None,
+) -> np.ndarray:
+    """
+    The points [start, start + n) of a design on the unit square
+
+    Parameters:
+        n: the number of points
+        method: one of SAMPLING_METHODS
+        seed: the seed of the design; the global numpy random state is used
+            for "random" designs without a seed
+        start: the index of the first point, only supported by the
+            deterministic sequences ("sobol", "halton") and "stratified"
+        total: the size of the whole "stratified" design, start + n by default
+
+    Returns:
+        the points, shape (n, 2)
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {method}")
+    if method == "random":
+        if start != 0:
+            raise ValueError(
+                "random designs cannot be drawn from an offset, "
+                "use sharding.block_random_states"
+            )
+        return np.array(generate_random_pairs(n, 0, 1, 0, 1, seed)).reshape(-1, 2)
+
+    if method == "stratified":
+        total = start + n if total is None else total
+        if start + n > total:
+            raise ValueError("the slice exceeds the stratified design")
+        points = _stratified(total, np.random.default_rng(seed))
+        return points[start : start + n]
+
+    # a Generator passed as seed= draws the same scrambling as rng=seed of
+    # scipy >= 1.15, which older versions do not accept
+    sequence = (qmc.Sobol if method == "sobol" else qmc.Halton)(
+        d=2, seed=np.random.default_rng(seed)
+    )
+    if start > 0:
+        sequence.fast_forward(start)
+    with warnings.catch_warnings():
+        # Sobol points are balanced for powers of 2 only, but still better
+        # distributed than random points for other n
+        warnings.simplefilter("ignore", UserWarning)
+        return sequence.random(n)
+
+
+def sample_rectangle(
+    n: int,
+    x_range,
+    y_range,
+    method: str = "random",
+    seed: Optional[int] = None,
+    start: int = 0,
+    total: Optional[int] = None,
+) -> np.ndarray:
+    """
+    The points [start, start + n) of a design on the rectangle
+    x_range x y_range, see unit_square
+
+    Returns:
+        the points, shape (n, 2)
+    """
+    points = unit_square(n, method, seed, start, total)
+    lower = np.array([x_range[0], y_range[0]])
+    upper = np.array([x_range[1], y_range[1]])
+    return lower + points * (upper - lower)
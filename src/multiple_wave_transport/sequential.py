@@ -0,0 +1,177 @@
+"""
+This module contains sequential loss time calculations
+
+Instead of fixing the number of particles up front, the ensemble is
+integrated in batches. After every batch the escape rate of the steady regime
+is estimated from all loss times so far (see losses.fit_escape_rate), and the
+calculation stops as soon as the half width of its confidence interval drops
+below the requested relative error, or when the particle or wall time budget
+is used up. The decision and the history of the estimates are stored in the
+options of the result under "stopping".
+"""
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from scipy.stats import norm
+
+from ._multiple_wave_transport import BoundaryType, IntegrationOptions
+from .losses import LossTimeResult, fit_escape_rate
+from .pendulum import build_pendulum, generate_trapped_states_batch
+from .sampling import new_seed
+
+
+def run_sequential(
+    draw_states: Callable[[int, int], np.ndarray],
+    compute_loss_times: Callable[[np.ndarray], np.ndarray],
+    t_max: float,
+    t_min: float,
+    rel_error: float = 0.05,
+    batch_size: int = 10_000,
+    max_particles: int = 1_000_000,
+    max_time: Optional[float] = None,
+    confidence: float = 0.95,
+):
+    """
+    Integrate batches of particles until the escape rate has converged
+
+    Parameters:
+        draw_states: returns the initial states of shape (n, 2) of a batch,
+            called with the index of the batch and n
+        compute_loss_times: returns the loss times of the states
+        t_max: the integration time
+        t_min: the start of the steady regime used for the escape rate
+        rel_error: the requested half width of the confidence interval of
+            the escape rate, relative to the rate
+        batch_size: the number of particles per batch
+        max_particles: the particle budget
+        max_time: the wall time budget in seconds, no limit by default
+        confidence: the confidence level of the interval
+
+    Returns:
+        states: the initial states of all batches, shape (N, 2)
+        loss_times: their loss times, shape (N,)
+        stopping: the reason to stop ("converged", "max_particles" or
+            "max_time"), the settings and the history of the estimates
+    """
+    z = norm.ppf(0.5 + confidence / 2)
+    start = time.perf_counter()
+    states, loss_times, history = [], [], []
+    n_particles = 0
+    reason = "max_particles"
+
+    while n_particles < max_particles:
+        n = min(batch_size, max_particles - n_particles)
+        batch = np.asarray(draw_states(len(history), n), dtype=float).reshape(-1, 2)
+        states.append(batch)
+        loss_times.append(np.asarray(compute_loss_times(batch), dtype=float))
+        n_particles += n
+
+        try:
+            alpha, alpha_err = fit_escape_rate(
+                np.concatenate(loss_times), t_min, t_max
+            )
+        except ValueError:
+            alpha, alpha_err = np.nan, np.inf
+        error = float(z * alpha_err / alpha) if alpha > 0 else np.inf
+        elapsed = time.perf_counter() - start
+        history.append(
+            dict(
+                n_particles=n_particles,
+                alpha=alpha,
+                alpha_err=alpha_err,
+                rel_error=error,
+                elapsed=elapsed,
+            )
+        )
+
+        if error <= rel_error:
+            reason = "converged"
+            break
+        if max_time is not None and elapsed >= max_time:
+            reason = "max_time"
+            break
+
+    stopping = dict(
+        reason=reason,
+        rel_error=rel_error,
+        confidence=confidence,
+        t_min=t_min,
+        batch_size=batch_size,
+        max_particles=max_particles,
+        max_time=max_time,
+        history=history,
+    )
+    return np.concatenate(states), np.concatenate(loss_times), stopping
+
+
+def calculate_loss_times_sequential(
+    t_max: float,
+    amplitude,
+    t_min: float = 200.0,
+    rel_error: float = 0.05,
+    batch_size: int = 10_000,
+    max_particles: int = 1_000_000,
+    max_time: Optional[float] = None,
+    confidence: float = 0.95,
+    boundary_type: BoundaryType = BoundaryType.X,
+    n_threads: int = 0,
+    block_size: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    seed: Optional[int] = None,
+    sampling: str = "random",
+) -> LossTimeResult:
+    """
+    Calculate the loss times of the pendulum in batches until the escape rate
+    of the steady regime t > t_min is known to the relative error
+    `rel_error` (see run_sequential)
+
+    The arguments of the integration are those of
+    pendulum.calculate_loss_times. The batches are drawn with
+    pendulum.generate_trapped_states_batch.
+    """
+    if sampling == "stratified":
+        raise ValueError("stratified designs need the number of particles up front")
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    if seed is None:
+        seed = new_seed()
+
+    pend = build_pendulum(amplitude)
+
+    def draw_states(batch, n):
+        return generate_trapped_states_batch(
+            n, seed, batch, batch * batch_size, sampling
+        )
+
+    def compute_loss_times(states):
+        return pend.get_loss_times(
+            states,
+            t_max,
+            boundary_type,
+            n_threads=n_threads,
+            block_size=block_size,
+            options=integration_options,
+        )
+
+    states, loss_times, stopping = run_sequential(
+        draw_states,
+        compute_loss_times,
+        t_max,
+        t_min,
+        rel_error,
+        batch_size,
+        max_particles,
+        max_time,
+        confidence,
+    )
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        n_particles=len(states),
+        boundary_type=boundary_type.name,
+        seed=seed,
+        sampling=sampling,
+        stopping=stopping,
+    )
+    return LossTimeResult(states, loss_times, options)
@@ -0,0 +1,531 @@
+"""
+This module contains the sharded execution of large pendulum and three wave
+runs
+
+The global ensemble of a run is split into N contiguous shards which can be
+computed independently, e.g. on different nodes sharing a filesystem. The
+initial states are drawn in fixed blocks of BLOCK_SIZE particles, block b
+from its own random stream derived from the seed with
+np.random.SeedSequence(seed, spawn_key=(b,)). A shard draws only the blocks
+overlapping its slice, so the global ensemble is the same for every number
+of shards. The deterministic designs of the sampling module ("sobol",
+"halton", "stratified") are instead drawn directly from the offset of the
+shard.
+
+Every shard writes its partial result to the output folder and `merge`
+validates the shards and combines them:
+
+    python -m multiple_wave_transport.sharding loss-times --shard 0/4 ...
+    ...
+    python -m multiple_wave_transport.sharding loss-times --shard 3/4 ...
+    python -m multiple_wave_transport.sharding merge OUT_FOLDER
+
+The loss times of the three wave system are sharded the same way with
+`loss-times --system three-wave --p-max ... --p-init-range ...`. The stepper
+and tolerances (--stepper, --atol, ...) and the lockstep engine
+(--block-size) are recorded in the options of every shard, so shards
+computed with different integrators are refused by `merge`.
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from ._multiple_wave_transport import (
+    BoundaryType,
+    DiffusionMoments,
+    IntegrationOptions,
+    StepperKind,
+    SymplecticScheme,
+    ThreeWaveSystem,
+)
+from .cache import integration_options_to_dict
+from .losses import LossTimeResult, to_json
+from .pendulum import build_pendulum, generate_random_init_trapped_states
+from .sampling import SAMPLING_METHODS, sample_rectangle
+
+BLOCK_SIZE = 1024
+
+_LOSS_TIMES_SUFFIX = ".npd"
+_MOMENTS_SUFFIX = ".moments.npz"
+_MOMENT_FIELDS = ("times", "count", "mean", "m2", "m3", "m4")
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """
+    Parse a shard specification "i/N" into (i, N), 0 <= i < N
+    """
+    try:
+        index, n_shards = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard specification: {spec!r}, expected i/N")
+    if not 0 <= index < n_shards:
+        raise ValueError(f"invalid shard specification: {spec!r}, need 0 <= i < N")
+    return index, n_shards
+
+
+def shard_range(n_particles: int, index: int, n_shards: int) -> tuple[int, int]:
+    """
+    The slice [begin, end) of the global ensemble computed by a shard
+    """
+    return (n_particles * index // n_shards, n_particles * (index + 1) // n_shards)
+
+
+def block_random_states(
+    sample: Callable[[int, np.random.Generator], np.ndarray],
+    seed: int,
+    begin: int,
+    end: int,
+    block_size: int = BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    The states [begin, end) of an ensemble drawn block-wise
+
+    Parameters:
+        sample: returns n states of shape (n, 2) drawn with a generator
+        seed: the seed of the global ensemble
+        begin, end: the slice of the global ensemble
+        block_size: the number of particles per random stream
+
+    Returns:
+        the states, shape (end - begin, 2)
+    """
+    first_block, last_block = begin // block_size, (end - 1) // block_size
+    blocks = [
+        sample(
+            block_size,
+            np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,))),
+        )
+        for block in range(first_block, last_block + 1)
+    ]
+    if not blocks:
+        return np.zeros((0, 2))
+    states = np.concatenate(blocks).reshape(-1, 2)
+    offset = first_block * block_size
+    return states[begin - offset : end - offset]
+
+
+def trapped_states(
+    n_particles, seed, begin, end, E_min=-1.0, E_max=1.0, sampling="random"
+):
+    """
+    The slice [begin, end) of the trapped ensemble of a sharded run
+    """
+    if sampling != "random":
+        end = min(end, n_particles)
+        return generate_random_init_trapped_states(
+            end - begin,
+            E_min,
+            E_max,
+            rng=seed,
+            sampling=sampling,
+            start=begin,
+            total=n_particles,
+        )
+    return block_random_states(
+        lambda n, rng: generate_random_init_trapped_states(n, E_min, E_max, rng=rng),
+        seed,
+        begin,
+        min(end, n_particles),
+    )
+
+
+def three_wave_states(
+    n_particles, seed, begin, end, p_init_range, sampling="random"
+):
+    """
+    The slice [begin, end) of the ensemble of a sharded three wave run,
+    uniform in 0 < x < 2 pi and p_init_range
+    """
+    end = min(end, n_particles)
+    if sampling != "random":
+        return sample_rectangle(
+            end - begin,
+            (0, 2 * np.pi),
+            p_init_range,
+            sampling,
+            seed,
+            start=begin,
+            total=n_particles,
+        )
+    return block_random_states(
+        lambda n, rng: sample_rectangle(n, (0, 2 * np.pi), p_init_range, seed=rng),
+        seed,
+        begin,
+        end,
+    )
+
+
+def _shard_name(kind: str, index: int, n_shards: int, suffix: str) -> str:
+    return f"{kind}_{index:04d}-of-{n_shards:04d}{suffix}"
+
+
+def run_loss_times_shard(
+    out_folder,
+    index: int,
+    n_shards: int,
+    t_max: float,
+    amplitude,
+    n_particles: int,
+    seed: int,
+    boundary_type: BoundaryType = BoundaryType.X,
+    n_threads: int = 0,
+    sampling: str = "random",
+    block_size: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+) -> Path:
+    """
+    Calculate the loss times of one shard of a pendulum run and save its
+    partial LossTimeResult in out_folder
+
+    Returns:
+        the path of the shard
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    begin, end = shard_range(n_particles, index, n_shards)
+    states = trapped_states(n_particles, seed, begin, end, sampling=sampling)
+    loss_times = build_pendulum(amplitude).get_loss_times(
+        states,
+        t_max,
+        boundary_type,
+        n_threads=n_threads,
+        block_size=block_size,
+        options=integration_options,
+    )
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        n_particles=n_particles,
+        boundary_type=boundary_type.name,
+        seed=seed,
+        sampling=sampling,
+        lockstep=block_size > 0,
+        integration_options=integration_options_to_dict(integration_options),
+    )
+    return _save_loss_times_shard(
+        out_folder, index, n_shards, begin, end, states, loss_times, options
+    )
+
+
+def run_three_wave_loss_times_shard(
+    out_folder,
+    index: int,
+    n_shards: int,
+    t_max: float,
+    amplitude: float,
+    n_particles: int,
+    seed: int,
+    p_max: float,
+    p_init_range: tuple[float, float],
+    n_threads: int = 0,
+    sampling: str = "random",
+    block_size: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+) -> Path:
+    """
+    Calculate the loss times of one shard of a three wave run (see
+    three_wave.calculate_loss_times) and save its partial LossTimeResult in
+    out_folder
+
+    Returns:
+        the path of the shard
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions()
+    begin, end = shard_range(n_particles, index, n_shards)
+    states = three_wave_states(n_particles, seed, begin, end, p_init_range, sampling)
+    loss_times = ThreeWaveSystem(amplitude).get_loss_times(
+        states,
+        p_max,
+        t_max,
+        n_threads=n_threads,
+        block_size=block_size,
+        options=integration_options,
+    )
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        p_init_range=tuple(p_init_range),
+        p_max=p_max,
+        n_particles=n_particles,
+        seed=seed,
+        sampling=sampling,
+        lockstep=block_size > 0,
+        integration_options=integration_options_to_dict(integration_options),
+    )
+    return _save_loss_times_shard(
+        out_folder, index, n_shards, begin, end, states, loss_times, options
+    )
+
+
+def _save_loss_times_shard(
+    out_folder, index, n_shards, begin, end, states, loss_times, options
+) -> Path:
+    options = dict(
+        options, shard=dict(index=index, n_shards=n_shards, begin=begin, end=end)
+    )
+    path = Path(out_folder) / _shard_name(
+        "loss_times", index, n_shards, _LOSS_TIMES_SUFFIX
+    )
+    LossTimeResult(states, loss_times, options).save(path)
+    return path
+
+
+def run_diffusion_shard(
+    out_folder,
+    index: int,
+    n_shards: int,
+    t_max: float,
+    amplitude,
+    n_particles: int,
+    seed: int,
+    E_min: float = -1.0,
+    E_max: float = 1.0,
+    n_threads: int = 0,
+    sampling: str = "random",
+    integration_options: Optional[IntegrationOptions] = None,
+) -> Path:
+    """
+    Accumulate the diffusion moments of one shard (see
+    diffusion_moments) and save them in out_folder
+
+    Returns:
+        the path of the shard
+    """
+    if integration_options is None:
+        integration_options = IntegrationOptions.poincare_default()
+    begin, end = shard_range(n_particles, index, n_shards)
+    states = trapped_states(n_particles, seed, begin, end, E_min, E_max, sampling)
+    moments = build_pendulum(amplitude).diffusion_moments(
+        states, t_max, n_threads=n_threads, options=integration_options
+    )
+    options = dict(
+        t_max=t_max,
+        amplitude=amplitude,
+        n_particles=n_particles,
+        E_min=E_min,
+        E_max=E_max,
+        seed=seed,
+        sampling=sampling,
+        integration_options=integration_options_to_dict(integration_options),
+        shard=dict(index=index, n_shards=n_shards, begin=begin, end=end),
+    )
+    Path(out_folder).mkdir(parents=True, exist_ok=True)
+    path = Path(out_folder) / _shard_name("moments", index, n_shards, _MOMENTS_SUFFIX)
+    np.savez(
+        path,
+        options=to_json(options),
+        **{field: getattr(moments, field) for field in _MOMENT_FIELDS},
+    )
+    return path
+
+
+def _validate(shard_options: list[dict]):
+    """
+    check that the shards belong to one run and cover its ensemble once
+    """
+    if not shard_options:
+        raise ValueError("no shards found")
+
+    def run_options(options):
+        return {k: v for k, v in options.items() if k != "shard"}
+
+    reference = run_options(shard_options[0])
+    n_shards = shard_options[0]["shard"]["n_shards"]
+    for options in shard_options:
+        if run_options(options) != reference:
+            raise ValueError(f"shards of different runs: {reference} and {options}")
+        if options["shard"]["n_shards"] != n_shards:
+            raise ValueError("shards of different partitions of the run")
+
+    indices = sorted(options["shard"]["index"] for options in shard_options)
+    if indices != list(range(n_shards)):
+        missing = sorted(set(range(n_shards)) - set(indices))
+        raise ValueError(f"missing or duplicate shards, missing: {missing}")
+
+    position = 0
+    for options in sorted(shard_options, key=lambda o: o["shard"]["index"]):
+        if options["shard"]["begin"] != position:
+            raise ValueError("the shards do not cover the ensemble contiguously")
+        position = options["shard"]["end"]
+    if position != reference["n_particles"]:
+        raise ValueError("the shards do not cover the ensemble")
+    return reference
+
+
+def merge_loss_times(folder, out: Optional[Path] = None) -> LossTimeResult:
+    """
+    Validate and concatenate the loss time shards in folder, in the order of
+    the global ensemble. The merged result is saved to out if given.
+    """
+    shards = [
+        LossTimeResult.load(path)
+        for path in sorted(Path(folder).glob("loss_times_*" + _LOSS_TIMES_SUFFIX))
+    ]
+    options = _validate([shard.options for shard in shards])
+    shards.sort(key=lambda shard: shard.options["shard"]["index"])
+    result = LossTimeResult(
+        np.concatenate([shard.initial_states for shard in shards]),
+        np.concatenate([shard.loss_times for shard in shards]),
+        options,
+    )
+    if out is not None:
+        result.save(out)
+    return result
+
+
+def merge_diffusion_moments(folder, out: Optional[Path] = None):
+    """
+    Validate and combine the diffusion moment shards in folder. The merged
+    moments are saved to out (an .npz file) if given.
+
+    Returns:
+        the merged DiffusionMoments and the options of the run
+    """
+    shards = [
+        dict(np.load(path))
+        for path in sorted(Path(folder).glob("moments_*" + _MOMENTS_SUFFIX))
+    ]
+    for shard in shards:
+        shard["options"] = json.loads(str(shard["options"]))
+    options = _validate([shard["options"] for shard in shards])
+    shards.sort(key=lambda shard: shard["options"]["shard"]["index"])
+
+    moments = DiffusionMoments(*(shards[0][field] for field in _MOMENT_FIELDS))
+    for shard in shards[1:]:
+        moments.merge(DiffusionMoments(*(shard[field] for field in _MOMENT_FIELDS)))
+
+    if out is not None:
+        np.savez(
+            out,
+            options=to_json(options),
+            **{field: getattr(moments, field) for field in _MOMENT_FIELDS},
+        )
+    return moments, options
+
+
+def _amplitude(values):
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+def _integration_options(args, options: IntegrationOptions) -> IntegrationOptions:
+    """
+    the default options of the run with the ones given on the command line
+    """
+    if args.stepper is not None:
+        options.stepper = StepperKind.__members__[args.stepper]
+    if args.scheme is not None:
+        options.scheme = SymplecticScheme.__members__[args.scheme]
+    for name in ("atol", "rtol", "steps_per_period"):
+        if getattr(args, name) is not None:
+            setattr(options, name, getattr(args, name))
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m multiple_wave_transport.sharding",
+        description="sharded loss time and diffusion runs of the pendulum and "
+        "loss time runs of the three wave system",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_arguments(command):
+        command.add_argument("--shard", type=parse_shard, default=(0, 1))
+        command.add_argument("--amplitude", type=float, nargs="+", required=True)
+        command.add_argument("--t-max", type=float, required=True)
+        command.add_argument("--n-particles", type=int, required=True)
+        command.add_argument("--seed", type=int, required=True)
+        command.add_argument("--sampling", choices=SAMPLING_METHODS, default="random")
+        command.add_argument("--n-threads", type=int, default=0)
+        command.add_argument("--out", type=Path, required=True)
+        command.add_argument("--stepper", choices=list(StepperKind.__members__))
+        command.add_argument("--scheme", choices=list(SymplecticScheme.__members__))
+        command.add_argument("--atol", type=float)
+        command.add_argument("--rtol", type=float)
+        command.add_argument("--steps-per-period", type=int)
+
+    loss_times = commands.add_parser("loss-times", help="loss times of one shard")
+    add_run_arguments(loss_times)
+    loss_times.add_argument(
+        "--system", choices=["pendulum", "three-wave"], default="pendulum"
+    )
+    loss_times.add_argument("--boundary", choices=["X", "P"], default="X")
+    loss_times.add_argument("--p-max", type=float, help="three waves only")
+    loss_times.add_argument(
+        "--p-init-range", type=float, nargs=2, help="three waves only"
+    )
+    loss_times.add_argument("--block-size", type=int, default=0)
+
+    diffusion = commands.add_parser("diffusion", help="diffusion moments of one shard")
+    add_run_arguments(diffusion)
+    diffusion.add_argument("--E-min", type=float, default=-1.0)
+    diffusion.add_argument("--E-max", type=float, default=1.0)
+
+    merge = commands.add_parser("merge", help="validate and merge the shards")
+    merge.add_argument("folder", type=Path)
+    merge.add_argument("--kind", choices=["loss-times", "diffusion"], default="loss-times")
+    merge.add_argument("--out", type=Path)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        if args.kind == "loss-times":
+            merge_loss_times(args.folder, args.out)
+        else:
+            merge_diffusion_moments(args.folder, args.out)
+        return
+
+    index, n_shards = args.shard
+    common = dict(
+        t_max=args.t_max,
+        amplitude=_amplitude(args.amplitude),
+        n_particles=args.n_particles,
+        seed=args.seed,
+        n_threads=args.n_threads,
+        sampling=args.sampling,
+    )
+    if args.command == "loss-times":
+        common.update(
+            block_size=args.block_size,
+            integration_options=_integration_options(args, IntegrationOptions()),
+        )
+        if args.system == "three-wave":
+            if args.p_max is None or args.p_init_range is None:
+                parser.error("three wave runs need --p-max and --p-init-range")
+            path = run_three_wave_loss_times_shard(
+                args.out,
+                index,
+                n_shards,
+                p_max=args.p_max,
+                p_init_range=tuple(args.p_init_range),
+                **common,
+            )
+        else:
+            path = run_loss_times_shard(
+                args.out,
+                index,
+                n_shards,
+                boundary_type=BoundaryType.__members__[args.boundary],
+                **common,
+            )
+    else:
+        path = run_diffusion_shard(
+            args.out,
+            index,
+            n_shards,
+            E_min=args.E_min,
+            E_max=args.E_max,
+            integration_options=_integration_options(
+                args, IntegrationOptions.poincare_default()
+            ),
+            **common,
+        )
+    print(path)
+
+
+if __name__ == "__main__":
+    main()
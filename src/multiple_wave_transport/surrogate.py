@@ -0,0 +1,400 @@
+"""
+This module contains a tabulated surrogate of the period map
+
+The pendulums and the three wave system are periodic in time, so a loss time
+calculation iterates the map over one period poincare_dt. The surrogate
+tabulates this map once on an adaptive quadtree of (x, p) cells: every cell
+holds the map at order x order Chebyshev points and interpolates it with the
+barycentric formula. The interpolation error of every cell is estimated by
+comparing with the exact map at a few interior points, and cells are split
+until the estimate is below the tolerance. Cells that still miss the
+tolerance at the maximum depth, and cells touching particles that are lost
+within the period (the neighbourhood of the boundary), fall back to the
+exact map, as do states outside of the tabulated region. Cells in which all
+particles are lost within the period are not refined.
+
+Iterating millions of particles through the surrogate costs a few array
+operations per period, so loss time histograms can be estimated without an
+ODE integration per particle.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from ._multiple_wave_transport import BoundaryType, IntegrationOptions
+from .pendulum import build_pendulum
+
+
+def _chebyshev_nodes(order: int) -> np.ndarray:
+    """
+    Chebyshev points of the second kind on [-1, 1], in ascending order
+    """
+    return -np.cos(np.pi * np.arange(order) / (order - 1))
+
+
+def _barycentric_weights(order: int) -> np.ndarray:
+    weights = (-1.0) ** np.arange(order)
+    weights[[0, -1]] *= 0.5
+    return weights
+
+
+def _basis(u: np.ndarray, nodes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    The barycentric interpolation coefficients at the points u, shape
+    (len(u), order)
+    """
+    diff = u[:, None] - nodes[None, :]
+    exact = diff == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coefficients = weights / diff
+    on_node = exact.any(axis=1)
+    coefficients[on_node] = exact[on_node]
+    return coefficients / coefficients.sum(axis=1, keepdims=True)
+
+
+@dataclass
+class _Cells:
+    """
+    Rectangular cells [x0, x0 + dx] x [p0, p0 + dp] at some quadtree depth
+    """
+
+    x0: np.ndarray
+    p0: np.ndarray
+    dx: np.ndarray
+    dp: np.ndarray
+    depth: np.ndarray
+
+    def __len__(self):
+        return len(self.x0)
+
+    def points(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        The points at the local coordinates (u, v) in [-1, 1]^2 of every
+        cell, shape (n_cells, len(u), 2)
+        """
+        x = self.x0[:, None] + 0.5 * (u[None, :] + 1) * self.dx[:, None]
+        p = self.p0[:, None] + 0.5 * (v[None, :] + 1) * self.dp[:, None]
+        return np.stack([x, p], axis=-1)
+
+    def split(self) -> "_Cells":
+        """
+        The four children of every cell
+        """
+        dx, dp = self.dx / 2, self.dp / 2
+        return _Cells(
+            np.concatenate([self.x0, self.x0 + dx, self.x0, self.x0 + dx]),
+            np.concatenate([self.p0, self.p0, self.p0 + dp, self.p0 + dp]),
+            np.tile(dx, 4),
+            np.tile(dp, 4),
+            np.tile(self.depth + 1, 4),
+        )
+
+    def select(self, mask) -> "_Cells":
+        return _Cells(
+            self.x0[mask], self.p0[mask], self.dx[mask], self.dp[mask], self.depth[mask]
+        )
+
+    @staticmethod
+    def concatenate(cells: list) -> "_Cells":
+        return _Cells(
+            *(
+                np.concatenate([getattr(c, field) for c in cells])
+                for field in ("x0", "p0", "dx", "dp", "depth")
+            )
+        )
+
+
+class PeriodMapSurrogate:
+    """
+    Piecewise Chebyshev interpolant of a period map on an adaptive grid
+
+    Use `build` to tabulate a map.
+
+    Attributes:
+        bounds: ((x_min, x_max), (p_min, p_max)) of the tabulated region
+        period: the time the map advances the states
+        errors: the estimated interpolation error of every cell
+        fallback: which cells use the exact map
+        n_exact_evaluations: the number of states integrated to build it
+    """
+
+    def __init__(
+        self,
+        exact_map: Callable[[np.ndarray], np.ndarray],
+        is_outside: Callable[[np.ndarray], np.ndarray],
+        bounds,
+        period: float,
+        order: int,
+        base_cells: int,
+        max_depth: int,
+        cells: _Cells,
+        values: np.ndarray,
+        errors: np.ndarray,
+        fallback: np.ndarray,
+        n_exact_evaluations: int,
+    ):
+        self.exact_map = exact_map
+        self.is_outside = is_outside
+        self.bounds = tuple(tuple(float(b) for b in bound) for bound in bounds)
+        self.period = period
+        self.order = order
+        self.cells = cells
+        self.values = values
+        self.errors = errors
+        self.fallback = fallback
+        self.n_exact_evaluations = n_exact_evaluations
+
+        self._nodes = _chebyshev_nodes(order)
+        self._weights = _barycentric_weights(order)
+
+        # index of the leaf covering every cell of the finest level
+        self._resolution = base_cells * 2**max_depth
+        self._lookup = np.empty((self._resolution, self._resolution), dtype=np.int64)
+        (x_min, x_max), (p_min, p_max) = self.bounds
+        i0 = np.rint((cells.x0 - x_min) / (x_max - x_min) * self._resolution)
+        j0 = np.rint((cells.p0 - p_min) / (p_max - p_min) * self._resolution)
+        size = self._resolution // (base_cells * 2**cells.depth)
+        for leaf, (i, j, n) in enumerate(zip(i0.astype(int), j0.astype(int), size)):
+            self._lookup[i : i + n, j : j + n] = leaf
+
+    @classmethod
+    def build(
+        cls,
+        exact_map: Callable[[np.ndarray], np.ndarray],
+        is_outside: Callable[[np.ndarray], np.ndarray],
+        bounds,
+        period: float,
+        tol: float = 1e-5,
+        order: int = 8,
+        base_cells: int = 8,
+        max_depth: int = 4,
+    ) -> "PeriodMapSurrogate":
+        """
+        Tabulate a period map
+
+        Parameters:
+            exact_map: maps states of shape (n, 2) over one period, NaN for
+                the particles lost on the way (e.g. PerturbedPendulum.period_map)
+            is_outside: returns which of the states of shape (n, 2) are in the
+                loss region
+            bounds: ((x_min, x_max), (p_min, p_max)) of the tabulated region
+            period: the time the map advances the states
+            tol: the interpolation error every cell has to reach
+            order: the number of Chebyshev points per dimension and cell
+            base_cells: the number of cells per dimension of the coarsest grid
+            max_depth: the maximum number of refinements of a cell
+
+        Returns:
+            the surrogate
+        """
+        if order < 2:
+            raise ValueError("order must be at least 2")
+        (x_min, x_max), (p_min, p_max) = bounds
+        nodes = _chebyshev_nodes(order)
+        weights = _barycentric_weights(order)
+        node_u = np.repeat(nodes, order)
+        node_v = np.tile(nodes, order)
+        # interior points away from the nodes, where the error is estimated
+        check = np.array([-1, 1]) / np.sqrt(3)
+        check_u = np.repeat(check, 2)
+        check_v = np.tile(check, 2)
+
+        edges_x = np.linspace(x_min, x_max, base_cells + 1)[:-1]
+        edges_p = np.linspace(p_min, p_max, base_cells + 1)[:-1]
+        x0, p0 = (a.ravel() for a in np.meshgrid(edges_x, edges_p, indexing="ij"))
+        pending = _Cells(
+            x0,
+            p0,
+            np.full(len(x0), (x_max - x_min) / base_cells),
+            np.full(len(x0), (p_max - p_min) / base_cells),
+            np.zeros(len(x0), dtype=int),
+        )
+
+        leaves, leaf_values, leaf_errors, leaf_fallback = [], [], [], []
+        n_exact = 0
+        while len(pending):
+            n = len(pending)
+            points = np.concatenate(
+                [
+                    pending.points(node_u, node_v).reshape(-1, 2),
+                    pending.points(check_u, check_v).reshape(-1, 2),
+                ]
+            )
+            mapped = np.asarray(exact_map(points), dtype=float)
+            n_exact += len(points)
+            values = mapped[: n * order**2].reshape(n, order, order, 2)
+            exact_check = mapped[n * order**2 :].reshape(n, len(check_u), 2)
+
+            bu = _basis(check_u, nodes, weights)
+            bv = _basis(check_v, nodes, weights)
+            interpolated = np.einsum("ci,nijk,cj->nck", bu, values, bv)
+            with np.errstate(invalid="ignore"):
+                errors = np.abs(interpolated - exact_check).max(axis=(1, 2))
+            lost = np.isnan(values).any(axis=(1, 2, 3)) | np.isnan(exact_check).any(
+                axis=(1, 2)
+            )
+            errors[lost] = np.inf
+            # cells whose particles are all lost within the period are not
+            # refined, they are cheap to map exactly
+            all_lost = np.isnan(values).all(axis=(1, 2, 3)) & np.isnan(
+                exact_check
+            ).all(axis=(1, 2))
+
+            done = (errors <= tol) | all_lost | (pending.depth >= max_depth)
+            leaves.append(pending.select(done))
+            leaf_values.append(values[done])
+            leaf_errors.append(errors[done])
+            leaf_fallback.append(~(errors[done] <= tol))
+            pending = pending.select(~done).split()
+
+        return cls(
+            exact_map,
+            is_outside,
+            bounds,
+            period,
+            order,
+            base_cells,
+            max_depth,
+            _Cells.concatenate(leaves),
+            np.concatenate(leaf_values),
+            np.concatenate(leaf_errors),
+            np.concatenate(leaf_fallback),
+            n_exact,
+        )
+
+    @property
+    def max_error(self) -> float:
+        """
+        The largest estimated error of the interpolated cells
+        """
+        interpolated = self.errors[~self.fallback]
+        return float(interpolated.max()) if len(interpolated) else 0.0
+
+    def _leaf(self, states: np.ndarray) -> np.ndarray:
+        """
+        The cell of every state, -1 outside of the tabulated region
+        """
+        (x_min, x_max), (p_min, p_max) = self.bounds
+        with np.errstate(invalid="ignore"):
+            i = np.floor((states[:, 0] - x_min) / (x_max - x_min) * self._resolution)
+            j = np.floor((states[:, 1] - p_min) / (p_max - p_min) * self._resolution)
+            inside = (i >= 0) & (i < self._resolution) & (j >= 0) & (j < self._resolution)
+        leaf = np.full(len(states), -1)
+        leaf[inside] = self._lookup[i[inside].astype(int), j[inside].astype(int)]
+        return leaf
+
+    def __call__(self, states, chunk_size: int = 100_000) -> np.ndarray:
+        """
+        Apply the map to states of shape (n, 2); NaN for lost particles
+
+        The states in fallback cells or outside of the tabulated region are
+        mapped with the exact map.
+        """
+        states = np.asarray(states, dtype=float).reshape(-1, 2)
+        out = np.full_like(states, np.nan)
+        finite = np.isfinite(states).all(axis=1)
+        leaf = np.full(len(states), -1)
+        leaf[finite] = self._leaf(states[finite])
+        interpolate = leaf >= 0
+        interpolate[interpolate] = ~self.fallback[leaf[interpolate]]
+
+        indices = np.flatnonzero(interpolate)
+        for begin in range(0, len(indices), chunk_size):
+            index = indices[begin : begin + chunk_size]
+            cell = leaf[index]
+            u = 2 * (states[index, 0] - self.cells.x0[cell]) / self.cells.dx[cell] - 1
+            v = 2 * (states[index, 1] - self.cells.p0[cell]) / self.cells.dp[cell] - 1
+            bu = _basis(u, self._nodes, self._weights)
+            bv = _basis(v, self._nodes, self._weights)
+            out[index] = np.einsum("ni,nijk,nj->nk", bu, self.values[cell], bv)
+
+        exact = finite & ~interpolate
+        if exact.any():
+            out[exact] = self.exact_map(states[exact])
+        out[np.isfinite(out).all(axis=1) & self.is_outside(out)] = np.nan
+        return out
+
+    @property
+    def fallback_fraction(self) -> float:
+        """
+        The fraction of the tabulated area mapped exactly
+        """
+        area = self.cells.dx * self.cells.dp
+        return float(area[self.fallback].sum() / area.sum())
+
+    def loss_times(self, states, t_max: float) -> np.ndarray:
+        """
+        Estimate the loss times by iterating the map
+
+        A particle lost during the k-th period is assigned the loss time
+        k * period, so the loss times are resolved to one period. Particles
+        that are not lost within t_max get t_max, particles starting in the
+        loss region 0.
+
+        Parameters:
+            states: the initial states, shape (n, 2)
+            t_max: the maximum time, rounded up to whole periods
+
+        Returns:
+            the loss times, shape (n,)
+        """
+        states = np.asarray(states, dtype=float).reshape(-1, 2)
+        loss_times = np.full(len(states), float(t_max))
+        loss_times[self.is_outside(states)] = 0.0
+
+        active = np.flatnonzero(loss_times > 0)
+        current = states[active]
+        n_periods = int(np.ceil(t_max / self.period))
+        for k in range(1, n_periods + 1):
+            if not len(active):
+                break
+            current = self(current)
+            lost = np.isnan(current[:, 0])
+            loss_times[active[lost]] = min(k * self.period, t_max)
+            active, current = active[~lost], current[~lost]
+        return loss_times
+
+
+def pendulum_is_outside(boundary_type: BoundaryType) -> Callable:
+    """
+    The loss region of the pendulums, vectorized over states of shape (n, 2)
+    """
+    if boundary_type == BoundaryType.X:
+        return lambda s: (s[:, 0] < 0) | (s[:, 0] > 2 * np.pi)
+    return lambda s: np.abs(s[:, 1]) > 2.01
+
+
+def build_pendulum_surrogate(
+    amplitude,
+    boundary_type: BoundaryType = BoundaryType.X,
+    p_range: Optional[tuple] = None,
+    n_threads: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+    **kwargs,
+) -> PeriodMapSurrogate:
+    """
+    Tabulate the period map of the pendulum with the given amplitude(s)
+
+    The tabulated region is 0 <= x <= 2 pi and p in p_range, by default the
+    trapped region with a margin, |p| <= 2.1. See PeriodMapSurrogate.build
+    for the keyword arguments.
+    """
+    pendulum = build_pendulum(amplitude)
+    options = integration_options or IntegrationOptions()
+
+    def exact_map(states):
+        return pendulum.period_map(
+            states,
+            boundary_type=boundary_type,
+            n_threads=n_threads,
+            options=options,
+        )
+
+    return PeriodMapSurrogate.build(
+        exact_map,
+        pendulum_is_outside(boundary_type),
+        ((0.0, 2 * np.pi), p_range or (-2.1, 2.1)),
+        pendulum.poincare_dt,
+        **kwargs,
+    )
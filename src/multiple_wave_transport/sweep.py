@@ -0,0 +1,173 @@
+"""
+This module contains a work-balanced scheduler for parameter sweeps
+
+A sweep over several amplitudes is broken into (amplitude, particle chunk)
+tasks that are distributed over a process pool. Free workers pick up the
+next task as soon as they finish one, and the tasks are submitted in the
+order of decreasing expected cost, so the expensive chunks are not left for
+the end. The results are reassembled per amplitude (run_sweep), or handed
+over chunk by chunk as they finish (iter_sweep) so that they can be written
+out while the sweep runs.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Hashable, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def inverse_amplitude_cost(amplitude) -> float:
+    """
+    Expected cost per particle of a loss time calculation
+
+    At low amplitudes most particles survive until t_max, so they are the
+    most expensive to integrate. For a tuple of amplitudes their sum is used.
+    """
+    total = float(np.sum(amplitude))
+    return 1.0 / total if total > 0 else float("inf")
+
+
+@dataclass
+class SweepTask:
+    """
+    A chunk [begin, end) of the particles of one sweep item
+    """
+
+    item: Hashable
+    index: int
+    begin: int
+    end: int
+    cost: float
+
+
+def make_tasks(
+    sizes: dict, chunk_size: int, cost: Callable[[Hashable], float]
+) -> list[SweepTask]:
+    """
+    Split every item into chunks of chunk_size particles, most expensive
+    chunks first
+
+    Parameters:
+        sizes: the number of particles per item
+        chunk_size: the number of particles per task
+        cost: the expected cost per particle of an item
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    tasks = []
+    for item, size in sizes.items():
+        cost_per_particle = cost(item)
+        for index, begin in enumerate(range(0, size, chunk_size)):
+            end = min(begin + chunk_size, size)
+            tasks.append(
+                SweepTask(item, index, begin, end, cost_per_particle * (end - begin))
+            )
+    tasks.sort(key=lambda task: task.cost, reverse=True)
+    return tasks
+
+
+def iter_sweep(
+    items: Iterable[Hashable],
+    make_inputs: Callable[[Hashable], np.ndarray],
+    compute: Callable[[Hashable, np.ndarray], np.ndarray],
+    chunk_size: int = 1000,
+    n_workers: Optional[int] = None,
+    cost: Callable[[Hashable], float] = inverse_amplitude_cost,
+) -> Iterator[Tuple[Hashable, np.ndarray, bool]]:
+    """
+    Run compute over the particles of every item on a process pool and yield
+    the results of the chunks as they finish
+
+    The chunks of every item are yielded in order: a chunk that finishes
+    before the previous ones of its item is held back until they are done.
+    The results are not kept after they are yielded, so they can be written
+    to disk while the sweep runs, e.g. into an OrbitStore, without holding the
+    whole sweep in memory.
+
+    Parameters:
+        see run_sweep
+
+    Yields:
+        item: the sweep item
+        results: the results of the next chunk of the item, one per row
+        last: whether this was the last chunk of the item
+    """
+    items = list(items)
+    inputs = {item: make_inputs(item) for item in items}
+    tasks = make_tasks(
+        {item: len(inputs[item]) for item in items}, chunk_size, cost
+    )
+    n_chunks = {item: 0 for item in items}
+    for task in tasks:
+        n_chunks[task.item] += 1
+
+    def chunk(task):
+        return inputs[task.item][task.begin : task.end]
+
+    # the chunks that finished before the previous ones of their item
+    pending = {}
+    next_index = {item: 0 for item in items}
+
+    def finished(task, result):
+        pending[(task.item, task.index)] = result
+        item = task.item
+        while (item, next_index[item]) in pending:
+            result = pending.pop((item, next_index[item]))
+            next_index[item] += 1
+            yield item, np.asarray(result), next_index[item] == n_chunks[item]
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    if n_workers == 1:
+        for task in tasks:
+            yield from finished(task, compute(task.item, chunk(task)))
+    else:
+        with ProcessPoolExecutor(n_workers) as executor:
+            futures = {
+                executor.submit(compute, task.item, chunk(task)): task
+                for task in tasks
+            }
+            for future in as_completed(futures):
+                task = futures.pop(future)
+                yield from finished(task, future.result())
+
+
+def run_sweep(
+    items: Iterable[Hashable],
+    make_inputs: Callable[[Hashable], np.ndarray],
+    compute: Callable[[Hashable, np.ndarray], np.ndarray],
+    chunk_size: int = 1000,
+    n_workers: Optional[int] = None,
+    cost: Callable[[Hashable], float] = inverse_amplitude_cost,
+) -> dict:
+    """
+    Run compute over the particles of every item on a process pool
+
+    Parameters:
+        items: the sweep items, e.g. amplitudes
+        make_inputs: returns the per-particle inputs of an item, one per row;
+            it runs in the calling process
+        compute: returns the results for a chunk of inputs of an item, one
+            per row. It runs in the worker processes, so it must be picklable
+            (a module level function or a functools.partial of one)
+        chunk_size: the number of particles per task
+        n_workers: the number of processes, all cores by default; with 1 the
+            tasks run in the calling process
+        cost: the expected cost per particle of an item, used to submit the
+            most expensive tasks first
+
+    Returns:
+        dict mapping every item to the concatenated results of its chunks
+    """
+    items = list(items)
+    parts = {item: [] for item in items}
+    for item, results, _ in iter_sweep(
+        items, make_inputs, compute, chunk_size, n_workers, cost
+    ):
+        parts[item].append(results)
+    return {
+        item: np.concatenate(parts[item]) if parts[item] else np.zeros(0)
+        for item in items
+    }
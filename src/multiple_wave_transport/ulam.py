@@ -0,0 +1,228 @@
+"""
+This module contains an Ulam estimator of the escape rate
+
+The period map of a system is discretized on a grid of (x, p) cells: a few
+sample points of every cell are mapped over one period (in parallel in C++,
+e.g. PerturbedPendulum.period_map) and the fraction of them landing in every
+other cell gives a sparse, substochastic transition matrix. Its leading
+eigenvalue lambda, found with the sparse Arnoldi solver of scipy, is the
+fraction of the particles that survive one more period once the density has
+relaxed to the conditionally invariant density (the corresponding left
+eigenvector), so the steady escape rate is
+
+    alpha = -ln(lambda) / period
+
+without integrating a Monte Carlo ensemble up to the asymptotic regime.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import eigs
+
+from ._multiple_wave_transport import BoundaryType, IntegrationOptions
+from .losses import fit_escape_rate
+from .pendulum import build_pendulum
+
+
+@dataclass
+class UlamGrid:
+    """
+    A regular grid of n_x x n_p cells on ((x_min, x_max), (p_min, p_max))
+    """
+
+    bounds: tuple
+    n_x: int
+    n_p: int
+
+    @property
+    def n_cells(self) -> int:
+        return self.n_x * self.n_p
+
+    def cell_of(self, states: np.ndarray) -> np.ndarray:
+        """
+        The index of the cell of every state, -1 outside of the grid
+        """
+        (x_min, x_max), (p_min, p_max) = self.bounds
+        with np.errstate(invalid="ignore"):
+            i = np.floor((states[:, 0] - x_min) / (x_max - x_min) * self.n_x)
+            j = np.floor((states[:, 1] - p_min) / (p_max - p_min) * self.n_p)
+            inside = (i >= 0) & (i < self.n_x) & (j >= 0) & (j < self.n_p)
+        cells = np.full(len(states), -1)
+        cells[inside] = (i[inside] * self.n_p + j[inside]).astype(int)
+        return cells
+
+    def sample_points(self, n_samples: int) -> np.ndarray:
+        """
+        n_samples x n_samples points on a regular subgrid of every cell,
+        shape (n_cells, n_samples**2, 2)
+        """
+        (x_min, x_max), (p_min, p_max) = self.bounds
+        dx, dp = (x_max - x_min) / self.n_x, (p_max - p_min) / self.n_p
+        offsets = (np.arange(n_samples) + 0.5) / n_samples
+        cell_i, cell_j = np.divmod(np.arange(self.n_cells), self.n_p)
+        x = x_min + (cell_i[:, None] + np.repeat(offsets, n_samples)[None, :]) * dx
+        p = p_min + (cell_j[:, None] + np.tile(offsets, n_samples)[None, :]) * dp
+        return np.stack([x, p], axis=-1)
+
+    def centers(self) -> np.ndarray:
+        """
+        The centers of the cells, shape (n_cells, 2)
+        """
+        return self.sample_points(1)[:, 0]
+
+
+@dataclass
+class EscapeRate:
+    """
+    The result of the Ulam estimator
+
+    Attributes:
+        alpha: the escape rate
+        eigenvalue: the leading eigenvalue of the transition matrix, the
+            fraction of survivors per period
+        density: the conditionally invariant density per cell, normalized to
+            sum 1, shape (n_x, n_p)
+        grid: the partition
+        period: the time of one application of the map
+        transitions: the transition matrix, row i holds the fractions of the
+            samples of cell i that land in every cell
+    """
+
+    alpha: float
+    eigenvalue: float
+    density: np.ndarray
+    grid: UlamGrid
+    period: float
+    transitions: sparse.csr_matrix
+
+
+def transition_matrix(
+    exact_map: Callable[[np.ndarray], np.ndarray],
+    grid: UlamGrid,
+    n_samples: int = 4,
+    region: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> sparse.csr_matrix:
+    """
+    The Ulam transition matrix of a period map
+
+    Parameters:
+        exact_map: maps states of shape (n, 2) over one period, NaN for the
+            particles lost on the way
+        grid: the partition
+        n_samples: the samples per cell and dimension
+        region: if given, returns which of the states of shape (n, 2) belong
+            to the region of interest; cells whose centers are outside of it
+            are left out and images landing in them count as losses
+
+    Returns:
+        the sparse (n_cells, n_cells) matrix
+    """
+    points = grid.sample_points(n_samples)
+    per_cell = points.shape[1]
+    keep = np.ones(grid.n_cells, dtype=bool)
+    if region is not None:
+        keep = np.asarray(region(grid.centers()), dtype=bool)
+
+    sources = np.flatnonzero(keep)
+    images = np.asarray(exact_map(points[sources].reshape(-1, 2)), dtype=float)
+    rows = np.repeat(sources, per_cell)
+    columns = grid.cell_of(images)
+    valid = columns >= 0
+    valid[valid] = keep[columns[valid]]
+
+    return sparse.csr_matrix(
+        (np.full(valid.sum(), 1.0 / per_cell), (rows[valid], columns[valid])),
+        shape=(grid.n_cells, grid.n_cells),
+    )
+
+
+def escape_rate(
+    exact_map: Callable[[np.ndarray], np.ndarray],
+    bounds,
+    period: float,
+    shape: tuple = (128, 128),
+    n_samples: int = 4,
+    region: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> EscapeRate:
+    """
+    Estimate the steady escape rate from the leading eigenpair of the Ulam
+    transition matrix
+
+    Parameters:
+        exact_map: maps states of shape (n, 2) over one period, NaN for the
+            particles lost on the way
+        bounds: ((x_min, x_max), (p_min, p_max)) of the partition
+        period: the time of one application of the map
+        shape: the number of cells in x and p
+        n_samples: the samples per cell and dimension
+        region: see transition_matrix
+
+    Returns:
+        the EscapeRate
+    """
+    grid = UlamGrid(bounds, *shape)
+    transitions = transition_matrix(exact_map, grid, n_samples, region)
+
+    # densities evolve as row vectors, rho' = rho T
+    values, vectors = eigs(transitions.T.tocsr(), k=1, which="LM")
+    eigenvalue = float(np.real(values[0]))
+    density = np.abs(np.real(vectors[:, 0]))
+    density /= density.sum()
+
+    return EscapeRate(
+        alpha=-np.log(eigenvalue) / period,
+        eigenvalue=eigenvalue,
+        density=density.reshape(shape),
+        grid=grid,
+        period=period,
+        transitions=transitions,
+    )
+
+
+def pendulum_escape_rate(
+    amplitude,
+    boundary_type: BoundaryType = BoundaryType.X,
+    shape: tuple = (128, 128),
+    n_samples: int = 4,
+    n_threads: int = 0,
+    integration_options: Optional[IntegrationOptions] = None,
+) -> EscapeRate:
+    """
+    Ulam escape rate of the pendulum with the given amplitude(s)
+
+    The partition covers 0 <= x <= 2 pi and |p| <= 2.01, the region the
+    boundaries confine the trapped particles to.
+    """
+    pendulum = build_pendulum(amplitude)
+    options = integration_options or IntegrationOptions()
+
+    def exact_map(states):
+        return pendulum.period_map(
+            states, boundary_type=boundary_type, n_threads=n_threads, options=options
+        )
+
+    return escape_rate(
+        exact_map,
+        ((0.0, 2 * np.pi), (-2.01, 2.01)),
+        pendulum.poincare_dt,
+        shape,
+        n_samples,
+    )
+
+
+def monte_carlo_escape_rate(result, t_min: float, t_max: Optional[float] = None) -> float:
+    """
+    The escape rate of the particles of a LossTimeResult lost in the window
+    t_min < t < t_max, see losses.fit_escape_rate
+
+    Parameters:
+        result: the LossTimeResult
+        t_min: the start of the steady regime
+        t_max: the end of the window, by default the t_max of the run
+    """
+    if t_max is None:
+        t_max = result.options["t_max"]
+    alpha, _ = fit_escape_rate(result.loss_times, t_min, t_max)
+    return alpha
@@ -0,0 +1,339 @@
+"""
+This module contains a work-precision harness for the loss time calculations
+
+A fixed reference ensemble is integrated once with tight tolerances and then
+with every setting of a grid of steppers and tolerances. For every setting
+the wall time and the number of right hand side evaluations (see
+count_loss_times of the systems) are recorded together with the error of
+the loss time statistics and of the fitted escape rate against the
+reference, so that the cheapest setting that still reproduces the physics
+can be read off a work-precision diagram.
+
+The errors of single trajectories are not meaningful for chaotic orbits:
+they grow exponentially with the integration time whatever the tolerance.
+Only the statistics of the ensemble are compared.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.stats import ks_2samp
+
+from ._multiple_wave_transport import (
+    BoundaryType,
+    IntegrationOptions,
+    StepperKind,
+    ThreeWaveSystem,
+)
+from .cache import integration_options_to_dict
+from .losses import fit_escape_rate
+from .pendulum import build_pendulum, generate_random_init_trapped_states
+
+ADAPTIVE_STEPPERS = (
+    StepperKind.Dopri5,
+    StepperKind.CashKarp54,
+    StepperKind.BulirschStoer,
+)
+TOLERANCES = (1e-6, 1e-7, 1e-8, 1e-9, 1e-10, 1e-11, 1e-12)
+STEPS_PER_PERIOD = (16, 32, 64, 128)
+
+# the errors that can be plotted against the work
+ERRORS = ("ks_statistic", "mean_error", "median_error", "survival_error", "alpha_error")
+
+
+def default_settings() -> List[IntegrationOptions]:
+    """
+    The grid of settings: the adaptive steppers over TOLERANCES and the
+    symplectic stepper over STEPS_PER_PERIOD
+    """
+    settings = [
+        IntegrationOptions(stepper=stepper, atol=tol, rtol=tol)
+        for stepper in ADAPTIVE_STEPPERS
+        for tol in TOLERANCES
+    ]
+    settings += [
+        IntegrationOptions(stepper=StepperKind.Symplectic, steps_per_period=n)
+        for n in STEPS_PER_PERIOD
+    ]
+    return settings
+
+
+def reference_settings() -> IntegrationOptions:
+    """
+    The high precision setting of the reference ensemble
+    """
+    return IntegrationOptions(
+        stepper=StepperKind.Dopri5, atol=1e-13, rtol=1e-13, crossing_precision=1e-12
+    )
+
+
+def settings_label(options: IntegrationOptions) -> str:
+    """
+    A short label of a setting, e.g. "Dopri5 1e-10" or "Symplectic 64"
+    """
+    if options.stepper == StepperKind.Symplectic:
+        return f"Symplectic {options.scheme.name} {options.steps_per_period}"
+    return f"{options.stepper.name} {options.rtol:.0e}"
+
+
+@dataclass
+class LossStatistics:
+    """
+    The statistics of a loss time distribution that are compared with the
+    reference
+    """
+
+    mean: float
+    median: float
+    survival: float
+    alpha: float
+    alpha_err: float
+
+    @classmethod
+    def from_loss_times(cls, loss_times, t_min: float, t_max: float):
+        """
+        The statistics of the lost particles and the escape rate fitted in
+        the window t_min < t < t_max, see losses.fit_escape_rate
+        """
+        loss_times = np.asarray(loss_times)
+        lost = loss_times[loss_times < t_max]
+        try:
+            alpha, alpha_err = fit_escape_rate(loss_times, t_min, t_max)
+        except ValueError:
+            alpha, alpha_err = np.nan, np.nan
+        return cls(
+            mean=float(lost.mean()) if len(lost) else np.nan,
+            median=float(np.median(lost)) if len(lost) else np.nan,
+            survival=float(np.mean(loss_times >= t_max)),
+            alpha=alpha,
+            alpha_err=alpha_err,
+        )
+
+
+@dataclass
+class WorkPrecisionPoint:
+    """
+    The work and the errors of one setting
+
+    wall_time is the time of the whole ensemble in seconds and
+    rhs_evaluations the total number of right hand side evaluations. The
+    errors of the mean and median loss time of the lost particles are
+    relative, the survival error is the absolute difference of the fraction
+    of confined particles and ks_statistic the two sample Kolmogorov-Smirnov
+    statistic of the loss times. alpha_error is the relative error of the
+    escape rate and alpha_shift its difference in units of the standard error
+    of the reference: below 1 the integration error is hidden by the
+    sampling noise of the ensemble.
+    """
+
+    label: str
+    options: dict
+    wall_time: float
+    rhs_evaluations: float
+    statistics: LossStatistics
+    ks_statistic: float
+    mean_error: float
+    median_error: float
+    survival_error: float
+    alpha_error: float
+    alpha_shift: float
+    loss_times: np.ndarray = field(repr=False)
+
+
+def _relative_error(value, reference):
+    return float(abs(value - reference) / abs(reference)) if reference else np.nan
+
+
+def compare_loss_times(
+    loss_times, reference, t_min: float, t_max: float
+) -> Tuple[LossStatistics, dict]:
+    """
+    The statistics of loss_times and their errors against the reference loss
+    times of the same ensemble
+
+    Returns:
+        statistics: the LossStatistics of loss_times
+        errors: the errors, see WorkPrecisionPoint
+    """
+    statistics = LossStatistics.from_loss_times(loss_times, t_min, t_max)
+    ref = LossStatistics.from_loss_times(reference, t_min, t_max)
+    errors = dict(
+        ks_statistic=float(ks_2samp(loss_times, reference, method="asymp").statistic),
+        mean_error=_relative_error(statistics.mean, ref.mean),
+        median_error=_relative_error(statistics.median, ref.median),
+        survival_error=abs(statistics.survival - ref.survival),
+        alpha_error=_relative_error(statistics.alpha, ref.alpha),
+        alpha_shift=float(abs(statistics.alpha - ref.alpha) / ref.alpha_err),
+    )
+    return statistics, errors
+
+
+def run_work_precision(
+    compute: Callable[[np.ndarray, IntegrationOptions], Tuple[np.ndarray, np.ndarray]],
+    states: np.ndarray,
+    t_min: float,
+    t_max: float,
+    settings: Optional[Sequence[IntegrationOptions]] = None,
+    reference: Optional[IntegrationOptions] = None,
+) -> Tuple[WorkPrecisionPoint, List[WorkPrecisionPoint]]:
+    """
+    Integrate the ensemble with the reference and every setting
+
+    Parameters:
+        compute: returns the loss times and the rhs evaluations per particle
+            of the states for the options, e.g. a count_loss_times method
+        states: the reference ensemble, shape (N, 2)
+        t_min: the start of the window of the escape rate fit
+        t_max: the integration time
+        settings: the grid of settings, default_settings() by default
+        reference: the high precision setting, reference_settings() by default
+
+    Returns:
+        reference: the point of the reference setting, its errors are zero
+        points: one point per setting
+    """
+    if settings is None:
+        settings = default_settings()
+    if reference is None:
+        reference = reference_settings()
+
+    def measure(options, reference_times=None):
+        start = time.perf_counter()
+        loss_times, evaluations = compute(states, options)
+        wall_time = time.perf_counter() - start
+        if reference_times is None:
+            reference_times = loss_times
+        statistics, errors = compare_loss_times(
+            loss_times, reference_times, t_min, t_max
+        )
+        return WorkPrecisionPoint(
+            label=settings_label(options),
+            options=integration_options_to_dict(options),
+            wall_time=wall_time,
+            rhs_evaluations=float(np.sum(evaluations)),
+            statistics=statistics,
+            loss_times=np.asarray(loss_times),
+            **errors,
+        )
+
+    reference_point = measure(reference)
+    points = [measure(options, reference_point.loss_times) for options in settings]
+    return reference_point, points
+
+
+def pendulum_work_precision(
+    amplitude,
+    n_particles: int = 1000,
+    t_max: float = 500.0,
+    t_min: float = 100.0,
+    seed: int = 0,
+    boundary: BoundaryType = BoundaryType.X,
+    n_threads: int = 0,
+    settings: Optional[Sequence[IntegrationOptions]] = None,
+    reference: Optional[IntegrationOptions] = None,
+):
+    """
+    The work-precision points of the perturbed pendulum with an ensemble of
+    trapped states drawn with the seed, see run_work_precision
+
+    Parameters:
+        amplitude: the amplitude, or the pair of amplitudes of the pendulum
+            with low frequency, see pendulum.build_pendulum
+    """
+    pendulum = build_pendulum(amplitude)
+    states = generate_random_init_trapped_states(n_particles, rng=seed)
+
+    def compute(states, options):
+        return pendulum.count_loss_times(states, t_max, boundary, n_threads, options)
+
+    return run_work_precision(compute, states, t_min, t_max, settings, reference)
+
+
+def three_wave_work_precision(
+    amplitude: float,
+    p_init_range: Tuple[float, float] = (3.0, 8.0),
+    p_max: float = 10.0,
+    n_particles: int = 1000,
+    t_max: float = 500.0,
+    t_min: float = 50.0,
+    seed: int = 0,
+    n_threads: int = 0,
+    settings: Optional[Sequence[IntegrationOptions]] = None,
+    reference: Optional[IntegrationOptions] = None,
+):
+    """
+    The work-precision points of the three wave system with an ensemble
+    drawn uniformly with the seed, see run_work_precision
+    """
+    tws = ThreeWaveSystem(amplitude)
+    rng = np.random.default_rng(seed)
+    states = np.column_stack(
+        [
+            rng.uniform(0, 2 * np.pi, n_particles),
+            rng.uniform(*p_init_range, n_particles),
+        ]
+    )
+
+    def compute(states, options):
+        return tws.count_loss_times(states, p_max, t_max, n_threads, options)
+
+    return run_work_precision(compute, states, t_min, t_max, settings, reference)
+
+
+def format_table(points: Sequence[WorkPrecisionPoint]) -> str:
+    """
+    A plain text table of the work and the errors of the points
+    """
+    lines = [
+        f"{'setting':<28}{'time [s]':>10}{'rhs evals':>12}{'KS':>9}"
+        f"{'mean':>10}{'surv':>9}{'alpha':>10}{'shift':>8}"
+    ]
+    for p in points:
+        lines.append(
+            f"{p.label:<28}{p.wall_time:>10.3f}{p.rhs_evaluations:>12.3g}"
+            f"{p.ks_statistic:>9.4f}{p.mean_error:>10.2e}{p.survival_error:>9.4f}"
+            f"{p.alpha_error:>10.2e}{p.alpha_shift:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def plot_work_precision(
+    points: Sequence[WorkPrecisionPoint],
+    ax=None,
+    error: str = "alpha_error",
+    work: str = "rhs_evaluations",
+):
+    """
+    Plot the work-precision diagram of the points on log-log axes, one line
+    per stepper
+
+    Parameters:
+        points: the points of run_work_precision
+        ax: the matplotlib axes, the current ones by default
+        error: the error on the x axis, one of ERRORS
+        work: "rhs_evaluations" or "wall_time" on the y axis
+    """
+    import matplotlib.pyplot as plt
+
+    if error not in ERRORS:
+        raise ValueError(f"Unknown error: {error}")
+    if ax is None:
+        ax = plt.gca()
+
+    groups = {}
+    for p in points:
+        groups.setdefault(p.options["stepper"], []).append(p)
+    for stepper, group in groups.items():
+        # exact agreement with the reference cannot be shown on a log axis
+        shown = [p for p in group if getattr(p, error) > 0]
+        ax.loglog(
+            [getattr(p, error) for p in shown],
+            [getattr(p, work) for p in shown],
+            "o-",
+            label=stepper,
+        )
+    ax.set_xlabel(error.replace("_", " "))
+    ax.set_ylabel(work.replace("_", " "))
+    ax.legend()
+    return ax
@@ -1,10 +1,14 @@
 #include "perturbed_pendulum.hpp"
+#include "counting.hpp"
+#include "ensemble.hpp"
+#include "fast_math.hpp"
 #include "helper_collections.hpp"
+#include "lockstep.hpp"
+#include "moments.hpp"
+#include "steppers.hpp"
 #include <boost/math/constants/constants.hpp>
-#include <boost/numeric/odeint.hpp>
-#include <boost/numeric/odeint/external/eigen/eigen.hpp>
-#include <boost/numeric/odeint/stepper/generation/make_controlled.hpp>
 #include <cmath>
+#include <mutex>
 #include <iostream>
 
 namespace WP {
@@ -27,138 +31,134 @@ double UnperturbedPendulum::energy(const State &s) const noexcept {
   return 0.5 * p * p + cos(x);
 }
 
-State UnperturbedPendulum::integrate(const State &s, double t) const noexcept {
-  using namespace boost::numeric::odeint;
-  typedef boost::numeric::odeint::runge_kutta_dopri5<State> stepper_type;
-  using namespace boost::math::double_constants;
-
-  const double atol = 1.0e-10;
-  const double rtol = 1.0e-10;
-
-  auto stepper = make_controlled(atol, rtol, stepper_type());
-
-  State s_cur = s;
-  const auto dt_init = 0.01;
-
-  integrate_adaptive(stepper, *this, s_cur, 0.0, t, dt_init);
-
-  return s_cur;
+State UnperturbedPendulum::integrate(const State &s, double t,
+                                     const IntegrationOptions &options) const {
+  return integrate_state(*this, s, 0.0, t, options);
 }
 
-class PushBackStateObesrver {
-  WP::collections::OrbitStdVector &m_states;
-
-public:
-  PushBackStateObesrver(WP::collections::OrbitStdVector &states)
-      : m_states(states) {}
-
-  void reserve(size_t n) { m_states.reserve(n); }
-  void operator()(const WP::State &x, double /*t*/) { m_states.push_back(x); }
-};
-
-template <typename System>
-OrbitPoints poincare_impl(const System &sys, const State &s, double t_max,
-                          double delta_t) noexcept {
-  WP::collections::OrbitStdVector out{};
+// boundary functions of the confined domains, positive outside
 
-  using namespace boost::numeric::odeint;
-  typedef boost::numeric::odeint::runge_kutta_dopri5<State> stepper_type;
+double boundary_X(const State &s) {
   using namespace boost::math::double_constants;
-
-  const double atol = 1.0e-9;
-  const double rtol = 1.0e-9;
-
-  auto stepper = make_controlled(atol, rtol, stepper_type());
-
-  State s_cur = s;
-
-  auto observer = PushBackStateObesrver(out);
-  observer.reserve(static_cast<size_t>(std::ceil(t_max / delta_t)));
-
-  integrate_const(stepper, sys, s_cur, 0.0, t_max, delta_t,
-                  observer);
-  return out;
+  return std::max(-s[0], s[0] - two_pi);
 }
 
-bool is_outside_X(const State &s) {
-  using namespace boost::math::double_constants;
-  return (s[0] > two_pi) || (s[0] < 0.0);
-}
-
-bool is_outside_P(const State &s) { return (s[1] > 2.01) || (s[1] < -2.01); }
-
-template <typename DenseStepper>
-double track_down_cross_time(DenseStepper &stepper,
-                             bool (*is_outside)(const State &)) {
-  // improve accuracy of the crossing time by bisection method
-  // It is assumed that the event is detected at the last step taken by the
-  // stepper
+double boundary_P(const State &s) { return std::abs(s[1]) - 2.01; }
 
-  double t2 = stepper.current_time();
-  double dt = stepper.current_time_step();
-  double t1 = t2 - dt;
-
-  double t = (t1 + t2) / 2; // start with the midpoint
-  State x;
-
-  while (t2 - t1 > 1e-5) {    // until the precision is high enough
-    stepper.calc_state(t, x); // interpolate the state at time t
-    if (is_outside(x)) {
-      t2 = t; // if the event is detected, the time is too late
-    } else {
-      t1 = t; // if no event is detected, the time is too early
-    }
-    t = (t1 + t2) / 2; // update the time
-  }
-  return t;
-}
-
-auto get_boundary_check_function(WP::BoundaryType boundarytype) {
+auto get_boundary_function(WP::BoundaryType boundarytype) {
   switch (boundarytype) {
   case WP::BoundaryType::X:
-    return is_outside_X;
+    return boundary_X;
   case WP::BoundaryType::P:
-    return is_outside_P;
+    return boundary_P;
   default:
     throw std::runtime_error("Unknown boundary type");
   }
 }
 
 template <typename System>
-double get_loss_time_impl(const System &sys, const State &s_init, double t_max,
-                          WP::BoundaryType boundarytype) noexcept {
-  auto is_outside = get_boundary_check_function(boundarytype);
-
-  using namespace boost::numeric::odeint;
-
-  typedef boost::numeric::odeint::runge_kutta_dopri5<State> stepper_type;
-  const double atol = 1.0e-10;
-  const double rtol = 1.0e-10;
-  const double dt_init = 1.0e-3;
-
-  if (is_outside_X(s_init)) {
-    return 0.0;
-  }
+LossTime get_loss_time_impl(const System &sys, const State &s_init,
+                            double t_max, WP::BoundaryType boundarytype,
+                            const IntegrationOptions &options) {
+  return integrate_loss_time(sys, s_init, t_max,
+                             get_boundary_function(boundarytype),
+                             options, System::poincare_dt);
+}
 
-  // use controlled output stepper
-  // use boost adaptive step time iterators
-  //
-  auto stepper = make_dense_output(atol, rtol, stepper_type());
+template <typename System>
+States period_map_impl(const System &sys,
+                       const Eigen::Ref<const States> &states,
+                       unsigned n_periods, WP::BoundaryType boundarytype,
+                       unsigned n_threads, const IntegrationOptions &options) {
+  const auto boundary = get_boundary_function(boundarytype);
+  return transform_states(states, n_threads, [&](const State &s) {
+    return integrate_period_map(sys, s, n_periods, boundary, options,
+                                System::poincare_dt);
+  });
+}
 
-  State s_cur = s_init;
+template <typename System>
+std::pair<Vector, Mask>
+classify_loss_times_impl(const System &sys,
+                         const Eigen::Ref<const States> &states, double t_max,
+                         WP::BoundaryType boundarytype, unsigned n_threads,
+                         const IntegrationOptions &options) {
+  Vector loss_times(states.rows());
+  Mask confined(states.rows());
+  parallel_for_ranges(states.rows(), n_threads,
+                      [&](Eigen::Index begin, Eigen::Index end) {
+                        for (auto i = begin; i < end; i++) {
+                          const auto result = get_loss_time_impl(
+                              sys, State{states.row(i).transpose()}, t_max,
+                              boundarytype, options);
+                          loss_times[i] = result.time;
+                          confined[i] = result.confined;
+                        }
+                      });
+  return {loss_times, confined};
+}
 
-  const auto begin = make_adaptive_time_iterator_begin(
-      std::ref(stepper), sys, s_cur, 0.0, t_max, dt_init);
-  const auto end =
-      make_adaptive_time_iterator_end(std::ref(stepper), sys, s_cur);
+template <typename System>
+std::pair<Vector, Vector>
+count_loss_times_impl(const System &sys,
+                      const Eigen::Ref<const States> &states, double t_max,
+                      WP::BoundaryType boundarytype, unsigned n_threads,
+                      const IntegrationOptions &options) {
+  const auto boundary = get_boundary_function(boundarytype);
+  return map_states_counted(
+      sys, states, n_threads, [&](const auto &counting, const State &s) {
+        return integrate_loss_time(counting, s, t_max, boundary, options,
+                                   System::poincare_dt)
+            .time;
+      });
+}
 
-  for (auto it = begin; it != end; ++it) {
-    const auto &s = it->first;
-    if (is_outside(s)) {
-      return track_down_cross_time(stepper, is_outside);
-    }
-  }
-  return t_max;
+/**
+ * @brief      Integrate an ensemble and accumulate the moments of the
+ *             distance of every particle from its initial state at the
+ *             snapshots 0, delta_t, 2 delta_t, ... up to t_max.
+ *
+ *             Only O(n_snapshots) memory per thread is used. The particles
+ *             are split over n_threads native threads, each accumulating its
+ *             own moments, which are merged at the end; the order of the
+ *             merge depends on the scheduling, so results may differ from
+ *             run to run in the last digits.
+ *
+ * @param[in]  sys        The system
+ * @param[in]  states     The initial states, one particle per row
+ * @param[in]  t_max      The maximum integration time
+ * @param[in]  delta_t    The time between snapshots
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  opts       The integration options
+ * @return     The moments per snapshot
+ */
+template <typename System>
+DiffusionMoments diffusion_moments_impl(const System &sys,
+                                        const Eigen::Ref<const States> &states,
+                                        double t_max, double delta_t,
+                                        unsigned n_threads,
+                                        const IntegrationOptions &opts) {
+  const auto n_snap = n_snapshots(t_max, delta_t);
+  const Vector times = Vector::LinSpaced(
+      n_snap, 0.0, static_cast<double>(n_snap - 1) * delta_t);
+
+  DiffusionMoments total(times);
+  std::mutex total_mutex;
+
+  parallel_for_ranges(
+      states.rows(), n_threads, [&](Eigen::Index begin, Eigen::Index end) {
+        DiffusionMoments local(times);
+        for (auto i = begin; i < end; i++) {
+          const State s{states.row(i).transpose()};
+          const OrbitPoints orbit =
+              integrate_poincare(sys, s, t_max, delta_t, opts);
+          for (Eigen::Index k = 0; k < orbit.cols(); k++)
+            local.push(k, std::hypot(orbit(0, k) - s[0], orbit(1, k) - s[1]));
+        }
+        std::lock_guard<std::mutex> lock(total_mutex);
+        total.merge(local);
+      });
+  return total;
 }
 
 inline void PerturbedPendulum::operator()(const State &s, State &dsdt,
@@ -171,22 +171,106 @@ inline void PerturbedPendulum::operator()(const State &s, State &dsdt,
   dsdt[1] = sin(x) - epsilon * cos(5 * x - t / 2);
 }
 
+void PerturbedPendulum::block_force(const Vector &x, const Vector &t,
+                                    Vector &f) const noexcept {
+  const double *__restrict xi = x.data();
+  const double *__restrict ti = t.data();
+  double *__restrict fi = f.data();
+  const double eps = epsilon;
+
+  for (Eigen::Index i = 0; i < x.size(); i++)
+    fi[i] = fast_math::sin(xi[i]) - eps * fast_math::cos(5 * xi[i] - ti[i] / 2);
+}
+
 State PerturbedPendulum::call(const State &s, double t) const noexcept {
   State dsdt{2, 3};
   this->operator()(s, dsdt, t);
   return dsdt;
 }
 
-OrbitPoints PerturbedPendulum::poincare(const State &s,
-                                        double t_max) const noexcept {
+OrbitPoints PerturbedPendulum::poincare(
+    const State &s, double t_max, const IntegrationOptions &options) const {
+  return integrate_poincare(*this, s, t_max, poincare_dt, options);
+}
+
+void PerturbedPendulum::poincare_many(const Eigen::Ref<const States> &states,
+                          unsigned stride, Eigen::Ref<RowMatrix> out,
+                          unsigned n_threads,
+                          const IntegrationOptions &options) const {
+  auto opts = options;
+  opts.steps_per_period *= stride; // keep the symplectic step size
+  integrate_poincare_many(*this, states, stride * poincare_dt, n_threads, opts,
+                          out);
+}
+
+OrbitPoints PerturbedPendulum::poincare_symplectic(
+    const State &s, double t_max, unsigned steps_per_period,
+    SymplecticScheme scheme) const {
+  return symplectic_poincare(*this, s, t_max, poincare_dt, steps_per_period,
+                             scheme);
+}
+
+double PerturbedPendulum::get_loss_time(
+    const State &s_init, double t_max, WP::BoundaryType boundarytype,
+    const IntegrationOptions &options) const {
+  return get_loss_time_impl(*this, s_init, t_max, boundarytype, options).time;
+}
+
+DiffusionMoments PerturbedPendulum::diffusion_moments(
+    const Eigen::Ref<const States> &states, double t_max, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return diffusion_moments_impl(*this, states, t_max, poincare_dt, n_threads,
+                                options);
+}
+
+Vector PerturbedPendulum::get_loss_times(const Eigen::Ref<const States> &states,
+                                         double t_max,
+                                         WP::BoundaryType boundarytype,
+                                         unsigned n_threads,
+                                         Eigen::Index block_size,
+                                         const IntegrationOptions &options)
+    const {
+  if (block_size > 0)
+    return lockstep_loss_times(*this, states, t_max,
+                               get_boundary_function(boundarytype),
+                               n_threads, block_size, options);
+  return map_states(states, n_threads, [&](const State &s) {
+    return get_loss_time_impl(*this, s, t_max, boundarytype, options).time;
+  });
+}
+
+std::pair<Vector, Vector> PerturbedPendulum::count_loss_times(
+    const Eigen::Ref<const States> &states, double t_max,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return count_loss_times_impl(*this, states, t_max, boundarytype, n_threads,
+                               options);
+}
+
+void PerturbedPendulum::accumulate_loss_histogram(
+    LossHistogram &hist, const Eigen::Ref<const States> &states,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  WP::accumulate_loss_histogram(hist, states, n_threads, [&](const State &s) {
+    return get_loss_time_impl(*this, s, hist.t_max, boundarytype, options).time;
+  });
+}
 
-  return poincare_impl(*this, s, t_max, poincare_dt);
+States PerturbedPendulum::period_map(const Eigen::Ref<const States> &states,
+                                unsigned n_periods,
+                                WP::BoundaryType boundarytype,
+                                unsigned n_threads,
+                                const IntegrationOptions &options) const {
+  return period_map_impl(*this, states, n_periods, boundarytype, n_threads,
+                         options);
 }
 
-double
-PerturbedPendulum::get_loss_time(const State &s_init, double t_max,
-                                 WP::BoundaryType boundarytype) const noexcept {
-  return get_loss_time_impl(*this, s_init, t_max, boundarytype);
+std::pair<Vector, Mask> PerturbedPendulum::classify_loss_times(
+    const Eigen::Ref<const States> &states, double t_max,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return classify_loss_times_impl(*this, states, t_max, boundarytype,
+                                  n_threads, options);
 }
 
 inline void PerturbedPendulumWithLowFrequency::operator()(const State &s, State &dsdt,
@@ -202,6 +286,22 @@ inline void PerturbedPendulumWithLowFrequency::operator()(const State &s, State
             epsilon_low * cos(x - t * low_omega);
 }
 
+void PerturbedPendulumWithLowFrequency::block_force(const Vector &x,
+                                                    const Vector &t,
+                                                    Vector &f) const noexcept {
+  constexpr double low_omega = 0.05;
+  const double *__restrict xi = x.data();
+  const double *__restrict ti = t.data();
+  double *__restrict fi = f.data();
+  const double eps_high = epsilon_high;
+  const double eps_low = epsilon_low;
+
+  for (Eigen::Index i = 0; i < x.size(); i++)
+    fi[i] = fast_math::sin(xi[i]) -
+            eps_high * fast_math::cos(5 * xi[i] - ti[i] / 2) -
+            eps_low * fast_math::cos(xi[i] - ti[i] * low_omega);
+}
+
 State PerturbedPendulumWithLowFrequency::call(const State &s,
                                               double t) const noexcept {
   State dsdt{2, 3};
@@ -209,17 +309,85 @@ State PerturbedPendulumWithLowFrequency::call(const State &s,
   return dsdt;
 }
 
-OrbitPoints
-PerturbedPendulumWithLowFrequency::poincare(const State &s,
-                                            double t_max) const noexcept {
+OrbitPoints PerturbedPendulumWithLowFrequency::poincare(
+    const State &s, double t_max, const IntegrationOptions &options) const {
+  return integrate_poincare(*this, s, t_max, poincare_dt, options);
+}
 
-  return poincare_impl(*this, s, t_max, poincare_dt);
+void PerturbedPendulumWithLowFrequency::poincare_many(const Eigen::Ref<const States> &states,
+                          unsigned stride, Eigen::Ref<RowMatrix> out,
+                          unsigned n_threads,
+                          const IntegrationOptions &options) const {
+  auto opts = options;
+  opts.steps_per_period *= stride; // keep the symplectic step size
+  integrate_poincare_many(*this, states, stride * poincare_dt, n_threads, opts,
+                          out);
+}
+
+OrbitPoints PerturbedPendulumWithLowFrequency::poincare_symplectic(
+    const State &s, double t_max, unsigned steps_per_period,
+    SymplecticScheme scheme) const {
+  return symplectic_poincare(*this, s, t_max, poincare_dt, steps_per_period,
+                             scheme);
 }
 
 double PerturbedPendulumWithLowFrequency::get_loss_time(
-    const State &s_init, double t_max,
-    WP::BoundaryType boundarytype) const noexcept {
-  return get_loss_time_impl(*this, s_init, t_max, boundarytype);
+    const State &s_init, double t_max, WP::BoundaryType boundarytype,
+    const IntegrationOptions &options) const {
+  return get_loss_time_impl(*this, s_init, t_max, boundarytype, options).time;
+}
+
+DiffusionMoments PerturbedPendulumWithLowFrequency::diffusion_moments(
+    const Eigen::Ref<const States> &states, double t_max, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return diffusion_moments_impl(*this, states, t_max, poincare_dt, n_threads,
+                                options);
+}
+
+Vector PerturbedPendulumWithLowFrequency::get_loss_times(
+    const Eigen::Ref<const States> &states, double t_max,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    Eigen::Index block_size, const IntegrationOptions &options) const {
+  if (block_size > 0)
+    return lockstep_loss_times(*this, states, t_max,
+                               get_boundary_function(boundarytype),
+                               n_threads, block_size, options);
+  return map_states(states, n_threads, [&](const State &s) {
+    return get_loss_time_impl(*this, s, t_max, boundarytype, options).time;
+  });
+}
+
+std::pair<Vector, Vector> PerturbedPendulumWithLowFrequency::count_loss_times(
+    const Eigen::Ref<const States> &states, double t_max,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return count_loss_times_impl(*this, states, t_max, boundarytype, n_threads,
+                               options);
+}
+
+void PerturbedPendulumWithLowFrequency::accumulate_loss_histogram(
+    LossHistogram &hist, const Eigen::Ref<const States> &states,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  WP::accumulate_loss_histogram(hist, states, n_threads, [&](const State &s) {
+    return get_loss_time_impl(*this, s, hist.t_max, boundarytype, options).time;
+  });
+}
+
+States PerturbedPendulumWithLowFrequency::period_map(
+    const Eigen::Ref<const States> &states, unsigned n_periods,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return period_map_impl(*this, states, n_periods, boundarytype, n_threads,
+                         options);
+}
+
+std::pair<Vector, Mask> PerturbedPendulumWithLowFrequency::classify_loss_times(
+    const Eigen::Ref<const States> &states, double t_max,
+    WP::BoundaryType boundarytype, unsigned n_threads,
+    const IntegrationOptions &options) const {
+  return classify_loss_times_impl(*this, states, t_max, boundarytype,
+                                  n_threads, options);
 }
 
 } // namespace WP
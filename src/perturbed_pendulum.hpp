@@ -1,7 +1,12 @@
 #ifndef PERTURBED_PENDULUM_AU7HOOCA
 #define PERTURBED_PENDULUM_AU7HOOCA
+#include "histogram.hpp"
+#include "integration_options.hpp"
+#include "moments.hpp"
+#include "symplectic.hpp"
 #include "type_definitions.hpp"
 #include <boost/math/constants/constants.hpp>
+#include <utility>
 
 namespace WP {
 
@@ -10,7 +15,9 @@ enum class BoundaryType {X, P};
 class UnperturbedPendulum {
 public:
   void operator()(const State &s, State &dsdt, double t) const noexcept;
-  State integrate(const State &s, double t) const noexcept;
+  State integrate(const State &s, double t,
+                  const IntegrationOptions &options =
+                      IntegrationOptions::integrate_default()) const;
   double energy(const State &s) const noexcept;
 
 };
@@ -23,9 +30,33 @@ public:
   explicit PerturbedPendulum(double _epsilon) noexcept : epsilon(_epsilon){};
   State call(const State &s, double t) const noexcept;
   inline void operator()(const State &s, State &dsdt, double t) const noexcept;
+  void block_force(const Vector &x, const Vector &t, Vector &f) const noexcept;
   OrbitPoints repeat_state(const State &s) const noexcept;
-  OrbitPoints poincare(const State &s, double t_max) const noexcept;
-  double get_loss_time(const State &s_init, double t_max, BoundaryType b=BoundaryType::X) const noexcept;
+  OrbitPoints poincare(const State &s, double t_max,
+                       const IntegrationOptions &options =
+                           IntegrationOptions::poincare_default()) const;
+  void poincare_many(const Eigen::Ref<const States> &states, unsigned stride,
+                     Eigen::Ref<RowMatrix> out, unsigned n_threads = 0,
+                     const IntegrationOptions &options =
+                         IntegrationOptions::poincare_default()) const;
+  /**
+   * @brief      Sample the orbits of an ensemble every stride poincare_dt in
+   *             parallel into the preallocated out. Row i holds the (x, p)
+   *             pairs of the out.cols() / 2 snapshots of particle i; the
+   *             snapshots after a failed integration are NaN.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  stride     The number of poincare_dt between snapshots
+   * @param      out        The orbits, shape (N, 2 * n_snapshots)
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   */
+  OrbitPoints poincare_symplectic(
+      const State &s, double t_max, unsigned steps_per_period,
+      SymplecticScheme scheme = SymplecticScheme::Yoshida4) const;
+  double get_loss_time(const State &s_init, double t_max,
+                       BoundaryType b = BoundaryType::X,
+                       const IntegrationOptions &options = {}) const;
   /**
    * @brief      Calculate the time it takes for a single state to reach the
    * "loss region" p>p_max or t>t_max.
@@ -37,11 +68,118 @@ public:
    * returned. If the state is already in the loss region, 0 is returned.
    *
    *
-   * @param[in]  s_init  The initial state
-   * @param[in]  t_max   The maximum integration time
-   * @param[in]  dt      The initial time step
+   * @param[in]  s_init   The initial state
+   * @param[in]  t_max    The maximum integration time
+   * @param[in]  b        The boundary type
+   * @param[in]  options  The stepper, tolerances and crossing precision
    * @return     The time it takes to reach the loss region
    */
+  DiffusionMoments diffusion_moments(
+      const Eigen::Ref<const States> &states, double t_max,
+      unsigned n_threads = 0,
+      const IntegrationOptions &options =
+          IntegrationOptions::poincare_default()) const;
+  /**
+   * @brief      Accumulate the moments of the distance of the particles from
+   *             their initial states at the snapshots 0, poincare_dt, ...
+   *             up to t_max, without storing the orbits.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options, as for poincare
+   * @return     The moments per snapshot
+   */
+  Vector get_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                        BoundaryType b = BoundaryType::X,
+                        unsigned n_threads = 0,
+                        Eigen::Index block_size = 0,
+                        const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states.
+   *
+   *             Equivalent to calling get_loss_time on every row of states,
+   *             but the ensemble is split over n_threads native threads.
+   *             If block_size > 0, each thread integrates blocks of
+   *             block_size particles in lockstep (see lockstep.hpp) instead
+   *             of one scalar stepper per particle.
+   *
+   * @param[in]  states      The initial states, one particle per row
+   * @param[in]  t_max       The maximum integration time
+   * @param[in]  b           The boundary type
+   * @param[in]  n_threads   The number of threads, 0 for all available cores
+   * @param[in]  block_size  The number of lanes of the lockstep engine
+   * @param[in]  options     The stepper, tolerances and crossing precision;
+   *                         the lockstep engine only supports Dopri5
+   * @return     The loss times, one per particle
+   */
+  std::pair<Vector, Mask>
+  classify_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                      BoundaryType b = BoundaryType::X, unsigned n_threads = 0,
+                      const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states and flag
+   *             the particles whose integration was stopped early because
+   *             their orbits were classified as regular (see
+   *             IntegrationOptions::regularity_window); their loss time is
+   *             t_max.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The loss times and the confined flags, one per particle
+   */
+  std::pair<Vector, Vector>
+  count_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                   BoundaryType b = BoundaryType::X, unsigned n_threads = 0,
+                   const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states with one
+   *             scalar stepper per particle, like get_loss_times, and count
+   *             the right hand side evaluations spent on every particle.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The loss times and the numbers of evaluations, one per
+   *             particle
+   */
+  void accumulate_loss_histogram(LossHistogram &hist,
+                                 const Eigen::Ref<const States> &states,
+                                 BoundaryType b = BoundaryType::X,
+                                 unsigned n_threads = 0,
+                                 const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Add the loss times of an ensemble to a histogram instead of
+   *             returning them, integrating up to hist.t_max with one scalar
+   *             stepper per particle.
+   *
+   * @param      hist       The histogram to add the particles to
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   */
+  States period_map(const Eigen::Ref<const States> &states,
+                    unsigned n_periods = 1, BoundaryType b = BoundaryType::X,
+                    unsigned n_threads = 0,
+                    const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Apply the map over n_periods periods poincare_dt of the
+   *             perturbation to every state.
+   *
+   * @param[in]  states     The states, one particle per row
+   * @param[in]  n_periods  The number of periods
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The mapped states; NaN for the particles that are lost
+   *             within the n_periods periods
+   */
 };
 
 class PerturbedPendulumWithLowFrequency {
@@ -53,9 +191,33 @@ public:
   PerturbedPendulumWithLowFrequency(double _epsilon_high, double _epsilon_low) noexcept : epsilon_high(_epsilon_high), epsilon_low(_epsilon_low){};
   State call(const State &s, double t) const noexcept;
   inline void operator()(const State &s, State &dsdt, double t) const noexcept;
+  void block_force(const Vector &x, const Vector &t, Vector &f) const noexcept;
   OrbitPoints repeat_state(const State &s) const noexcept;
-  OrbitPoints poincare(const State &s, double t_max) const noexcept;
-  double get_loss_time(const State &s_init, double t_max, BoundaryType b=BoundaryType::X) const noexcept;
+  OrbitPoints poincare(const State &s, double t_max,
+                       const IntegrationOptions &options =
+                           IntegrationOptions::poincare_default()) const;
+  void poincare_many(const Eigen::Ref<const States> &states, unsigned stride,
+                     Eigen::Ref<RowMatrix> out, unsigned n_threads = 0,
+                     const IntegrationOptions &options =
+                         IntegrationOptions::poincare_default()) const;
+  /**
+   * @brief      Sample the orbits of an ensemble every stride poincare_dt in
+   *             parallel into the preallocated out. Row i holds the (x, p)
+   *             pairs of the out.cols() / 2 snapshots of particle i; the
+   *             snapshots after a failed integration are NaN.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  stride     The number of poincare_dt between snapshots
+   * @param      out        The orbits, shape (N, 2 * n_snapshots)
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   */
+  OrbitPoints poincare_symplectic(
+      const State &s, double t_max, unsigned steps_per_period,
+      SymplecticScheme scheme = SymplecticScheme::Yoshida4) const;
+  double get_loss_time(const State &s_init, double t_max,
+                       BoundaryType b = BoundaryType::X,
+                       const IntegrationOptions &options = {}) const;
   /**
    * @brief      Calculate the time it takes for a single state to reach the
    * "loss region" p>p_max or t>t_max.
@@ -67,11 +229,118 @@ public:
    * returned. If the state is already in the loss region, 0 is returned.
    *
    *
-   * @param[in]  s_init  The initial state
-   * @param[in]  t_max   The maximum integration time
-   * @param[in]  dt      The initial time step
+   * @param[in]  s_init   The initial state
+   * @param[in]  t_max    The maximum integration time
+   * @param[in]  b        The boundary type
+   * @param[in]  options  The stepper, tolerances and crossing precision
    * @return     The time it takes to reach the loss region
    */
+  DiffusionMoments diffusion_moments(
+      const Eigen::Ref<const States> &states, double t_max,
+      unsigned n_threads = 0,
+      const IntegrationOptions &options =
+          IntegrationOptions::poincare_default()) const;
+  /**
+   * @brief      Accumulate the moments of the distance of the particles from
+   *             their initial states at the snapshots 0, poincare_dt, ...
+   *             up to t_max, without storing the orbits.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options, as for poincare
+   * @return     The moments per snapshot
+   */
+  Vector get_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                        BoundaryType b = BoundaryType::X,
+                        unsigned n_threads = 0,
+                        Eigen::Index block_size = 0,
+                        const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states.
+   *
+   *             Equivalent to calling get_loss_time on every row of states,
+   *             but the ensemble is split over n_threads native threads.
+   *             If block_size > 0, each thread integrates blocks of
+   *             block_size particles in lockstep (see lockstep.hpp) instead
+   *             of one scalar stepper per particle.
+   *
+   * @param[in]  states      The initial states, one particle per row
+   * @param[in]  t_max       The maximum integration time
+   * @param[in]  b           The boundary type
+   * @param[in]  n_threads   The number of threads, 0 for all available cores
+   * @param[in]  block_size  The number of lanes of the lockstep engine
+   * @param[in]  options     The stepper, tolerances and crossing precision;
+   *                         the lockstep engine only supports Dopri5
+   * @return     The loss times, one per particle
+   */
+  std::pair<Vector, Mask>
+  classify_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                      BoundaryType b = BoundaryType::X, unsigned n_threads = 0,
+                      const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states and flag
+   *             the particles whose integration was stopped early because
+   *             their orbits were classified as regular (see
+   *             IntegrationOptions::regularity_window); their loss time is
+   *             t_max.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The loss times and the confined flags, one per particle
+   */
+  std::pair<Vector, Vector>
+  count_loss_times(const Eigen::Ref<const States> &states, double t_max,
+                   BoundaryType b = BoundaryType::X, unsigned n_threads = 0,
+                   const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states with one
+   *             scalar stepper per particle, like get_loss_times, and count
+   *             the right hand side evaluations spent on every particle.
+   *
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  t_max      The maximum integration time
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The loss times and the numbers of evaluations, one per
+   *             particle
+   */
+  void accumulate_loss_histogram(LossHistogram &hist,
+                                 const Eigen::Ref<const States> &states,
+                                 BoundaryType b = BoundaryType::X,
+                                 unsigned n_threads = 0,
+                                 const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Add the loss times of an ensemble to a histogram instead of
+   *             returning them, integrating up to hist.t_max with one scalar
+   *             stepper per particle.
+   *
+   * @param      hist       The histogram to add the particles to
+   * @param[in]  states     The initial states, one particle per row
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   */
+  States period_map(const Eigen::Ref<const States> &states,
+                    unsigned n_periods = 1, BoundaryType b = BoundaryType::X,
+                    unsigned n_threads = 0,
+                    const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Apply the map over n_periods periods poincare_dt of the
+   *             perturbation to every state.
+   *
+   * @param[in]  states     The states, one particle per row
+   * @param[in]  n_periods  The number of periods
+   * @param[in]  b          The boundary type
+   * @param[in]  n_threads  The number of threads, 0 for all available cores
+   * @param[in]  options    The integration options
+   * @return     The mapped states; NaN for the particles that are lost
+   *             within the n_periods periods
+   */
 
 };
 
@@ -0,0 +1,72 @@
+#ifndef REGULARITY_OHB7UPHE
+#define REGULARITY_OHB7UPHE
+#include "type_definitions.hpp"
+#include <cmath>
+#include <limits>
+
+namespace WP {
+
+/**
+ * @brief      Regularity indicator of an orbit from weighted Birkhoff
+ *             averages of an observable sampled once per period.
+ *
+ *             The samples are averaged over consecutive windows with the
+ *             smooth bump weights exp(-1 / (s (1 - s))), s = n / window. On
+ *             a regular (quasi-periodic) orbit these averages converge
+ *             faster than any power of the window length, on a chaotic
+ *             orbit only like window^(-1/2). The orbit is classified as
+ *             regular once two consecutive window averages agree to the
+ *             requested number of digits.
+ */
+class BirkhoffRegularity {
+  Vector weights;
+  Eigen::Index k = 0;
+  double sum = 0.0;
+  double previous = std::numeric_limits<double>::quiet_NaN();
+  double tolerance;
+
+public:
+  /**
+   * @param[in]  window  The number of samples per average
+   * @param[in]  digits  The number of digits two consecutive averages have
+   *                     to agree to
+   */
+  BirkhoffRegularity(unsigned window, double digits)
+      : weights(window), tolerance(std::pow(10.0, -digits)) {
+    for (Eigen::Index n = 0; n < weights.size(); n++) {
+      const double s = static_cast<double>(n) / static_cast<double>(window);
+      weights[n] = n == 0 ? 0.0 : std::exp(-1.0 / (s * (1.0 - s)));
+    }
+    weights /= weights.sum();
+  }
+
+  /**
+   * @brief      Add the next sample.
+   *
+   * @return     Whether the orbit is classified as regular
+   */
+  bool push(double value) noexcept {
+    sum += weights[k++] * value;
+    if (k < weights.size())
+      return false;
+
+    const double average = sum;
+    const bool regular = std::abs(average - previous) <= tolerance;
+    previous = average;
+    k = 0;
+    sum = 0.0;
+    return regular;
+  }
+
+  /**
+   * @brief      The observable: smooth on the phase space of the pendulum,
+   *             which is periodic in x.
+   */
+  static double observable(const State &s) noexcept {
+    return std::cos(s[0]) + s[1];
+  }
+};
+
+} // namespace WP
+
+#endif // end of include guard: REGULARITY_OHB7UPHE
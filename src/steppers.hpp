@@ -0,0 +1,458 @@
+#ifndef STEPPERS_AEM3AIXA
+#define STEPPERS_AEM3AIXA
+#include "ensemble.hpp"
+#include "event_location.hpp"
+#include "integration_options.hpp"
+#include "regularity.hpp"
+#include "symplectic.hpp"
+#include "type_definitions.hpp"
+#include <algorithm>
+#include <boost/numeric/odeint.hpp>
+#include <boost/numeric/odeint/external/eigen/eigen.hpp>
+#include <cmath>
+#include <functional>
+#include <limits>
+#include <stdexcept>
+#include <utility>
+
+namespace WP {
+
+/*
+ * Runtime selection of the odeint steppers from IntegrationOptions.
+ *
+ * The with_* functions build the stepper requested by the options and pass
+ * it to a generic callable, so every entry point is instantiated once per
+ * stepper kind and the choice is made at run time.
+ *
+ * Dense output steppers are used for the loss times. dopri5 and
+ * Bulirsch-Stoer have native dense output, the other steppers are wrapped in
+ * adapters with the same interface that interpolate the step with a cubic
+ * Hermite polynomial.
+ *
+ * The symplectic stepper takes fixed steps; see IntegrationOptions for how
+ * the step size is chosen.
+ */
+
+namespace steppers {
+
+namespace odeint = boost::numeric::odeint;
+
+typedef odeint::runge_kutta_dopri5<State> dopri5_type;
+typedef odeint::runge_kutta_cash_karp54<State> cash_karp54_type;
+typedef odeint::bulirsch_stoer<State> bulirsch_stoer_type;
+typedef odeint::bulirsch_stoer_dense_out<State> bulirsch_stoer_dense_type;
+
+/**
+ * @brief      Base of the dense output adapters: keeps the two ends of the
+ *             last step and interpolates between them.
+ */
+class HermiteDenseOutputBase {
+protected:
+  State m_x, m_dxdt, m_x_old, m_dxdt_old;
+  double m_t = 0.0, m_t_old = 0.0, m_dt = 0.0;
+  bool m_is_deriv_initialized = false;
+
+public:
+  void initialize(const State &x0, double t0, double dt0) {
+    m_x = x0;
+    m_t = t0;
+    m_dt = dt0;
+    m_is_deriv_initialized = false;
+  }
+
+  void calc_state(double t, State &x) const {
+    const double h = m_t - m_t_old;
+    x = event_location::hermite_state((t - m_t_old) / h, h, m_x_old,
+                                      m_dxdt_old, m_x, m_dxdt);
+  }
+
+  const State &current_state() const noexcept { return m_x; }
+  double current_time() const noexcept { return m_t; }
+  double current_time_step() const noexcept { return m_dt; }
+  double previous_time() const noexcept { return m_t_old; }
+};
+
+/**
+ * @brief      Dense output for a controlled stepper without native dense
+ *             output.
+ */
+template <typename ControlledStepper>
+class HermiteDenseOutput : public HermiteDenseOutputBase {
+  ControlledStepper m_stepper;
+
+public:
+  explicit HermiteDenseOutput(ControlledStepper stepper)
+      : m_stepper(std::move(stepper)) {}
+
+  template <typename System> std::pair<double, double> do_step(System sys) {
+    if (!m_is_deriv_initialized) {
+      sys(m_x, m_dxdt, m_t);
+      m_is_deriv_initialized = true;
+    }
+    m_x_old = m_x;
+    m_dxdt_old = m_dxdt;
+    m_t_old = m_t;
+
+    odeint::failed_step_checker fail_checker;
+    while (m_stepper.try_step(sys, m_x_old, m_dxdt_old, m_t, m_x, m_dt) ==
+           odeint::fail)
+      fail_checker();
+
+    sys(m_x, m_dxdt, m_t);
+    return {m_t_old, m_t};
+  }
+};
+
+/**
+ * @brief      Dense output for the fixed step symplectic stepper.
+ *
+ *             The step size is fixed at construction; the dt passed to
+ *             initialize is ignored.
+ */
+template <typename System>
+class SymplecticDenseOutput : public HermiteDenseOutputBase {
+  symplectic::Stepper<System> m_stepper;
+
+public:
+  SymplecticDenseOutput(const System &sys, SymplecticScheme scheme, double h)
+      : m_stepper(sys, scheme) {
+    m_dt = h;
+  }
+
+  void initialize(const State &x0, double t0, double /*dt0*/) {
+    const double h = m_dt;
+    HermiteDenseOutputBase::initialize(x0, t0, h);
+  }
+
+  template <typename Sys> std::pair<double, double> do_step(Sys sys) {
+    if (!m_is_deriv_initialized) {
+      sys(m_x, m_dxdt, m_t);
+      m_is_deriv_initialized = true;
+    }
+    m_x_old = m_x;
+    m_dxdt_old = m_dxdt;
+    m_t_old = m_t;
+
+    m_stepper.do_step(m_x, m_t, m_dt);
+
+    sys(m_x, m_dxdt, m_t);
+    return {m_t_old, m_t};
+  }
+};
+
+inline std::runtime_error unknown_stepper() {
+  return std::runtime_error("Unknown stepper kind");
+}
+
+} // namespace steppers
+
+/**
+ * @brief      Call f with the controlled stepper selected by the options.
+ *
+ *             The symplectic stepper has no controlled version and is
+ *             rejected; callers handle it separately.
+ */
+template <typename F>
+auto with_controlled_stepper(const IntegrationOptions &opts, F &&f) {
+  using namespace steppers;
+  switch (opts.stepper) {
+  case StepperKind::Dopri5:
+    return f(odeint::make_controlled(opts.atol, opts.rtol, dopri5_type()));
+  case StepperKind::CashKarp54:
+    return f(odeint::make_controlled(opts.atol, opts.rtol, cash_karp54_type()));
+  case StepperKind::BulirschStoer:
+    return f(bulirsch_stoer_type(opts.atol, opts.rtol));
+  case StepperKind::Symplectic:
+    throw std::invalid_argument(
+        "the symplectic stepper has no controlled version");
+  default:
+    throw unknown_stepper();
+  }
+}
+
+/**
+ * @brief      Call f with the dense output stepper selected by the options.
+ *
+ * @param[in]  opts    The options
+ * @param[in]  sys     The system, used by the symplectic stepper
+ * @param[in]  period  The time the symplectic steps_per_period refer to
+ * @param[in]  f       Generic callable taking the stepper
+ */
+template <typename System, typename F>
+auto with_dense_output_stepper(const IntegrationOptions &opts,
+                               const System &sys, double period, F &&f) {
+  using namespace steppers;
+  switch (opts.stepper) {
+  case StepperKind::Dopri5:
+    return f(odeint::make_dense_output(opts.atol, opts.rtol, dopri5_type()));
+  case StepperKind::CashKarp54:
+    return f(HermiteDenseOutput(
+        odeint::make_controlled(opts.atol, opts.rtol, cash_karp54_type())));
+  case StepperKind::BulirschStoer:
+    return f(bulirsch_stoer_dense_type(opts.atol, opts.rtol));
+  case StepperKind::Symplectic:
+    if (opts.steps_per_period == 0)
+      throw std::invalid_argument("steps_per_period must be positive");
+    return f(SymplecticDenseOutput<System>(sys, opts.scheme,
+                                           period / opts.steps_per_period));
+  default:
+    throw unknown_stepper();
+  }
+}
+
+/**
+ * @brief      The result of a loss time calculation: the loss time, or t_max
+ *             if the particle is not lost, and whether the integration was
+ *             stopped early because the orbit was classified as regular.
+ */
+struct LossTime {
+  double time;
+  bool confined;
+};
+
+/**
+ * @brief      Integrate s_init until it leaves the confined domain or t_max
+ *             is reached, with the stepper selected by the options.
+ *
+ *             The crossing is located on the dense output of the stepper,
+ *             see event_location. Grazing detection evaluates the system
+ *             once more per step for the derivative at the end of the step.
+ *             With a regularity_window, the orbit is sampled every period
+ *             and the integration stops early once it is classified as
+ *             regular (see BirkhoffRegularity).
+ *
+ * @param[in]  sys       The system
+ * @param[in]  s_init    The initial state
+ * @param[in]  t_max     The maximum integration time
+ * @param[in]  boundary  Boundary function of the confined domain, positive
+ *                       outside
+ * @param[in]  opts      The integration options
+ * @param[in]  period    The period of the perturbation; the symplectic
+ *                       steps_per_period and the regularity samples refer
+ *                       to it
+ * @return     The loss time, t_max if the particle is not lost, 0 if it
+ *             starts in the loss region
+ */
+template <typename System, typename Boundary>
+LossTime integrate_loss_time(const System &sys, const State &s_init,
+                             double t_max, const Boundary &boundary,
+                             const IntegrationOptions &opts, double period) {
+  if (opts.regularity_window == 1)
+    throw std::invalid_argument("regularity_window must be 0 or at least 2");
+  if (boundary(s_init) > 0) {
+    return {0.0, false};
+  }
+
+  return with_dense_output_stepper(opts, sys, period, [&](auto stepper) {
+    stepper.initialize(s_init, 0.0, opts.dt_init);
+    auto state_at = [&stepper](double t) {
+      State x;
+      stepper.calc_state(t, x);
+      return x;
+    };
+
+    event_location::HermiteStep step;
+    step.s1 = s_init;
+    if (opts.detect_grazing)
+      sys(step.s1, step.f1, 0.0);
+
+    const bool check_regularity = opts.regularity_window > 0;
+    BirkhoffRegularity regularity(std::max(opts.regularity_window, 2u),
+                                  opts.regularity_digits);
+    unsigned long next_sample = 1;
+    if (check_regularity)
+      regularity.push(BirkhoffRegularity::observable(s_init));
+
+    while (stepper.current_time() < t_max) {
+      const auto [t1, t2] = stepper.do_step(std::cref(sys));
+      step.advance(t1, t2, stepper.current_state());
+      if (opts.detect_grazing)
+        sys(step.s1, step.f1, t2);
+
+      const double t = event_location::crossing_time(
+          state_at, boundary, step, opts.crossing_precision,
+          opts.detect_grazing);
+      if (!std::isnan(t))
+        return LossTime{std::min(t, t_max), false};
+
+      while (check_regularity) {
+        const double t_sample = static_cast<double>(next_sample) * period;
+        if (t_sample > t2 || t_sample >= t_max)
+          break;
+        next_sample++;
+        const State x = state_at(t_sample);
+        if (regularity.push(BirkhoffRegularity::observable(x)))
+          return LossTime{t_max, true};
+      }
+    }
+    return LossTime{t_max, false};
+  });
+}
+
+/**
+ * @brief      Apply the period map n_periods times: integrate s from 0 to
+ *             n_periods * period, unless it leaves the confined domain on
+ *             the way.
+ *
+ *             The systems are periodic in time with the given period, so
+ *             this is the n_periods-th iterate of the map over one period.
+ *
+ * @return     The state at n_periods * period, NaN if the particle is lost
+ *             before, starts in the loss region or s is NaN
+ */
+template <typename System, typename Boundary>
+State integrate_period_map(const System &sys, const State &s,
+                           unsigned n_periods, const Boundary &boundary,
+                           const IntegrationOptions &opts, double period) {
+  const State lost = State::Constant(std::numeric_limits<double>::quiet_NaN());
+  if (!s.allFinite() || boundary(s) > 0)
+    return lost;
+  const double t_end = n_periods * period;
+  if (n_periods == 0)
+    return s;
+
+  return with_dense_output_stepper(opts, sys, period, [&](auto stepper) {
+    stepper.initialize(s, 0.0, opts.dt_init);
+    auto state_at = [&stepper](double t) {
+      State x;
+      stepper.calc_state(t, x);
+      return x;
+    };
+
+    event_location::HermiteStep step;
+    step.s1 = s;
+    if (opts.detect_grazing)
+      sys(step.s1, step.f1, 0.0);
+
+    while (stepper.current_time() < t_end) {
+      const auto [t1, t2] = stepper.do_step(std::cref(sys));
+      step.advance(t1, t2, stepper.current_state());
+      if (opts.detect_grazing)
+        sys(step.s1, step.f1, t2);
+
+      const double t = event_location::crossing_time(
+          state_at, boundary, step, opts.crossing_precision,
+          opts.detect_grazing);
+      if (t <= t_end)
+        return lost;
+    }
+    return state_at(t_end);
+  });
+}
+
+/**
+ * @brief      Sample the orbit of s every delta_t into the preallocated out,
+ *             one snapshot per column, with the stepper selected by the
+ *             options.
+ *
+ * @return     The number of snapshots written
+ */
+template <typename System>
+Eigen::Index integrate_poincare_into(const System &sys, const State &s,
+                                     double delta_t,
+                                     const IntegrationOptions &opts,
+                                     Eigen::Ref<OrbitPoints> out) {
+  const auto n = out.cols();
+  if (opts.stepper == StepperKind::Symplectic) {
+    symplectic_poincare_into(sys, s, delta_t, opts.steps_per_period,
+                             opts.scheme, out);
+    return n;
+  }
+  if (n == 0)
+    return 0;
+
+  Eigen::Index k = 0;
+  auto observer = [&](const State &x, double /*t*/) {
+    if (k < n)
+      out.col(k++) = x;
+  };
+
+  State s_cur = s;
+  const double t_max = static_cast<double>(n - 1) * delta_t;
+  with_controlled_stepper(opts, [&](auto stepper) {
+    boost::numeric::odeint::integrate_const(stepper, std::cref(sys), s_cur,
+                                            0.0, t_max, delta_t, observer);
+  });
+  return k;
+}
+
+/**
+ * @brief      Sample the orbit of s every delta_t up to t_max, with the
+ *             stepper selected by the options.
+ */
+template <typename System>
+OrbitPoints integrate_poincare(const System &sys, const State &s, double t_max,
+                               double delta_t,
+                               const IntegrationOptions &opts) {
+  OrbitPoints out(2, n_snapshots(t_max, delta_t));
+  const auto k = integrate_poincare_into(sys, s, delta_t, opts, out);
+  if (k < out.cols())
+    return out.leftCols(k);
+  return out;
+}
+
+/**
+ * @brief      Sample the orbits of an ensemble every delta_t in parallel.
+ *
+ *             Row i of out holds the orbit of particle i as (x, p) pairs of
+ *             consecutive snapshots, i.e. out is the row-major view of an
+ *             (N, n_snapshots, 2) array; the number of snapshots is
+ *             out.cols() / 2. Snapshots an orbit does not reach are NaN.
+ *
+ * @param[in]  sys        The system
+ * @param[in]  states     The initial states, one particle per row
+ * @param[in]  delta_t    The time between snapshots
+ * @param[in]  n_threads  The number of threads, 0 for all available cores
+ * @param[in]  opts       The integration options
+ * @param      out        The orbits, shape (N, 2 * n_snapshots)
+ */
+template <typename System>
+void integrate_poincare_many(const System &sys,
+                             const Eigen::Ref<const States> &states,
+                             double delta_t, unsigned n_threads,
+                             const IntegrationOptions &opts,
+                             Eigen::Ref<RowMatrix> out) {
+  if (out.rows() != states.rows() || out.cols() % 2 != 0)
+    throw std::invalid_argument("out needs the shape (N, 2 * n_snapshots)");
+  const auto n = out.cols() / 2;
+  parallel_for_ranges(
+      states.rows(), n_threads, [&](Eigen::Index begin, Eigen::Index end) {
+        for (auto i = begin; i < end; i++) {
+          Eigen::Map<OrbitPoints> orbit(out.row(i).data(), 2, n);
+          const auto k = integrate_poincare_into(
+              sys, State{states.row(i).transpose()}, delta_t, opts, orbit);
+          orbit.rightCols(n - k).setConstant(
+              std::numeric_limits<double>::quiet_NaN());
+        }
+      });
+}
+
+/**
+ * @brief      Integrate s from t0 to t1 with the stepper selected by the
+ *             options. The symplectic stepper takes equal steps of at most
+ *             dt_init.
+ */
+template <typename System>
+State integrate_state(const System &sys, const State &s, double t0, double t1,
+                      const IntegrationOptions &opts) {
+  State s_cur = s;
+  if (opts.stepper == StepperKind::Symplectic) {
+    const symplectic::Stepper<System> stepper(sys, opts.scheme);
+    const auto n = std::max(1.0, std::ceil(std::abs(t1 - t0) / opts.dt_init));
+    const double h = (t1 - t0) / n;
+    double t = t0;
+    for (long i = 0; i < static_cast<long>(n); i++)
+      stepper.do_step(s_cur, t, h);
+    return s_cur;
+  }
+
+  with_controlled_stepper(opts, [&](auto stepper) {
+    boost::numeric::odeint::integrate_adaptive(stepper, std::cref(sys), s_cur,
+                                               t0, t1, opts.dt_init);
+  });
+  return s_cur;
+}
+
+} // namespace WP
+
+#endif // end of include guard: STEPPERS_AEM3AIXA
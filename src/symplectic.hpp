@@ -0,0 +1,148 @@
+#ifndef SYMPLECTIC_XAE1VOHP
+#define SYMPLECTIC_XAE1VOHP
+#include "type_definitions.hpp"
+#include <cmath>
+#include <stdexcept>
+#include <vector>
+
+namespace WP {
+
+/*
+ * Fixed step symplectic integration of H = p^2/2 + V(x, t).
+ *
+ * The explicit time dependence is handled in the extended phase space, where
+ * t is advanced together with x in the drift. The basic step is the
+ * drift-kick-drift Stormer-Verlet (leapfrog) scheme and the higher order
+ * schemes are Yoshida's symmetric compositions of it. The 4th order
+ * composition is the Forest-Ruth scheme.
+ *
+ * Only systems with dx/dt = p are supported, which is the case for all the
+ * systems of this package. The force is read from the system's
+ * operator()(s, dsdt, t).
+ */
+
+enum class SymplecticScheme { Verlet, Yoshida4, Yoshida6 };
+
+namespace symplectic {
+
+namespace detail {
+// Yoshida's triple jump
+const double cbrt2 = std::cbrt(2.0);
+const double y4_w1 = 1.0 / (2.0 - cbrt2);
+const double y4_w0 = -cbrt2 / (2.0 - cbrt2);
+
+// Yoshida's 6th order "solution A"
+constexpr double y6_w1 = -1.17767998417887;
+constexpr double y6_w2 = 0.235573213359357;
+constexpr double y6_w3 = 0.784513610477560;
+constexpr double y6_w0 = 1.0 - 2.0 * (y6_w1 + y6_w2 + y6_w3);
+} // namespace detail
+
+/**
+ * @brief      The weights of the leapfrog substeps of a scheme.
+ */
+inline std::vector<double> composition_weights(SymplecticScheme scheme) {
+  using namespace detail;
+  switch (scheme) {
+  case SymplecticScheme::Verlet:
+    return {1.0};
+  case SymplecticScheme::Yoshida4:
+    return {y4_w1, y4_w0, y4_w1};
+  case SymplecticScheme::Yoshida6:
+    return {y6_w3, y6_w2, y6_w1, y6_w0, y6_w1, y6_w2, y6_w3};
+  default:
+    throw std::runtime_error("Unknown symplectic scheme");
+  }
+}
+
+template <typename System> class Stepper {
+  const System &sys;
+  std::vector<double> weights;
+
+public:
+  Stepper(const System &_sys, SymplecticScheme scheme)
+      : sys(_sys), weights(composition_weights(scheme)) {}
+
+  /**
+   * @brief      Advance the state s at time t by one step of size h.
+   */
+  void do_step(State &s, double &t, double h) const {
+    State dsdt;
+    for (const auto w : weights) {
+      const double hw = h * w;
+      s[0] += 0.5 * hw * s[1];
+      t += 0.5 * hw;
+      sys(s, dsdt, t);
+      s[1] += hw * dsdt[1];
+      s[0] += 0.5 * hw * s[1];
+      t += 0.5 * hw;
+    }
+  }
+};
+
+} // namespace symplectic
+
+/**
+ * @brief      The number of snapshots taken at 0, delta_t, 2 delta_t, ... up
+ *             to and including t_max.
+ */
+inline Eigen::Index n_snapshots(double t_max, double delta_t) noexcept {
+  if (t_max < 0)
+    return 0;
+  return static_cast<Eigen::Index>(std::floor(t_max / delta_t * (1 + 1e-12))) +
+         1;
+}
+
+/**
+ * @brief      Like symplectic_poincare, but the snapshots are written to the
+ *             preallocated out, as many as it has columns.
+ */
+template <typename System>
+void symplectic_poincare_into(const System &sys, const State &s, double delta_t,
+                              unsigned steps_per_period,
+                              SymplecticScheme scheme,
+                              Eigen::Ref<OrbitPoints> out) {
+  if (steps_per_period == 0)
+    throw std::invalid_argument("steps_per_period must be positive");
+
+  const symplectic::Stepper<System> stepper(sys, scheme);
+  const auto n = out.cols();
+  const double h = delta_t / steps_per_period;
+
+  State s_cur = s;
+  double t = 0.0;
+
+  for (Eigen::Index k = 0; k < n; k++) {
+    out.col(k) = s_cur;
+    if (k + 1 == n)
+      break;
+    for (unsigned i = 0; i < steps_per_period; i++)
+      stepper.do_step(s_cur, t, h);
+    // avoid the accumulation of round off in the time variable
+    t = static_cast<double>(k + 1) * delta_t;
+  }
+}
+
+/**
+ * @brief      Poincare section with a fixed step symplectic integrator.
+ *
+ * @param[in]  sys                The system
+ * @param[in]  s                  The initial state
+ * @param[in]  t_max              The maximum integration time
+ * @param[in]  delta_t            The time between snapshots
+ * @param[in]  steps_per_period   The number of steps per delta_t
+ * @param[in]  scheme             The symplectic scheme
+ * @return     The states at 0, delta_t, 2 delta_t, ...
+ */
+template <typename System>
+OrbitPoints symplectic_poincare(const System &sys, const State &s, double t_max,
+                                double delta_t, unsigned steps_per_period,
+                                SymplecticScheme scheme) {
+  OrbitPoints out(2, n_snapshots(t_max, delta_t));
+  symplectic_poincare_into(sys, s, delta_t, steps_per_period, scheme, out);
+  return out;
+}
+
+} // namespace WP
+
+#endif // end of include guard: SYMPLECTIC_XAE1VOHP
@@ -0,0 +1,242 @@
+#include "tape_system.hpp"
+#include "ensemble.hpp"
+#include "lockstep.hpp"
+#include "steppers.hpp"
+#include <cmath>
+#include <stdexcept>
+#include <utility>
+
+namespace WP {
+
+namespace {
+
+/**
+ * @brief      The change of the stack depth by op, and the depth it needs.
+ */
+std::pair<int, int> stack_effect(TapeOp op) {
+  switch (op) {
+  case TapeOp::Const:
+  case TapeOp::X:
+  case TapeOp::P:
+  case TapeOp::T:
+    return {1, 0};
+  case TapeOp::Add:
+  case TapeOp::Sub:
+  case TapeOp::Mul:
+  case TapeOp::Div:
+  case TapeOp::Pow:
+    return {-1, 2};
+  case TapeOp::Neg:
+  case TapeOp::Square:
+  case TapeOp::Sin:
+  case TapeOp::Cos:
+  case TapeOp::Tan:
+  case TapeOp::Exp:
+  case TapeOp::Log:
+  case TapeOp::Sqrt:
+  case TapeOp::Tanh:
+  case TapeOp::Abs:
+    return {0, 1};
+  }
+  throw std::invalid_argument("unknown tape operation");
+}
+
+} // namespace
+
+TapeSystem::TapeSystem(const Eigen::ArrayXi &ops, const Vector &values,
+                       double _poincare_dt)
+    : poincare_dt(_poincare_dt) {
+  if (ops.size() != values.size())
+    throw std::invalid_argument("ops and values need the same length");
+  if (!(poincare_dt > 0))
+    throw std::invalid_argument("poincare_dt must be positive");
+
+  Eigen::Index depth = 0;
+  tape.reserve(static_cast<std::size_t>(ops.size()));
+  for (Eigen::Index i = 0; i < ops.size(); i++) {
+    if (ops[i] < static_cast<int>(TapeOp::Const) ||
+        ops[i] > static_cast<int>(TapeOp::Abs))
+      throw std::invalid_argument("unknown tape operation");
+    const auto op = static_cast<TapeOp>(ops[i]);
+    const auto effect = stack_effect(op);
+    if (depth < effect.second)
+      throw std::invalid_argument("the tape pops an empty stack");
+    depth += effect.first;
+    if (depth > max_stack)
+      throw std::invalid_argument("the tape needs too deep a stack");
+    uses_p = uses_p || op == TapeOp::P;
+    tape.push_back({op, values[i]});
+  }
+  if (depth != 1)
+    throw std::invalid_argument("the tape must leave exactly one value");
+}
+
+double TapeSystem::force(double x, double p, double t) const noexcept {
+  double stack[max_stack];
+  // the index of the top of the stack, the tape is checked not to underflow
+  Eigen::Index top = -1;
+  for (const auto &ins : tape) {
+    switch (ins.op) {
+    case TapeOp::Const:
+      stack[++top] = ins.value;
+      break;
+    case TapeOp::X:
+      stack[++top] = x;
+      break;
+    case TapeOp::P:
+      stack[++top] = p;
+      break;
+    case TapeOp::T:
+      stack[++top] = t;
+      break;
+    case TapeOp::Add:
+      stack[top - 1] += stack[top];
+      top--;
+      break;
+    case TapeOp::Sub:
+      stack[top - 1] -= stack[top];
+      top--;
+      break;
+    case TapeOp::Mul:
+      stack[top - 1] *= stack[top];
+      top--;
+      break;
+    case TapeOp::Div:
+      stack[top - 1] /= stack[top];
+      top--;
+      break;
+    case TapeOp::Pow:
+      stack[top - 1] = std::pow(stack[top - 1], stack[top]);
+      top--;
+      break;
+    case TapeOp::Neg:
+      stack[top] = -stack[top];
+      break;
+    case TapeOp::Square:
+      stack[top] *= stack[top];
+      break;
+    case TapeOp::Sin:
+      stack[top] = std::sin(stack[top]);
+      break;
+    case TapeOp::Cos:
+      stack[top] = std::cos(stack[top]);
+      break;
+    case TapeOp::Tan:
+      stack[top] = std::tan(stack[top]);
+      break;
+    case TapeOp::Exp:
+      stack[top] = std::exp(stack[top]);
+      break;
+    case TapeOp::Log:
+      stack[top] = std::log(stack[top]);
+      break;
+    case TapeOp::Sqrt:
+      stack[top] = std::sqrt(stack[top]);
+      break;
+    case TapeOp::Tanh:
+      stack[top] = std::tanh(stack[top]);
+      break;
+    case TapeOp::Abs:
+      stack[top] = std::abs(stack[top]);
+      break;
+    }
+  }
+  return stack[0];
+}
+
+void TapeSystem::operator()(const State &s, State &dsdt,
+                            double t) const noexcept {
+  dsdt[0] = s[1];
+  dsdt[1] = force(s[0], s[1], t);
+}
+
+void TapeSystem::block_force(const Vector &x, const Vector &t,
+                             Vector &f) const noexcept {
+  for (Eigen::Index i = 0; i < x.size(); i++)
+    f[i] = force(x[i], 0.0, t[i]);
+}
+
+State TapeSystem::call(const State &s, double t) const noexcept {
+  State dsdt{2, 3};
+  this->operator()(s, dsdt, t);
+  return dsdt;
+}
+
+void TapeSystem::check_stepper(StepperKind stepper) const {
+  if (uses_p && stepper == StepperKind::Symplectic)
+    throw std::invalid_argument(
+        "the symplectic schemes need a force independent of p");
+}
+
+OrbitPoints TapeSystem::poincare(const State &s, double t_max,
+                                 const IntegrationOptions &options) const {
+  check_stepper(options.stepper);
+  return integrate_poincare(*this, s, t_max, poincare_dt, options);
+}
+
+void TapeSystem::poincare_many(const Eigen::Ref<const States> &states,
+                               unsigned stride, Eigen::Ref<RowMatrix> out,
+                               unsigned n_threads,
+                               const IntegrationOptions &options) const {
+  check_stepper(options.stepper);
+  auto opts = options;
+  opts.steps_per_period *= stride; // keep the symplectic step size
+  integrate_poincare_many(*this, states, stride * poincare_dt, n_threads, opts,
+                          out);
+}
+
+OrbitPoints TapeSystem::poincare_symplectic(const State &s, double t_max,
+                                            unsigned steps_per_period,
+                                            SymplecticScheme scheme) const {
+  check_stepper(StepperKind::Symplectic);
+  return symplectic_poincare(*this, s, t_max, poincare_dt, steps_per_period,
+                             scheme);
+}
+
+double TapeSystem::get_loss_time(const State &s_init, double p_min,
+                                 double p_max, double t_max,
+                                 const IntegrationOptions &options) const {
+  check_stepper(options.stepper);
+  auto boundary = [p_min, p_max](const State &s) {
+    return std::max(p_min - s[1], s[1] - p_max);
+  };
+  return integrate_loss_time(*this, s_init, t_max, boundary, options,
+                             poincare_dt)
+      .time;
+}
+
+Vector TapeSystem::get_loss_times(const Eigen::Ref<const States> &states,
+                                  double p_min, double p_max, double t_max,
+                                  unsigned n_threads, Eigen::Index block_size,
+                                  const IntegrationOptions &options) const {
+  check_stepper(options.stepper);
+  if (block_size > 0) {
+    if (uses_p)
+      throw std::invalid_argument(
+          "the lockstep engine needs a force independent of p");
+    auto boundary = [p_min, p_max](const State &s) {
+      return std::max(p_min - s[1], s[1] - p_max);
+    };
+    return lockstep_loss_times(*this, states, t_max, boundary, n_threads,
+                               block_size, options);
+  }
+  return map_states(states, n_threads, [&](const State &s) {
+    return get_loss_time(s, p_min, p_max, t_max, options);
+  });
+}
+
+States TapeSystem::period_map(const Eigen::Ref<const States> &states,
+                              double p_min, double p_max, unsigned n_periods,
+                              unsigned n_threads,
+                              const IntegrationOptions &options) const {
+  check_stepper(options.stepper);
+  auto boundary = [p_min, p_max](const State &s) {
+    return std::max(p_min - s[1], s[1] - p_max);
+  };
+  return transform_states(states, n_threads, [&](const State &s) {
+    return integrate_period_map(*this, s, n_periods, boundary, options,
+                                poincare_dt);
+  });
+}
+
+} // namespace WP
@@ -0,0 +1,118 @@
+#ifndef TAPE_SYSTEM_OOPH4ZAE
+#define TAPE_SYSTEM_OOPH4ZAE
+#include "histogram.hpp"
+#include "integration_options.hpp"
+#include "symplectic.hpp"
+#include "type_definitions.hpp"
+#include <vector>
+
+namespace WP {
+
+/**
+ * @brief      The instructions of a TapeSystem. Const pushes the value of
+ *             the instruction, X, P and T push the coordinates and the time,
+ *             the unary operations replace the top of the stack and the
+ *             binary ones pop the top two entries a (below) and b (top) and
+ *             push a op b.
+ */
+enum class TapeOp : int {
+  Const,
+  X,
+  P,
+  T,
+  Add,
+  Sub,
+  Mul,
+  Div,
+  Pow,
+  Neg,
+  Square,
+  Sin,
+  Cos,
+  Tan,
+  Exp,
+  Log,
+  Sqrt,
+  Tanh,
+  Abs
+};
+
+struct TapeInstruction {
+  TapeOp op;
+  double value;
+};
+
+/**
+ * @brief      A particle with dx/dt = p and dp/dt = f(x, p, t), where the
+ *             force f is a stack program (a "tape") compiled at runtime,
+ *             e.g. from a Python expression by expressions.compile_force.
+ *
+ *             The tape is checked once in the constructor, so evaluating it
+ *             is a single loop over the instructions without bounds checks.
+ *             The symplectic schemes and the lockstep engine assume that f
+ *             does not depend on p and are refused otherwise.
+ *             The particles are confined to p_min < p < p_max.
+ */
+class TapeSystem {
+public:
+  static constexpr Eigen::Index max_stack = 64;
+
+private:
+  std::vector<TapeInstruction> tape;
+  bool uses_p = false;
+  void check_stepper(StepperKind stepper) const;
+  /**
+   * @brief      Throw std::invalid_argument if the stepper is symplectic and
+   *             the force depends on p: the kick-drift schemes assume
+   *             f(x, t) and would silently give a wrong orbit.
+   */
+
+public:
+  double poincare_dt;
+  TapeSystem(const Eigen::ArrayXi &ops, const Vector &values,
+             double _poincare_dt);
+  /**
+   * @brief      Construct the system from the tape.
+   *
+   * @param[in]  ops           The operations, the values of TapeOp
+   * @param[in]  values        The value of every instruction, used by Const
+   * @param[in]  _poincare_dt  The period of the Poincare sections and of the
+   *                           period map
+   */
+  double force(double x, double p, double t) const noexcept;
+  Eigen::Index size() const noexcept {
+    return static_cast<Eigen::Index>(tape.size());
+  }
+  bool depends_on_p() const noexcept { return uses_p; }
+  State call(const State &s, double t) const noexcept;
+  void operator()(const State &s, State &dsdt, double t) const noexcept;
+  void block_force(const Vector &x, const Vector &t, Vector &f) const noexcept;
+  OrbitPoints poincare(const State &s, double t_max,
+                       const IntegrationOptions &options = {}) const;
+  void poincare_many(const Eigen::Ref<const States> &states, unsigned stride,
+                     Eigen::Ref<RowMatrix> out, unsigned n_threads = 0,
+                     const IntegrationOptions &options = {}) const;
+  OrbitPoints poincare_symplectic(
+      const State &s, double t_max, unsigned steps_per_period,
+      SymplecticScheme scheme = SymplecticScheme::Yoshida4) const;
+  double get_loss_time(const State &s_init, double p_min, double p_max,
+                       double t_max,
+                       const IntegrationOptions &options = {}) const;
+  Vector get_loss_times(const Eigen::Ref<const States> &states, double p_min,
+                        double p_max, double t_max, unsigned n_threads = 0,
+                        Eigen::Index block_size = 0,
+                        const IntegrationOptions &options = {}) const;
+  /**
+   * @brief      Calculate the loss times of an ensemble of states, see
+   *             MultiWaveSystem::get_loss_times. The lockstep engine
+   *             (block_size > 0) needs a force independent of p.
+   */
+  States period_map(const Eigen::Ref<const States> &states, double p_min,
+                    double p_max, unsigned n_periods = 1,
+                    unsigned n_threads = 0,
+                    const IntegrationOptions &options = {}) const;
+};
+
+} // namespace WP
+
+#endif // end of include guard: TAPE_SYSTEM_OOPH4ZAE
@@ -7,6 +7,9 @@ namespace WP{
   typedef Eigen::ArrayXd Vector;
   typedef Eigen::Vector2d State;
   typedef Eigen::Array2Xd OrbitPoints;
+  typedef Eigen::Matrix<double, Eigen::Dynamic, 2, Eigen::RowMajor> States;
+  typedef Eigen::Array<bool, Eigen::Dynamic, 1> Mask;
+  typedef Eigen::Matrix<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor> RowMatrix;
 }
 
 #endif //WP_TYPES_INCLUDED
@@ -13,20 +13,27 @@ template <> inline Vector WavePacket::_exponent(const Vector &z) const {
 }
 
 State WavePacket::system(const State &s, double t) const {
+  State dsdt;
+  rhs(s, dsdt, t);
+  return dsdt;
+}
 
+void WavePacket::rhs(const State &s, State &dsdt, double t) const noexcept {
   const auto &z = s[0];
   const auto &p = s[1];
 
-  const auto dzdt = p;
-  const auto dpdt = -dz(z, t);
-
-  return State{dzdt, dpdt};
+  dsdt[0] = p;
+  dsdt[1] = -dz(z, t);
 }
 
 Integrator WavePacket::make_integrator(double atol, double rtol) {
   return Integrator{*this, atol, rtol};
 }
 
+Integrator WavePacket::make_integrator(const IntegrationOptions &options) {
+  return Integrator{*this, options};
+}
+
 std::string WavePacket::_to_string() const {
 
   return std::string{"<_multiple_wave_transport.Wavepacket('"} +
@@ -26,6 +26,7 @@ class WavePacket
 
     Integrator make_integrator(double atol=Integrator::ATOL_DEFAULT,
                                double rtol=Integrator::RTOL_DEFAULT);
+    Integrator make_integrator(const IntegrationOptions& options);
 
     template<typename T>
     inline T _exponent(const T& z) const;
@@ -36,6 +37,11 @@ class WavePacket
     template<typename T>
     inline auto _phase_and_envelope(const T& z, const T& t) const;
     State system(const State& s, double t) const;
+    void rhs(const State& s, State& dsdt, double t) const noexcept;
+    /**
+     * @brief      The right hand side of the single particle system, written
+     *             to dsdt in the form the steppers call it.
+     */
     std::string _to_string() const;
   };
 
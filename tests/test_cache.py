@@ -0,0 +1,96 @@
+import sqlite3
+
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import IntegrationOptions
+from multiple_wave_transport.cache import ResultCache, cache_key
+from multiple_wave_transport.losses import LossTimeResult
+from multiple_wave_transport.pendulum import calculate_loss_times
+
+
+def _result(n):
+    return LossTimeResult(np.zeros((n, 2)), np.arange(n, dtype=float), dict(n=n))
+
+
+def test_cache_key_is_canonical():
+    assert cache_key(dict(a=1, b=(1.0, 2.0))) == cache_key(dict(b=[1.0, 2.0], a=1))
+    assert cache_key(dict(a=1)) != cache_key(dict(a=2))
+
+
+def test_get_or_compute_computes_once(tmp_path):
+    cache = ResultCache(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _result(5)
+
+    first = cache.loss_time_result(dict(n=5), compute)
+    second = cache.loss_time_result(dict(n=5), compute)
+    assert len(calls) == 1
+    nt.assert_array_equal(first.loss_times, second.loss_times)
+    assert cache.query(kind="loss_times") == [dict(n=5)]
+    assert cache.query(n=6) == []
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResultCache(tmp_path)
+    for n in (1000, 1001, 1002):
+        cache.loss_time_result(dict(n=n), lambda: _result(1000))
+    # touch the oldest entry, so that the second one is evicted first
+    assert dict(n=1000) in cache
+    entry_size = cache.size() // 3
+
+    cache.evict(2 * entry_size)
+    assert dict(n=1001) not in cache
+    assert dict(n=1000) in cache and dict(n=1002) in cache
+
+    bounded = ResultCache(tmp_path, max_bytes=entry_size)
+    bounded.loss_time_result(dict(n=1003), lambda: _result(1000))
+    assert [run["n"] for run in bounded.query()] == [1003]
+
+
+def test_orbit_store_entries(tmp_path):
+    cache = ResultCache(tmp_path)
+    orbit = np.arange(10.0).reshape(2, 5)
+    store = cache.orbit_store(dict(kind="orbits"), lambda s: s.append(orbit))
+    nt.assert_array_equal(store[0], orbit)
+    again = cache.orbit_store(dict(kind="orbits"), lambda s: pytest.fail("recomputed"))
+    assert len(again) == 1
+
+
+def test_pendulum_loss_times_cached(tmp_path):
+    cache = ResultCache(tmp_path)
+    kwargs = dict(t_max=10.0, amplitude=1.5, n_particles=10, seed=3, cache=cache)
+    first = calculate_loss_times(**kwargs)
+    second = calculate_loss_times(**kwargs)
+    nt.assert_array_equal(first.loss_times, second.loss_times)
+    assert len(cache.query(system="PerturbedPendulum")) == 1
+
+    options = IntegrationOptions(atol=1e-8, rtol=1e-8)
+    calculate_loss_times(**kwargs, integration_options=options)
+    assert len(cache.query(system="PerturbedPendulum")) == 2
+
+    with pytest.raises(ValueError):
+        calculate_loss_times(t_max=10.0, amplitude=1.5, n_particles=10, cache=cache)
+
+
+def test_index_connections_are_closed(tmp_path, monkeypatch):
+    connections = []
+    connect = sqlite3.connect
+
+    def recording_connect(*args, **kwargs):
+        connections.append(connect(*args, **kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(sqlite3, "connect", recording_connect)
+    cache = ResultCache(tmp_path)
+    cache.put(dict(a=1), lambda path: path.mkdir())
+    assert cache.lookup(dict(a=1)) is not None
+    assert cache.size() >= 0
+    assert len(connections) == 4
+    for db in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            db.execute("SELECT 1")
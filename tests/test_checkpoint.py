@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import IntegrationOptions
+from multiple_wave_transport.checkpoint import run_checkpointed
+from multiple_wave_transport.pendulum import calculate_loss_times
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def _states():
+    return np.random.default_rng(0).uniform(size=(25, 2))
+
+
+def test_resume_after_interruption(tmp_path):
+    calls = []
+
+    def failing(states):
+        if len(calls) == 2:
+            raise _Interrupt
+        calls.append(len(states))
+        return states.sum(axis=1)
+
+    with pytest.raises(_Interrupt):
+        run_checkpointed(tmp_path, dict(seed=1), _states, failing, chunk_size=10)
+    assert calls == [10, 10]
+
+    def resumed(states):
+        calls.append(len(states))
+        return states.sum(axis=1)
+
+    result = run_checkpointed(tmp_path, dict(seed=1), _states, resumed, chunk_size=10)
+    assert calls == [10, 10, 5]
+    nt.assert_array_equal(result.loss_times, _states().sum(axis=1))
+    nt.assert_array_equal(result.initial_states, _states())
+
+
+def test_refuses_shards_of_another_run(tmp_path):
+    run_checkpointed(tmp_path, dict(seed=1), _states, lambda s: s[:, 0], 10)
+    with pytest.raises(ValueError):
+        run_checkpointed(tmp_path, dict(seed=2), _states, lambda s: s[:, 0], 10)
+
+
+def test_pendulum_loss_times_checkpointed(tmp_path):
+    kwargs = dict(t_max=20.0, amplitude=1.5, n_particles=30, seed=4)
+    direct = calculate_loss_times(**kwargs)
+    sharded = calculate_loss_times(**kwargs, shard_dir=tmp_path, chunk_size=7)
+    nt.assert_array_equal(sharded.initial_states, direct.initial_states)
+    nt.assert_array_equal(sharded.loss_times, direct.loss_times)
+    assert json.loads((tmp_path / "manifest.json").read_text())["chunk_size"] == 7
+
+
+def test_resume_with_another_integrator_is_refused(tmp_path):
+    kwargs = dict(t_max=20.0, amplitude=1.5, n_particles=30, seed=4, shard_dir=tmp_path)
+    calculate_loss_times(**kwargs)
+    with pytest.raises(ValueError):
+        calculate_loss_times(
+            **kwargs, integration_options=IntegrationOptions(atol=1e-6, rtol=1e-6)
+        )
+    with pytest.raises(ValueError):
+        calculate_loss_times(**kwargs, block_size=8)
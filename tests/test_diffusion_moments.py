@@ -0,0 +1,54 @@
+import numpy as np
+import numpy.testing as nt
+from scipy import stats
+
+from multiple_wave_transport._multiple_wave_transport import (
+    PerturbedPendulum,
+    PerturbedPendulumWithLowFrequency,
+)
+from multiple_wave_transport.pendulum import (
+    calculate_diffusion_moments,
+    generate_random_init_trapped_states,
+)
+
+
+def _distances(pend, states, t_max):
+    return np.array(
+        [np.hypot(*(pend.poincare(s, t_max) - s[:, None])) for s in states]
+    )
+
+
+def test_moments_match_stored_orbits():
+    pend = PerturbedPendulum(0.8)
+    states = generate_random_init_trapped_states(25)
+    moments = pend.diffusion_moments(states, 300.0, n_threads=3)
+
+    distances = _distances(pend, states, 300.0)
+    nt.assert_array_equal(moments.count, 25)
+    nt.assert_allclose(moments.times, np.arange(distances.shape[1]) * pend.poincare_dt)
+    nt.assert_allclose(moments.mean, distances.mean(axis=0), rtol=1e-12)
+    nt.assert_allclose(moments.variance[1:], distances.var(axis=0)[1:], rtol=1e-9)
+    nt.assert_allclose(
+        moments.skewness[1:], stats.skew(distances, axis=0)[1:], rtol=1e-7
+    )
+    nt.assert_allclose(
+        moments.excess_kurtosis[1:], stats.kurtosis(distances, axis=0)[1:], rtol=1e-7
+    )
+
+
+def test_moments_independent_of_thread_count():
+    pend = PerturbedPendulumWithLowFrequency(0.6, 0.6)
+    states = generate_random_init_trapped_states(40)
+    single = pend.diffusion_moments(states, 500.0, n_threads=1)
+    multi = pend.diffusion_moments(states, 500.0, n_threads=4)
+    nt.assert_allclose(multi.mean, single.mean, rtol=1e-12)
+    nt.assert_allclose(multi.m4, single.m4, rtol=1e-9)
+
+
+def test_diffusion_seed_is_recorded():
+    moments, options = calculate_diffusion_moments(5.0, 0.8, 12, n_threads=1)
+    assert isinstance(options["seed"], int)
+    again, _ = calculate_diffusion_moments(
+        5.0, 0.8, 12, n_threads=1, seed=options["seed"]
+    )
+    nt.assert_array_equal(again.mean, moments.mean)
@@ -0,0 +1,115 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    IntegrationOptions,
+    PerturbedPendulum,
+    StepperKind,
+    TapeOp,
+    TapeSystem,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.expressions import build_tape_system, compile_force
+
+
+def test_constants_are_folded():
+    tape = compile_force("2 * pi * x**2 + -(a + 4)", dict(a=3))
+    assert tape.ops == [
+        TapeOp.Const,
+        TapeOp.X,
+        TapeOp.Square,
+        TapeOp.Mul,
+        TapeOp.Const,
+        TapeOp.Add,
+    ]
+    nt.assert_allclose([tape.values[0], tape.values[4]], [2 * np.pi, -7])
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "__import__('os')",
+        "x.real",
+        "y * x",
+        "sin(x, t)",
+        "x if t else p",
+        "x < 1",
+        "'x'",
+        "x +",
+    ],
+)
+def test_unsupported_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_force(expression)
+
+
+def test_invalid_tapes_are_rejected():
+    for ops in ([], [TapeOp.Add], [TapeOp.X, TapeOp.T], [99]):
+        with pytest.raises(ValueError):
+            TapeSystem(np.array(ops, dtype=np.int32), np.zeros(len(ops)), 1.0)
+
+
+def test_tape_matches_the_pendulum():
+    system = build_tape_system(
+        "sin(x) - eps * cos(5 * x - t / 2)", 4 * np.pi, dict(eps=0.3)
+    )
+    reference = PerturbedPendulum(0.3)
+    for s, t in [((0.4, 1.0), 3.3), ((-7.0, 0.2), 250.0)]:
+        nt.assert_allclose(system(s, t), reference(s, t), atol=1e-14)
+
+    # round off in the force grows in the chaotic sea, so compare few periods
+    states = np.array([[1.0, 0.3], [3.0, -0.5], [5.0, 1.0]])
+    nt.assert_allclose(
+        system.poincare_many(states, 5 * system.poincare_dt),
+        reference.poincare_many(
+            states, 5 * reference.poincare_dt, options=IntegrationOptions()
+        ),
+        atol=1e-8,
+    )
+
+
+def test_tape_loss_times_match_three_wave_system():
+    system = build_tape_system(
+        "-eps * (cos(2*pi*t - x) + cos(4*pi*t - x) + cos(6*pi*t - x))",
+        1.0,
+        dict(eps=7.8),
+    )
+    assert not system.depends_on_p
+    rng = np.random.default_rng(2)
+    states = np.column_stack([rng.uniform(0, 2 * np.pi, 20), rng.uniform(3, 8, 20)])
+    reference = ThreeWaveSystem(7.8).get_loss_times(states, 10.0, 30.0)
+    assert (reference < 30.0).any()
+    nt.assert_allclose(
+        system.get_loss_times(states, -np.inf, 10.0, 30.0), reference, rtol=1e-6
+    )
+    nt.assert_allclose(
+        system.get_loss_times(states, -np.inf, 10.0, 30.0, block_size=8),
+        reference,
+        rtol=1e-5,
+    )
+
+
+def test_lockstep_needs_a_force_independent_of_p():
+    system = build_tape_system("-0.1 * p", 1.0)
+    assert system.depends_on_p
+    with pytest.raises(ValueError):
+        system.get_loss_times(np.zeros((4, 2)), -1.0, 1.0, 10.0, block_size=4)
+    # the kick-drift schemes assume f(x, t)
+    symplectic = IntegrationOptions(stepper=StepperKind.Symplectic)
+    with pytest.raises(ValueError):
+        system.poincare_symplectic((0.0, 1.0), 5.0, 16)
+    with pytest.raises(ValueError):
+        system.poincare_many(np.zeros((2, 2)), 5.0, options=symplectic)
+    with pytest.raises(ValueError):
+        system.get_loss_times(np.zeros((2, 2)), -1.0, 1.0, 5.0, options=symplectic)
+    # damped motion: p(t) = p0 exp(-0.1 t)
+    orbit = system.poincare((0.0, 1.0), 5.0)
+    nt.assert_allclose(orbit[1], np.exp(-0.1 * np.arange(6)), rtol=1e-8)
+
+
+def test_lockstep_gives_up_on_a_nan_force():
+    # the force is NaN for x > 1, every step after that is rejected
+    system = build_tape_system("sqrt(1 - x)", 1.0)
+    with pytest.raises(RuntimeError):
+        system.get_loss_times([[0.5, 1.0]], -10.0, 10.0, 5.0, block_size=8)
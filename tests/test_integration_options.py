@@ -0,0 +1,142 @@
+import pickle
+
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    BoundaryType,
+    IntegrationOptions,
+    PerturbedPendulum,
+    StepperKind,
+    ThreeWaveSystem,
+    UnperturbedPendulum,
+    WavePacket,
+)
+
+ADAPTIVE_STEPPERS = [
+    StepperKind.Dopri5,
+    StepperKind.CashKarp54,
+    StepperKind.BulirschStoer,
+]
+
+
+def test_default_options_reproduce_the_defaults():
+    pend = PerturbedPendulum(1.0)
+    s = (1.0, 0.3)
+    assert pend.get_loss_time(s, 30.0, options=IntegrationOptions()) == (
+        pend.get_loss_time(s, 30.0)
+    )
+    nt.assert_array_equal(
+        pend.poincare(s, 200.0, IntegrationOptions.poincare_default()),
+        pend.poincare(s, 200.0),
+    )
+
+
+def test_options_pickle_roundtrip():
+    opts = IntegrationOptions(
+        stepper=StepperKind.CashKarp54,
+        atol=1e-8,
+        crossing_precision=1e-7,
+        detect_grazing=True,
+    )
+    restored = pickle.loads(pickle.dumps(opts))
+    assert restored.stepper == StepperKind.CashKarp54
+    assert restored.atol == 1e-8
+    assert restored.crossing_precision == 1e-7
+    assert restored.detect_grazing
+    assert "CashKarp54" in repr(restored)
+
+
+@pytest.mark.parametrize("stepper", ADAPTIVE_STEPPERS + [StepperKind.Symplectic])
+def test_unperturbed_integrate_conserves_energy(stepper):
+    pend = UnperturbedPendulum()
+    s = np.array([3.0, 1.0])
+    opts = IntegrationOptions.integrate_default()
+    opts.stepper = stepper
+    s_end = pend.integrate(s, 10.0, opts)
+    assert abs(pend.energy(s_end) - pend.energy(s)) < 1e-7
+
+
+@pytest.mark.parametrize("stepper", ADAPTIVE_STEPPERS + [StepperKind.Symplectic])
+def test_loss_times_agree_between_steppers(stepper):
+    # short runs, before the chaotic orbits of different steppers diverge
+    pend = PerturbedPendulum(1.0)
+    rng = np.random.default_rng(1)
+    states = np.column_stack(
+        [rng.uniform(0.5, 2 * np.pi - 0.5, 30), rng.uniform(-1.5, 1.5, 30)]
+    )
+    expected = pend.get_loss_times(states, 5.0)
+    opts = IntegrationOptions(stepper=stepper, steps_per_period=4096)
+    nt.assert_allclose(
+        pend.get_loss_times(states, 5.0, options=opts), expected, atol=1e-4
+    )
+
+
+def test_crossing_precision():
+    tws = ThreeWaveSystem(7.8)
+    s = (1.0, 10.0)
+    coarse = tws.get_loss_time(s, 20, 20.0, IntegrationOptions(crossing_precision=1e-2))
+    fine = tws.get_loss_time(s, 20, 20.0, IntegrationOptions(crossing_precision=1e-9))
+    assert abs(coarse - fine) < 1e-2
+
+
+@pytest.mark.parametrize("block_size", [0, 4])
+def test_crossing_located_to_machine_precision(block_size):
+    # an untrapped particle of the unperturbed pendulum leaves at x = 2 pi
+    s = np.array([np.pi, 2.5])
+    t = PerturbedPendulum(0.0).get_loss_times(
+        s[None, :], 20.0, BoundaryType.X, block_size=block_size
+    )[0]
+    exact = IntegrationOptions(atol=1e-13, rtol=1e-13, dt_init=1e-3)
+    x = UnperturbedPendulum().integrate(s, t, options=exact)[0]
+    assert abs(x - 2 * np.pi) < 1e-8
+
+
+def test_grazing_detection():
+    # Bulirsch-Stoer takes steps long enough to step over short excursions
+    # beyond the boundary, which the dense Dopri5 integration catches
+    pend = PerturbedPendulum(1.0)
+    rng = np.random.default_rng(0)
+    states = np.column_stack(
+        [rng.uniform(0.5, 2 * np.pi - 0.5, 300), rng.uniform(-1.5, 1.5, 300)]
+    )
+    reference = pend.get_loss_times(states, 30.0, BoundaryType.P)
+    stepper = StepperKind.BulirschStoer
+    plain = pend.get_loss_times(
+        states, 30.0, BoundaryType.P, options=IntegrationOptions(stepper=stepper)
+    )
+    grazing = pend.get_loss_times(
+        states,
+        30.0,
+        BoundaryType.P,
+        options=IntegrationOptions(stepper=stepper, detect_grazing=True),
+    )
+    assert np.all(grazing <= plain + 1e-9)
+    missed = np.sum(np.abs(plain - reference) > 1e-3)
+    assert np.sum(np.abs(grazing - reference) > 1e-3) < missed / 2
+
+    lockstep = pend.get_loss_times(
+        states,
+        30.0,
+        BoundaryType.P,
+        block_size=8,
+        options=IntegrationOptions(detect_grazing=True),
+    )
+    nt.assert_allclose(lockstep, reference, atol=1e-4)
+
+
+def test_lockstep_engine_requires_dopri5():
+    pend = PerturbedPendulum(1.0)
+    opts = IntegrationOptions(stepper=StepperKind.CashKarp54)
+    with pytest.raises(ValueError):
+        pend.get_loss_times(np.zeros((4, 2)) + 1, 1.0, block_size=4, options=opts)
+
+
+def test_wavepacket_integrator_options():
+    wp = WavePacket(1.0, 1.0, 1.0, 0.5)
+    expected = wp.make_integrator().integrate([0.0, 1.0], (0.0, 5.0))
+    opts = IntegrationOptions(stepper=StepperKind.Dopri5, dt_init=0.01)
+    nt.assert_allclose(
+        wp.make_integrator(opts).integrate([0.0, 1.0], (0.0, 5.0)), expected, atol=1e-8
+    )
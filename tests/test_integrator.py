@@ -0,0 +1,33 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport import WavePacket
+
+
+def _points(n=40):
+    return np.column_stack([np.full(n, -8.0), np.linspace(0.0, 2.0, n)])
+
+
+def test_integrate_many_matches_integrate():
+    integrator = WavePacket(1.0, 1.0, 1.0, 0.5).make_integrator()
+    points = _points()
+    expected = np.array([integrator.integrate(p, (0.0, 30.0)) for p in points])
+    nt.assert_array_equal(integrator.integrate_many(points, (0.0, 30.0), 2), expected)
+    assert integrator.integrate_many(np.zeros((0, 2)), (0.0, 1.0)).shape == (0, 2)
+
+
+def test_integrate_many_at_records_every_time():
+    integrator = WavePacket(1.0, 1.0, 1.0, 0.5).make_integrator()
+    points = _points(10)
+    times = np.array([0.0, 10.0, 20.0, 30.0])
+    out = integrator.integrate_many_at(points, times)
+    assert out.shape == (10, 4, 2)
+    nt.assert_array_equal(out[:, 0], points)
+    for k in range(1, 4):
+        nt.assert_allclose(
+            out[:, k], integrator.integrate_many(points, (0.0, times[k])), atol=1e-8
+        )
+
+    with pytest.raises(ValueError):
+        integrator.integrate_many_at(points, [1.0, 0.0])
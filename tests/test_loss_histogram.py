@@ -0,0 +1,89 @@
+import pickle
+
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    LossHistogram,
+    PerturbedPendulum,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.losses import histogram_current
+from multiple_wave_transport.pendulum import (
+    calculate_loss_histogram,
+    generate_random_init_trapped_states,
+)
+
+T_MAX = 60.0
+
+
+def _histogram(loss_times, n_bins, t_max=T_MAX):
+    return np.histogram(loss_times[loss_times < t_max], n_bins, (0, t_max))[0]
+
+
+def test_histogram_of_pendulum_loss_times():
+    pend = PerturbedPendulum(1.0)
+    states = generate_random_init_trapped_states(300, rng=0)
+    loss_times = pend.get_loss_times(states, T_MAX)
+
+    hist = LossHistogram(T_MAX, 30, 8, -2.0, 2.0)
+    pend.accumulate_loss_histogram(hist, states[:100], n_threads=2)
+    pend.accumulate_loss_histogram(hist, states[100:])
+
+    nt.assert_array_equal(hist.counts, _histogram(loss_times, 30))
+    assert hist.n_particles == 300
+    assert hist.n_survivors == np.sum(loss_times >= T_MAX) == hist.survival[-1]
+    nt.assert_array_equal(hist.joint.sum(axis=1), hist.counts)
+    lost = loss_times < T_MAX
+    nt.assert_array_equal(
+        hist.joint.sum(axis=0), np.histogram(states[lost, 1], 8, (-2, 2))[0]
+    )
+
+    times, current = histogram_current(hist)
+    nt.assert_allclose(times[0], 1.0)
+    nt.assert_allclose(current, hist.counts / 2.0)
+
+
+def test_three_wave_histogram():
+    tws = ThreeWaveSystem(7.8)
+    states = np.column_stack([np.linspace(0, 6, 40), np.linspace(6, 17, 40)])
+    hist = LossHistogram(20.0, 10)
+    tws.accumulate_loss_histogram(hist, states, 20.0)
+    nt.assert_array_equal(
+        hist.counts, _histogram(tws.get_loss_times(states, 20.0, 20.0), 10, 20.0)
+    )
+    assert hist.joint.size == 0
+
+
+def test_merge_and_pickle():
+    hist = LossHistogram(T_MAX, 30, 4, -2.0, 2.0)
+    PerturbedPendulum(1.0).accumulate_loss_histogram(
+        hist, generate_random_init_trapped_states(50, rng=1)
+    )
+    copy = pickle.loads(pickle.dumps(hist))
+    copy.merge(hist)
+    nt.assert_array_equal(copy.counts, 2 * hist.counts)
+    nt.assert_array_equal(copy.joint, 2 * hist.joint)
+    assert copy.n_particles == 100
+
+    with pytest.raises(ValueError):
+        hist.merge(LossHistogram(T_MAX, 20))
+    with pytest.raises(ValueError):
+        LossHistogram(T_MAX, 10, 4)
+
+
+@pytest.mark.parametrize("sampling", ["random", "sobol"])
+def test_chunks_do_not_change_the_histogram(sampling):
+    kwargs = dict(n_bins=20, n_threads=1, seed=5, sampling=sampling)
+    whole, options = calculate_loss_histogram(T_MAX, 1.0, 90, chunk_size=90, **kwargs)
+    chunked, _ = calculate_loss_histogram(T_MAX, 1.0, 90, chunk_size=40, **kwargs)
+    assert options["seed"] == 5 and options["n_particles"] == 90
+    assert chunked.n_particles == 90
+    if sampling == "sobol":
+        nt.assert_array_equal(chunked.counts, whole.counts)
+
+
+def test_stratified_design_is_refused():
+    with pytest.raises(ValueError, match="stratified"):
+        calculate_loss_histogram(T_MAX, 1.0, 90, sampling="stratified")
@@ -0,0 +1,67 @@
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport._multiple_wave_transport import (
+    BoundaryType,
+    PerturbedPendulum,
+    PerturbedPendulumWithLowFrequency,
+    ThreeWaveSystem,
+)
+
+
+def _pendulum_states(n):
+    rng = np.random.default_rng(1)
+    return np.column_stack(
+        [rng.uniform(0.5, 2 * np.pi - 0.5, n), rng.uniform(-1.5, 1.5, n)]
+    )
+
+
+def test_pendulum_get_loss_times_matches_single_particle():
+    pend = PerturbedPendulum(1.0)
+    states = _pendulum_states(40)
+    expected = [pend.get_loss_time(s, 60.0) for s in states]
+    nt.assert_array_equal(pend.get_loss_times(states, 60.0, n_threads=3), expected)
+
+
+def test_low_frequency_pendulum_get_loss_times_matches_single_particle():
+    pend = PerturbedPendulumWithLowFrequency(0.8, 0.8)
+    states = _pendulum_states(40)
+    expected = [pend.get_loss_time(s, 60.0, BoundaryType.P) for s in states]
+    nt.assert_array_equal(
+        pend.get_loss_times(states, 60.0, BoundaryType.P, n_threads=2), expected
+    )
+
+
+def test_three_wave_get_loss_times_matches_single_particle():
+    tws = ThreeWaveSystem(7.8)
+    rng = np.random.default_rng(2)
+    states = np.column_stack([rng.uniform(0, 2 * np.pi, 30), rng.uniform(6, 17, 30)])
+    expected = [tws.get_loss_time(s, 20, 20.0) for s in states]
+    nt.assert_array_equal(tws.get_loss_times(states, 20, 20.0), expected)
+
+
+def test_get_loss_times_empty_ensemble():
+    pend = PerturbedPendulum(1.0)
+    assert pend.get_loss_times(np.zeros((0, 2)), 10.0).shape == (0,)
+
+
+def test_lockstep_engine_agrees_with_scalar_steppers():
+    pend = PerturbedPendulum(1.5)
+    states = _pendulum_states(100)
+    expected = pend.get_loss_times(states, 15.0)
+    for block_size in (1, 8, 32):
+        nt.assert_allclose(
+            pend.get_loss_times(states, 15.0, block_size=block_size),
+            expected,
+            atol=1e-4,
+        )
+
+
+def test_lockstep_engine_three_wave():
+    tws = ThreeWaveSystem(7.8)
+    rng = np.random.default_rng(3)
+    states = np.column_stack([rng.uniform(0, 2 * np.pi, 50), rng.uniform(6, 25, 50)])
+    expected = tws.get_loss_times(states, 20, 2.0)
+    nt.assert_allclose(
+        tws.get_loss_times(states, 20, 2.0, block_size=16), expected, atol=1e-4
+    )
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport.losses import (
+    BINARY_SUFFIX,
+    LossTimeResult,
+    convert_json_results,
+    filter_loss_times,
+)
+
+
+def _result(n=50):
+    rng = np.random.default_rng(0)
+    states = rng.uniform(0, 1, (n, 2))
+    loss_times = np.where(rng.uniform(size=n) < 0.5, 10.0, rng.uniform(0, 10, n))
+    return LossTimeResult(states, loss_times, dict(t_max=10.0, amplitude=1.5))
+
+
+def test_from_json_returns_state_array():
+    result = LossTimeResult.from_json(_result().to_json())
+    assert isinstance(result.initial_states, np.ndarray)
+    assert result.initial_states.shape == (50, 2)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    result = _result()
+    result.save(tmp_path / "res")
+    loaded = LossTimeResult.load(tmp_path / "res")
+    assert isinstance(loaded.loss_times, np.memmap)
+    nt.assert_array_equal(loaded.initial_states, result.initial_states)
+    nt.assert_array_equal(loaded.loss_times, result.loss_times)
+    assert loaded.options == result.options
+
+
+def test_convert_json_results(tmp_path):
+    result = _result()
+    json_file = tmp_path / "loss_times_1.5.json"
+    json_file.write_text(result.to_json())
+
+    (converted,) = convert_json_results(tmp_path)
+    assert converted == tmp_path / ("loss_times_1.5" + BINARY_SUFFIX)
+    assert converted.is_dir()
+
+    # the JSON name resolves to the binary directory
+    loaded = LossTimeResult.from_file(json_file)
+    assert isinstance(loaded.initial_states, np.memmap)
+    nt.assert_array_equal(loaded.loss_times, result.loss_times)
+
+
+def test_regenerated_json_is_not_shadowed(tmp_path):
+    json_file = tmp_path / "loss_times_1.5.json"
+    json_file.write_text(_result().to_json())
+    (converted,) = convert_json_results(tmp_path)
+
+    regenerated = _result()
+    regenerated.loss_times = regenerated.loss_times + 1
+    json_file.write_text(regenerated.to_json())
+    old = json_file.stat().st_mtime - 10
+    for f in converted.iterdir():
+        os.utime(f, (old, old))
+
+    # the JSON file is newer than its binary conversion
+    nt.assert_array_equal(
+        LossTimeResult.from_file(json_file).loss_times, regenerated.loss_times
+    )
+    convert_json_results(tmp_path)
+    loaded = LossTimeResult.from_file(json_file)
+    assert isinstance(loaded.loss_times, np.memmap)
+    nt.assert_array_equal(loaded.loss_times, regenerated.loss_times)
+
+def test_filter_loss_times():
+    result = _result()
+    p_init, loss_times = filter_loss_times(result)
+    mask = result.loss_times < 10.0
+    nt.assert_array_equal(loss_times, result.loss_times[mask])
+    nt.assert_array_equal(p_init, result.initial_states[mask, 1])
@@ -0,0 +1,84 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    MultiWaveSystem,
+    PerturbedPendulum,
+    PerturbedPendulumWithLowFrequency,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.multi_wave import (
+    build_multi_wave_system,
+    pendulum_table,
+    three_wave_table,
+)
+
+STATES = [((0.3, 2.0), 0.7), ((5.0, -1.0), 123.4), ((-40.0, 0.1), 1e3)]
+
+
+@pytest.mark.parametrize(
+    "reference, waves",
+    [
+        (ThreeWaveSystem(0.1), three_wave_table(0.1)),
+        (PerturbedPendulum(0.3), pendulum_table(0.3)),
+        (PerturbedPendulumWithLowFrequency(0.3, 0.1), pendulum_table((0.3, 0.1))),
+    ],
+)
+def test_tables_reproduce_the_fixed_systems(reference, waves):
+    system = build_multi_wave_system(waves)
+    assert system.harmonic
+    assert system.poincare_dt == pytest.approx(reference.poincare_dt)
+    for s, t in STATES:
+        nt.assert_allclose(system(s, t), reference(s, t), atol=1e-12)
+
+
+def _random_waves(n, rng):
+    return np.column_stack(
+        [
+            rng.normal(size=n),
+            rng.integers(-10, 11, n),
+            0.5 * rng.integers(-20, 21, n),
+            rng.uniform(0, 2 * np.pi, n),
+        ]
+    )
+
+
+def test_recurrences_agree_with_direct_evaluation():
+    waves = _random_waves(40, np.random.default_rng(1))
+    fast = MultiWaveSystem(waves)
+    direct = MultiWaveSystem(waves, use_recurrences=False)
+    assert fast.harmonic and not direct.harmonic
+    for s, t in STATES:
+        nt.assert_allclose(fast(s, t), direct(s, t), atol=1e-11)
+
+    states = np.array([s for s, _ in STATES])
+    nt.assert_allclose(
+        fast.period_map(states, -1e3, 1e3),
+        direct.period_map(states, -1e3, 1e3),
+        atol=1e-6,
+    )
+
+
+def test_non_harmonic_waves_need_a_period():
+    waves = [(0.1, 1.0, 1.0, 0.0), (0.1, np.sqrt(2), np.pi, 0.0)]
+    with pytest.raises(ValueError):
+        build_multi_wave_system(waves)
+    system = build_multi_wave_system(waves, poincare_dt=2.0)
+    assert not system.harmonic
+    assert system.poincare_many(np.zeros((3, 2)), 10.0).shape == (3, 6, 2)
+
+
+def test_loss_times_match_three_wave_system():
+    rng = np.random.default_rng(2)
+    states = np.column_stack([rng.uniform(0, 2 * np.pi, 20), rng.uniform(3, 8, 20)])
+    reference = ThreeWaveSystem(7.8).get_loss_times(states, 10.0, 30.0)
+    assert (reference < 30.0).any()
+    system = build_multi_wave_system(three_wave_table(7.8))
+    loss_times = system.get_loss_times(states, -np.inf, 10.0, 30.0)
+    nt.assert_allclose(loss_times, reference, rtol=1e-6)
+    nt.assert_allclose(
+        system.get_loss_times(states, -np.inf, 10.0, 30.0, block_size=8),
+        loss_times,
+        rtol=1e-5,
+    )
@@ -0,0 +1,51 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport.orbit_store import OrbitStore
+
+
+def _orbits(n, n_snapshots=20):
+    rng = np.random.default_rng(0)
+    return [rng.normal(size=(2, n_snapshots)) for _ in range(n)]
+
+
+def test_append_and_read_back(tmp_path):
+    orbits = _orbits(10)
+    with OrbitStore(tmp_path / "store", chunk_size=4, attrs=dict(tmax=1.0)) as store:
+        store.extend(orbits)
+
+    reopened = OrbitStore.open(tmp_path / "store")
+    assert reopened.shape == (10, 20, 2)
+    assert reopened.attrs == dict(tmax=1.0)
+    assert [len(c) for c in reopened.iter_chunks()] == [4, 4, 2]
+    for expected, orbit in zip(orbits, reopened):
+        nt.assert_array_equal(orbit, expected)
+    nt.assert_array_equal(reopened[-1], orbits[-1])
+
+
+def test_append_to_reopened_store(tmp_path):
+    orbits = _orbits(6)
+    with OrbitStore(tmp_path / "store", chunk_size=4) as store:
+        store.extend(orbits[:3])
+    with OrbitStore.open(tmp_path / "store") as store:
+        store.extend(orbits[3:])
+    assert len(OrbitStore.open(tmp_path / "store")) == 6
+
+
+def test_mean_travelling_distance(tmp_path):
+    orbits = _orbits(9)
+    with OrbitStore(tmp_path / "store", chunk_size=2) as store:
+        store.extend(orbits)
+
+    distances = [np.hypot(*(o - o[:, :1])) for o in orbits]
+    nt.assert_allclose(store.mean_travelling_distance(), np.mean(distances, axis=0))
+
+
+def test_rejects_mismatched_orbits(tmp_path):
+    store = OrbitStore(tmp_path / "store")
+    store.append(np.zeros((2, 5)))
+    with pytest.raises(ValueError):
+        store.append(np.zeros((2, 6)))
+    with pytest.raises(FileExistsError):
+        OrbitStore(tmp_path / "store")
@@ -0,0 +1,33 @@
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport.pendulum import (
+    UnperturbedPendulum,
+    generate_random_init_trapped_states,
+    unperturbed_state_at_angle,
+)
+
+
+def test_analytic_sampler_matches_numerical_integration():
+    np.random.seed(0)
+    analytic = generate_random_init_trapped_states(50, E_max=0.9)
+    np.random.seed(0)
+    numerical = generate_random_init_trapped_states(50, E_max=0.9, method="numerical")
+    nt.assert_allclose(analytic, numerical, atol=1e-7)
+
+
+def test_analytic_sampler_shape():
+    assert generate_random_init_trapped_states(7).shape == (7, 2)
+    assert generate_random_init_trapped_states(0).shape == (0, 2)
+
+
+def test_state_at_angle_keeps_energy():
+    E = np.linspace(-0.99, 0.99, 11)
+    theta = np.linspace(0, 2 * np.pi, 11)
+    states = unperturbed_state_at_angle(E, theta)
+    energies = [UnperturbedPendulum().energy(s) for s in states]
+    nt.assert_allclose(energies, E, atol=1e-12)
+
+
+def test_state_at_zero_angle_is_bottom_of_the_well():
+    nt.assert_allclose(unperturbed_state_at_angle(0.0, 0.0), [np.pi, np.sqrt(2)])
@@ -0,0 +1,73 @@
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport._multiple_wave_transport import (
+    IntegrationOptions,
+    PerturbedPendulum,
+    StepperKind,
+    SymplecticScheme,
+    ThreeWaveSystem,
+)
+
+
+def _energy(orbit):
+    return 0.5 * orbit[1] ** 2 + np.cos(orbit[0])
+
+
+def test_symplectic_poincare_has_the_same_snapshots():
+    pend = PerturbedPendulum(0.5)
+    assert pend.poincare_symplectic((np.pi, 1.0), 300, 16).shape == pend.poincare(
+        (np.pi, 1.0), 300
+    ).shape
+    tws = ThreeWaveSystem(7.8)
+    assert tws.poincare_symplectic((1.0, 10.0), 20, 16).shape == (2, 21)
+
+
+def test_symplectic_energy_error_is_bounded():
+    pend = PerturbedPendulum(0.0)
+    for scheme, tol in [
+        (SymplecticScheme.Verlet, 1e-2),
+        (SymplecticScheme.Yoshida4, 1e-4),
+        (SymplecticScheme.Yoshida6, 1e-6),
+    ]:
+        orbit = pend.poincare_symplectic((np.pi, 1.0), 20000, 64, scheme)
+        assert np.ptp(_energy(orbit)) < tol
+
+
+def test_symplectic_poincare_converges_to_adaptive_one():
+    pend = PerturbedPendulum(0.5)
+    reference = pend.poincare((np.pi, 0.5), 40)
+    errors = [
+        np.abs(pend.poincare_symplectic((np.pi, 0.5), 40, n) - reference).max()
+        for n in (64, 128)
+    ]
+    # 4th order: halving the step reduces the error about 16 times
+    assert errors[1] < errors[0] / 8
+    nt.assert_allclose(
+        pend.poincare_symplectic((np.pi, 0.5), 40, 512), reference, atol=1e-5
+    )
+
+
+def test_poincare_many_matches_poincare():
+    pend = PerturbedPendulum(0.5)
+    states = np.array([[0.3, 0.2], [1.0, 0.5], [np.pi, 1.0]])
+    orbits = pend.poincare_many(states, 60 * pend.poincare_dt, n_threads=2)
+    assert orbits.shape == (3, 61, 2)
+    for s, orbit in zip(states, orbits):
+        nt.assert_array_equal(orbit, pend.poincare(s, 60 * pend.poincare_dt).T)
+
+
+def test_poincare_many_stride():
+    pend = PerturbedPendulum(0.1)
+    states = np.array([[np.pi, 0.5], [np.pi + 0.3, 0.2]])
+    options = IntegrationOptions(stepper=StepperKind.Symplectic, steps_per_period=16)
+    t_max = 20 * pend.poincare_dt
+    orbits = pend.poincare_many(states, t_max, options=options)
+    strided = pend.poincare_many(states, t_max, stride=3, options=options)
+    assert strided.shape == (2, 7, 2)
+    # the symplectic steps are the same, only the sampling differs
+    nt.assert_allclose(strided, orbits[:, ::3], atol=1e-9)
+
+
+def test_repeat_state_has_one_row_per_coordinate():
+    assert ThreeWaveSystem(1.0).repeat_state((1.0, 2.0)).shape == (2, 4)
@@ -0,0 +1,48 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    IntegrationOptions,
+    PerturbedPendulum,
+)
+from multiple_wave_transport.pendulum import generate_random_init_trapped_states
+
+T_MAX = 3000.0
+
+
+def _states():
+    # a particle on an invariant torus followed by particles close to the
+    # separatrix, which are lost
+    regular = np.array([[2.133249909945546, 1.2111684108684415]])
+    return np.vstack([regular, generate_random_init_trapped_states(8, 0.95, 1, rng=0)])
+
+
+def test_regular_orbits_stop_early():
+    pend = PerturbedPendulum(0.05)
+    states = _states()
+    full = pend.get_loss_times(states, T_MAX)
+    loss_times, confined = pend.classify_loss_times(
+        states, T_MAX, options=IntegrationOptions(regularity_window=50)
+    )
+    assert confined[0] and loss_times[0] == T_MAX
+    assert not np.any(confined & (full < T_MAX))
+    nt.assert_array_equal(loss_times[~confined], full[~confined])
+
+
+def test_without_regularity_window_nothing_is_confined():
+    pend = PerturbedPendulum(0.05)
+    states = _states()
+    loss_times, confined = pend.classify_loss_times(states, 200.0)
+    assert not confined.any()
+    nt.assert_array_equal(loss_times, pend.get_loss_times(states, 200.0))
+
+
+def test_lockstep_engine_rejects_regularity_window():
+    with pytest.raises(ValueError):
+        PerturbedPendulum(0.05).get_loss_times(
+            _states(),
+            10.0,
+            block_size=4,
+            options=IntegrationOptions(regularity_window=50),
+        )
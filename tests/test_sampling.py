@@ -0,0 +1,70 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport import three_wave
+from multiple_wave_transport.math import generate_random_pairs
+from multiple_wave_transport.pendulum import calculate_loss_times
+from multiple_wave_transport.sampling import (
+    SAMPLING_METHODS,
+    derive_seed,
+    sample_rectangle,
+    unit_square,
+)
+from multiple_wave_transport.sharding import trapped_states
+
+
+@pytest.mark.parametrize("method", SAMPLING_METHODS)
+def test_designs_fill_the_rectangle(method):
+    points = sample_rectangle(64, (1, 2), (-3, 3), method, seed=0)
+    assert points.shape == (64, 2)
+    assert np.all(points >= [1, -3]) and np.all(points <= [2, 3])
+    nt.assert_array_equal(points, sample_rectangle(64, (1, 2), (-3, 3), method, 0))
+
+
+def test_random_design_matches_generate_random_pairs():
+    nt.assert_array_equal(
+        sample_rectangle(10, (0, 1), (2, 5), seed=4),
+        generate_random_pairs(10, 0, 1, 2, 5, 4),
+    )
+
+
+@pytest.mark.parametrize("method", ["sobol", "halton", "stratified"])
+def test_designs_can_be_drawn_in_slices(method):
+    whole = unit_square(100, method, seed=1)
+    pieces = [unit_square(n, method, 1, start, 100) for start, n in [(0, 37), (37, 63)]]
+    nt.assert_array_equal(np.concatenate(pieces), whole)
+
+
+def test_random_design_has_no_offset():
+    with pytest.raises(ValueError):
+        unit_square(10, "random", 0, start=5)
+
+
+def test_stratified_design_has_one_point_per_cell():
+    points = unit_square(256, "stratified", seed=2)
+    cells = np.floor(points * 16).astype(int)
+    assert len(np.unique(cells[:, 0] * 16 + cells[:, 1])) == 256
+
+
+def test_drivers_record_sampling_and_seed():
+    result = calculate_loss_times(5.0, 0.5, 16, sampling="sobol")
+    assert result.options["sampling"] == "sobol"
+    assert isinstance(result.options["seed"], int)
+    again = calculate_loss_times(5.0, 0.5, 16, seed=result.options["seed"], sampling="sobol")
+    nt.assert_array_equal(again.initial_states, result.initial_states)
+
+    result = three_wave.calculate_loss_times(5.0, 7.8, (3, 6), 20, 8, sampling="halton")
+    assert result.options["sampling"] == "halton"
+
+
+def test_shards_draw_their_slice_of_the_design():
+    whole = trapped_states(50, 3, 0, 50, sampling="sobol")
+    nt.assert_array_equal(trapped_states(50, 3, 20, 50, sampling="sobol"), whole[20:])
+
+
+def test_derived_seeds_differ_per_run():
+    seeds = [derive_seed(0, amplitude) for amplitude in (0.6, 0.7, (0.6, 0.6))]
+    assert len(set(seeds)) == 3
+    assert derive_seed(0, 0.6) == seeds[0]
+    assert derive_seed(1, 0.6) != seeds[0]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from multiple_wave_transport.losses import LossTimeResult, fit_escape_rate
+from multiple_wave_transport.sequential import (
+    calculate_loss_times_sequential,
+    run_sequential,
+)
+
+T_MAX = 300.0
+
+
+def _draw(batch, n):
+    return np.random.default_rng(batch).uniform(size=(n, 2))
+
+
+def _exponential_loss_times(states):
+    # loss times with rate 0.01, a function of the initial states
+    return np.minimum(-100.0 * np.log(states[:, 0]), T_MAX)
+
+
+def test_fit_escape_rate():
+    loss_times = _exponential_loss_times(_draw(0, 20000))
+    alpha, alpha_err = fit_escape_rate(loss_times, 50.0, T_MAX)
+    assert abs(alpha - 0.01) < 3 * alpha_err < 0.001
+
+
+def test_fit_fast_escape_rate():
+    # the mean delay is far below width / 1000
+    loss_times = 50.0 - 0.01 * np.log(_draw(0, 2000)[:, 0])
+    alpha, alpha_err = fit_escape_rate(loss_times, 50.0, T_MAX)
+    assert abs(alpha - 100.0) < 4 * alpha_err
+
+
+def test_fit_escape_rate_unresolved():
+    # the delays are barely below the mean of a flat distribution
+    loss_times = 50.0 + np.array([0.25, 0.75 - 1e-9]) * (T_MAX - 50.0)
+    with pytest.raises(ValueError, match="not resolved"):
+        fit_escape_rate(loss_times, 50.0, T_MAX)
+
+def test_stops_when_converged():
+    states, loss_times, stopping = run_sequential(
+        _draw, _exponential_loss_times, T_MAX, 50.0, rel_error=0.1, batch_size=500
+    )
+    assert stopping["reason"] == "converged"
+    history = stopping["history"]
+    assert history[-1]["rel_error"] <= 0.1 < history[-2]["rel_error"]
+    assert len(states) == len(loss_times) == history[-1]["n_particles"]
+    assert len(states) % 500 == 0
+
+
+def test_stops_at_the_budget():
+    states, _, stopping = run_sequential(
+        _draw, _exponential_loss_times, T_MAX, 50.0, 1e-4, 500, max_particles=1200
+    )
+    assert stopping["reason"] == "max_particles" and len(states) == 1200
+
+    states, _, stopping = run_sequential(
+        _draw, _exponential_loss_times, T_MAX, 50.0, 1e-4, 500, max_time=0.0
+    )
+    assert stopping["reason"] == "max_time" and len(states) == 500
+
+
+def test_pendulum(tmp_path):
+    result = calculate_loss_times_sequential(
+        30 * 4 * np.pi,
+        2.0,
+        t_min=5 * 4 * np.pi,
+        rel_error=0.5,
+        batch_size=200,
+        max_particles=2000,
+        seed=1,
+    )
+    stopping = result.options["stopping"]
+    assert stopping["reason"] == "converged"
+    assert result.options["n_particles"] == len(result.loss_times)
+
+    result.save(tmp_path / "res")
+    assert LossTimeResult.load(tmp_path / "res").options == result.options
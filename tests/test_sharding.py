@@ -0,0 +1,162 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+import multiple_wave_transport
+from multiple_wave_transport._multiple_wave_transport import IntegrationOptions
+from multiple_wave_transport.losses import LossTimeResult
+from multiple_wave_transport.sharding import (
+    block_random_states,
+    main,
+    merge_diffusion_moments,
+    merge_loss_times,
+    parse_shard,
+    run_diffusion_shard,
+    run_loss_times_shard,
+    run_three_wave_loss_times_shard,
+    shard_range,
+    trapped_states,
+)
+from multiple_wave_transport.three_wave import calculate_loss_times
+
+_RUN = dict(t_max=20.0, amplitude=0.8, n_particles=30, seed=3)
+
+
+def test_parse_shard():
+    assert parse_shard("2/5") == (2, 5)
+    for spec in ["5/5", "-1/2", "1", "a/b"]:
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shards_cover_the_ensemble():
+    n = 1000
+    ranges = [shard_range(n, i, 7) for i in range(7)]
+    assert ranges[0][0] == 0 and ranges[-1][1] == n
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_slices_do_not_depend_on_the_partition():
+    def sample(n, rng):
+        return rng.uniform(size=(n, 2))
+
+    n = 5000
+    full = block_random_states(sample, 7, 0, n, block_size=128)
+    for n_shards in [2, 3, 11]:
+        parts = [
+            block_random_states(sample, 7, *shard_range(n, i, n_shards), block_size=128)
+            for i in range(n_shards)
+        ]
+        nt.assert_array_equal(np.concatenate(parts), full)
+
+
+def test_merge_equals_a_single_run(tmp_path):
+    for i in range(3):
+        run_loss_times_shard(tmp_path / "three", i, 3, **_RUN)
+    run_loss_times_shard(tmp_path / "one", 0, 1, **_RUN)
+
+    merged = merge_loss_times(tmp_path / "three", tmp_path / "merged.npd")
+    single = merge_loss_times(tmp_path / "one")
+    nt.assert_array_equal(merged.initial_states, single.initial_states)
+    nt.assert_array_equal(merged.loss_times, single.loss_times)
+    nt.assert_array_equal(
+        merged.initial_states, trapped_states(30, 3, 0, 30)
+    )
+    assert "shard" not in merged.options
+    assert LossTimeResult.load(tmp_path / "merged.npd").options == merged.options
+
+
+def test_merge_validates_the_shards(tmp_path):
+    run_loss_times_shard(tmp_path, 0, 3, **_RUN)
+    run_loss_times_shard(tmp_path, 2, 3, **_RUN)
+    with pytest.raises(ValueError, match="missing"):
+        merge_loss_times(tmp_path)
+
+    run_loss_times_shard(tmp_path, 1, 3, **dict(_RUN, seed=4))
+    with pytest.raises(ValueError, match="different runs"):
+        merge_loss_times(tmp_path)
+
+
+def test_merge_refuses_shards_of_another_integrator(tmp_path):
+    run_loss_times_shard(tmp_path, 0, 2, **_RUN)
+    run_loss_times_shard(
+        tmp_path, 1, 2, **_RUN, integration_options=IntegrationOptions(atol=1e-6)
+    )
+    with pytest.raises(ValueError, match="different runs"):
+        merge_loss_times(tmp_path)
+
+
+def test_three_wave_shards(tmp_path):
+    run = dict(
+        t_max=10.0,
+        amplitude=7.8,
+        n_particles=30,
+        seed=3,
+        p_max=10.0,
+        p_init_range=(3.0, 8.0),
+        sampling="sobol",
+    )
+    for i in range(3):
+        run_three_wave_loss_times_shard(tmp_path, i, 3, **run)
+    merged = merge_loss_times(tmp_path)
+    direct = calculate_loss_times(**run)
+    nt.assert_array_equal(merged.initial_states, direct.initial_states)
+    nt.assert_array_equal(merged.loss_times, direct.loss_times)
+    assert merged.options["integration_options"] == direct.options["integration_options"]
+
+
+def test_cli_passes_the_integration_options(tmp_path):
+    main(
+        ["loss-times", "--system", "three-wave", "--amplitude", "7.8"]
+        + ["--t-max", "5", "--n-particles", "8", "--seed", "1", "--p-max", "10"]
+        + ["--p-init-range", "3", "8", "--stepper", "CashKarp54", "--atol", "1e-8"]
+        + ["--block-size", "0", "--out", str(tmp_path)]
+    )
+    options = merge_loss_times(tmp_path).options
+    assert options["integration_options"]["stepper"] == "CashKarp54"
+    assert options["integration_options"]["atol"] == 1e-8
+    assert options["p_max"] == 10.0
+
+def test_merge_diffusion_moments(tmp_path):
+    run = dict(_RUN, t_max=5.0)
+    for i in range(2):
+        run_diffusion_shard(tmp_path / "two", i, 2, **run)
+    run_diffusion_shard(tmp_path / "one", 0, 1, **run)
+
+    merged, options = merge_diffusion_moments(tmp_path / "two")
+    single, _ = merge_diffusion_moments(tmp_path / "one")
+    assert options["n_particles"] == 30
+    nt.assert_array_equal(merged.count, single.count)
+    nt.assert_allclose(merged.mean, single.mean, atol=1e-12)
+    nt.assert_allclose(merged.m2, single.m2, rtol=1e-10, atol=1e-12)
+
+
+def test_local_processes(tmp_path):
+    env = dict(os.environ)
+    src = str(Path(multiple_wave_transport.__file__).parents[1])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+
+    def cli(*args):
+        return [sys.executable, "-m", "multiple_wave_transport.sharding", *args]
+
+    run = ["--amplitude", "0.8", "--t-max", "20", "--n-particles", "30"]
+    run += ["--seed", "3", "--n-threads", "1", "--out", str(tmp_path / "shards")]
+    processes = [
+        subprocess.Popen(cli("loss-times", "--shard", f"{i}/3", *run), env=env)
+        for i in range(3)
+    ]
+    assert all(p.wait() == 0 for p in processes)
+
+    out = tmp_path / "merged.npd"
+    subprocess.run(cli("merge", str(tmp_path / "shards"), "--out", str(out)), env=env, check=True)
+
+    run_loss_times_shard(tmp_path / "one", 0, 1, **_RUN)
+    nt.assert_array_equal(
+        LossTimeResult.load(out).loss_times,
+        merge_loss_times(tmp_path / "one").loss_times,
+    )
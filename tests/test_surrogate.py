@@ -0,0 +1,86 @@
+import numpy as np
+import numpy.testing as nt
+import pytest
+
+from multiple_wave_transport._multiple_wave_transport import (
+    BoundaryType,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.pendulum import (
+    build_pendulum,
+    generate_random_init_trapped_states,
+)
+from multiple_wave_transport.surrogate import (
+    PeriodMapSurrogate,
+    build_pendulum_surrogate,
+    pendulum_is_outside,
+)
+
+TOL = 1e-3
+
+
+@pytest.fixture(scope="module")
+def surrogate():
+    return build_pendulum_surrogate(0.3, tol=TOL, order=6, base_cells=4, max_depth=2)
+
+
+def test_period_map_matches_loss_times():
+    pend = build_pendulum(0.3)
+    states = generate_random_init_trapped_states(200, rng=0)
+    mapped = pend.period_map(states, n_periods=2)
+    lost = pend.get_loss_times(states, 2 * pend.poincare_dt) < 2 * pend.poincare_dt
+    nt.assert_array_equal(np.isnan(mapped[:, 0]), lost)
+    nt.assert_allclose(
+        pend.period_map(pend.period_map(states[~lost])),
+        mapped[~lost],
+        atol=1e-6,
+    )
+
+
+def test_three_wave_period_map():
+    mapped = ThreeWaveSystem(7.8).period_map(np.array([[0.0, 10.0], [0.0, 19.9]]), 20.0, 5)
+    assert np.isfinite(mapped[0]).all() and np.isnan(mapped[1]).all()
+
+
+def test_surrogate_interpolates_the_map(surrogate):
+    assert surrogate.fallback_fraction < 1.0
+    assert surrogate.max_error <= TOL
+
+    pend = build_pendulum(0.3)
+    states = generate_random_init_trapped_states(500, -1, 0.5, rng=1)
+    exact = pend.period_map(states)
+    approx = surrogate(states)
+    nt.assert_array_equal(np.isnan(approx), np.isnan(exact))
+    nt.assert_allclose(approx, exact, atol=5 * TOL)
+
+
+def test_surrogate_loss_times(surrogate):
+    pend = build_pendulum(0.3)
+    states = generate_random_init_trapped_states(500, rng=2)
+    t_max = 6 * pend.poincare_dt
+    exact = pend.get_loss_times(states, t_max)
+    approx = surrogate.loss_times(states, t_max)
+
+    periods = approx / pend.poincare_dt
+    nt.assert_allclose(periods, np.round(periods))
+    assert abs(np.mean(exact >= t_max) - np.mean(approx >= t_max)) < 0.02
+
+
+def test_states_outside_of_the_grid_use_the_exact_map():
+    pend = build_pendulum(0.3)
+
+    def exact_map(states):
+        return pend.period_map(states, boundary_type=BoundaryType.P)
+
+    surrogate = PeriodMapSurrogate.build(
+        exact_map,
+        pendulum_is_outside(BoundaryType.P),
+        ((2.0, 4.0), (-0.5, 0.5)),
+        pend.poincare_dt,
+        tol=1e-2,
+        order=4,
+        base_cells=2,
+        max_depth=1,
+    )
+    states = np.array([[1.0, 1.0], [3.0, 0.0]])
+    nt.assert_allclose(surrogate(states)[0], exact_map(states)[0])
@@ -0,0 +1,59 @@
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport.pendulum import calculate_loss_times, sweep_loss_times
+from multiple_wave_transport.sweep import (
+    inverse_amplitude_cost,
+    iter_sweep,
+    make_tasks,
+    run_sweep,
+)
+
+
+def _row_sums(item, chunk):
+    return item * chunk.sum(axis=1)
+
+
+def test_tasks_are_ordered_longest_first():
+    tasks = make_tasks({2.0: 25, 0.5: 10}, 10, inverse_amplitude_cost)
+    assert [(t.item, t.begin, t.end) for t in tasks] == [
+        (0.5, 0, 10),
+        (2.0, 0, 10),
+        (2.0, 10, 20),
+        (2.0, 20, 25),
+    ]
+
+
+def test_results_are_reassembled_per_item():
+    inputs = {a: np.arange(2 * n, dtype=float).reshape(n, 2) for a, n in [(1, 7), (3, 12)]}
+    for n_workers in (1, 2):
+        out = run_sweep(
+            [1, 3], inputs.__getitem__, _row_sums, chunk_size=5, n_workers=n_workers
+        )
+        for item, x in inputs.items():
+            nt.assert_array_equal(out[item], item * x.sum(axis=1))
+
+
+
+def test_chunks_are_streamed_in_order():
+    inputs = {a: np.arange(2 * n, dtype=float).reshape(n, 2) for a, n in [(1, 7), (3, 12)]}
+    for n_workers in (1, 2):
+        chunks = {1: [], 3: []}
+        for item, result, last in iter_sweep(
+            [1, 3], inputs.__getitem__, _row_sums, chunk_size=5, n_workers=n_workers
+        ):
+            assert not chunks[item] or not chunks[item][-1][1]
+            chunks[item].append((result, last))
+        for item, x in inputs.items():
+            assert [last for _, last in chunks[item]][-1]
+            nt.assert_array_equal(
+                np.concatenate([r for r, _ in chunks[item]]), item * x.sum(axis=1)
+            )
+
+def test_pendulum_sweep_matches_single_runs():
+    results = sweep_loss_times(15.0, [0.8, 1.5], 12, seed=2, chunk_size=5, n_workers=2)
+    for amplitude, result in results.items():
+        direct = calculate_loss_times(15.0, amplitude, 12, seed=2)
+        nt.assert_array_equal(result.initial_states, direct.initial_states)
+        nt.assert_array_equal(result.loss_times, direct.loss_times)
+        assert result.options == direct.options
@@ -0,0 +1,59 @@
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport.losses import LossTimeResult
+from multiple_wave_transport.pendulum import (
+    build_pendulum,
+    generate_random_init_trapped_states,
+)
+from multiple_wave_transport.ulam import (
+    UlamGrid,
+    escape_rate,
+    monte_carlo_escape_rate,
+    pendulum_escape_rate,
+)
+
+
+def _open_tripling_map(states):
+    # x -> 3 x, the particles in the middle third leave [0, 1] for good
+    mapped = states.copy()
+    mapped[:, 0] *= 3
+    mapped[mapped[:, 0] > 2] -= [2, 0]
+    mapped[(mapped[:, 0] > 1)] = np.nan
+    return mapped
+
+
+def test_grid_cells():
+    grid = UlamGrid(((0.0, 2.0), (-1.0, 1.0)), 4, 2)
+    points = grid.sample_points(2)
+    assert points.shape == (8, 4, 2)
+    nt.assert_array_equal(grid.cell_of(points.reshape(-1, 2)), np.repeat(np.arange(8), 4))
+    nt.assert_array_equal(grid.cell_of(np.array([[2.5, 0.0], [np.nan, 0.0]])), [-1, -1])
+
+
+def test_escape_rate_of_open_tripling_map():
+    result = escape_rate(_open_tripling_map, ((0.0, 1.0), (0.0, 1.0)), 1.0, (27, 1), 3)
+    nt.assert_allclose(result.eigenvalue, 2 / 3)
+    nt.assert_allclose(result.alpha, np.log(1.5))
+    # both branches stretch their third uniformly over the interval
+    nt.assert_allclose(result.density, 1 / 27)
+
+
+def test_monte_carlo_escape_rate():
+    rng = np.random.default_rng(0)
+    loss_times = np.minimum(rng.exponential(100.0, 20000), 300.0)
+    result = LossTimeResult(np.zeros((20000, 2)), loss_times, {"t_max": 300.0})
+    nt.assert_allclose(monte_carlo_escape_rate(result, 50.0), 0.01, rtol=0.05)
+
+
+def test_pendulum_escape_rate_agrees_with_monte_carlo():
+    amplitude = 2.0
+    ulam = pendulum_escape_rate(amplitude, shape=(64, 64), n_samples=3)
+    assert 0 < ulam.eigenvalue < 1
+
+    pend = build_pendulum(amplitude)
+    t_max = 30 * pend.poincare_dt
+    states = generate_random_init_trapped_states(1000, rng=0)
+    result = LossTimeResult(states, pend.get_loss_times(states, t_max), {"t_max": t_max})
+    alpha = monte_carlo_escape_rate(result, 5 * pend.poincare_dt)
+    assert 0.5 < ulam.alpha / alpha < 2
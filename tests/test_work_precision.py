@@ -0,0 +1,73 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import numpy.testing as nt
+
+from multiple_wave_transport._multiple_wave_transport import (
+    IntegrationOptions,
+    PerturbedPendulum,
+    StepperKind,
+    ThreeWaveSystem,
+)
+from multiple_wave_transport.pendulum import generate_random_init_trapped_states
+from multiple_wave_transport.work_precision import (
+    compare_loss_times,
+    default_settings,
+    format_table,
+    pendulum_work_precision,
+    plot_work_precision,
+)
+
+
+def test_counted_loss_times_match_get_loss_times():
+    pend = PerturbedPendulum(0.8)
+    states = generate_random_init_trapped_states(20, rng=1)
+    loss_times, evaluations = pend.count_loss_times(states, 50.0, n_threads=2)
+    nt.assert_array_equal(loss_times, pend.get_loss_times(states, 50.0))
+    assert evaluations.shape == (20,)
+    assert (evaluations > 0).all()
+
+    tws = ThreeWaveSystem(7.8)
+    states = np.array([[1.0, 5.0], [2.0, 8.0]])
+    loss_times, evaluations = tws.count_loss_times(states, 10.0, 20.0)
+    nt.assert_array_equal(loss_times, tws.get_loss_times(states, 10.0, 20.0))
+    assert (evaluations > 0).all()
+
+
+def test_evaluations_grow_with_the_precision():
+    pend = PerturbedPendulum(0.8)
+    states = generate_random_init_trapped_states(10, rng=1)
+    totals = [
+        pend.count_loss_times(
+            states, 30.0, options=IntegrationOptions(atol=tol, rtol=tol)
+        )[1].sum()
+        for tol in (1e-6, 1e-9, 1e-12)
+    ]
+    assert totals[0] < totals[1] < totals[2]
+
+
+def test_reference_has_no_error():
+    loss_times = np.array([1.0, 2.0, 5.0, 7.0, 9.0, 20.0, 20.0])
+    statistics, errors = compare_loss_times(loss_times, loss_times, 0.0, 20.0)
+    assert statistics.survival == 2 / 7
+    assert all(error == 0 for error in errors.values())
+
+
+def test_pendulum_work_precision():
+    settings = [
+        IntegrationOptions(atol=1e-6, rtol=1e-6),
+        IntegrationOptions(stepper=StepperKind.Symplectic, steps_per_period=32),
+    ]
+    reference, points = pendulum_work_precision(
+        1.5, n_particles=40, t_max=60.0, t_min=5.0, settings=settings
+    )
+    assert reference.ks_statistic == 0
+    assert [p.label for p in points] == ["Dopri5 1e-06", "Symplectic Yoshida4 32"]
+    for p in points:
+        assert 0 < p.rhs_evaluations < reference.rhs_evaluations
+        assert 0 <= p.ks_statistic <= 1
+    assert len(format_table(points).splitlines()) == 3
+    plot_work_precision(points, error="ks_statistic")
+    assert len(default_settings()) == 25